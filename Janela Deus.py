@@ -7,21 +7,8 @@ TEMPO = 1.0
 TAM_PAYLOAD_BITS = 128
 TAM_PAYLOAD_BYTES = TAM_PAYLOAD_BITS // 8 # Tamanho MÁXIMO do payload em bytes
 
-# Funções de Checksum
-def binary_sum_especial(A: str, B: str) -> str: 
-    soma = int(A, 2) + int(B, 2) 
-    if soma >= 2 ** 16: 
-        soma = (soma + 1) % (2 ** 16) 
-    return bin(soma)[2:].zfill(16) 
-
-def calc_checksum(data: str) -> str: 
-    if len(data) % 16 != 0: 
-        data = data.ljust(((len(data) // 16) + 1) * 16, '0') 
-    result = '0' * 16 
-    for i in range(0, len(data), 16): 
-        bloco = data[i:i + 16] 
-        result = binary_sum_especial(result, bloco) 
-    return result 
+# Funções de Checksum (implementação compartilhada em checksum.py)
+from checksum import calc_checksum_bits as calc_checksum
 
 def verify_checksum(segment_str: str) -> bool: 
     if len(segment_str) < 96:        
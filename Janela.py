@@ -1,307 +1,900 @@
-import socket, time, random
+import io, mmap, os, select, socket, time, random
 import threading # <<< ADICIONADO
+from abc import ABC, abstractmethod
+from collections import deque
+import segmento
+from temporizador import RodaTemporizadora
+from rtt import EstimadorRTT, RTO_MINIMO
+from congestionamento import Reno
+from fec import montar_paridade, tamanho_paridade
+from metricas import Metricas, LockMedido
+import registro
 
 IP = '127.0.0.1'
 PORTA = 55555
-JANELA = 5
-TEMPO = 1.0 # Timeout individual em segundos (era TEMPO)
+JANELA = 5 # Janela fixa (em segmentos) da política JanelaFixa
+TEMPO = 1.0 # Timeout inicial em segundos, usado até a primeira amostra de RTT
 TAM_PAYLOAD_BITS = 128
-TAM_PAYLOAD_BYTES = TAM_PAYLOAD_BITS // 8 # Tamanho MÁXIMO do payload em bytes
-
-# (Funções de Checksum e Conversão - Sem Mudanças)
-# Funções de Checksum
-def binary_sum_especial(A: str, B: str) -> str:
-    soma = int(A, 2) + int(B, 2)
-    if soma >= 2 ** 16:
-        soma = (soma + 1) % (2 ** 16)
-    return bin(soma)[2:].zfill(16)
-
-def calc_checksum(data: str) -> str:
-    if len(data) % 16 != 0:
-        data = data.ljust(((len(data) // 16) + 1) * 16, '0')
-    result = '0' * 16
-    for i in range(0, len(data), 16):
-        bloco = data[i:i + 16]
-        result = binary_sum_especial(result, bloco)
-    return result
-
-def verify_checksum(segment_str: str) -> bool:
-    if len(segment_str) < 96:
-        return False
-    checksum_recebido = segment_str[64:80]
-    header1 = segment_str[0:32]
-    header2 = segment_str[32:64]
-    header3_sem_checksum = '0' * 16 + segment_str[80:96]
-    payload = segment_str[96:]
-    string_para_verificar = header1 + header2 + header3_sem_checksum + payload
-    checksum_calculado = calc_checksum(string_para_verificar)
-    checksum_ok = (checksum_calculado == checksum_recebido)
-    return checksum_ok
-
-# Conversão Binário <-> Bytes
-def string_binaria_para_bytes(s_bin: str) -> bytes:
-    if len(s_bin) % 8 != 0:
-        s_bin = s_bin.ljust((len(s_bin) + 7) // 8 * 8, '0')
-    b_array = bytearray()
-    for i in range(0, len(s_bin), 8):
-        byte_str = s_bin[i:i+8]
-        try:
-            b_array.append(int(byte_str, 2))
-        except ValueError:
-            return b''
-    return bytes(b_array)
+TAM_PAYLOAD_BYTES = TAM_PAYLOAD_BITS // 8 # Tamanho MÁXIMO do payload em bytes (modo compatível com o MaquinaC)
+LOTE_ACKS = 64 # Máximo de datagramas de ACK tratados sob uma única aquisição do lock
+LIMIAR_RETRANSMISSAO = 3 # Segmentos posteriores confirmados que indicam a perda de um segmento
+CAPACIDADE_JANELA = 4096 # Segmentos enviados e não deslizados que o remetente acompanha
+JANELA_RECEPCAO = 64 * 1024 # Janela de recepção padrão (bytes do espaço de sequência) da Recepcao
+ESPERA_PARIDADE = 0.005 # Espera (s) por mais dados antes da paridade de um grupo incompleto (FEC)
+_CHAVE_PARIDADE = -1 # Chave do prazo da paridade na roda (nenhum seq é negativo)
+PRE_LEITURA = 64 # Payloads lidos das fontes (fora do lock) à frente da numeração
+
+log = registro.obter('Envio')
+
+def receber_lote(sock, tamanho: int, limite: int = LOTE_ACKS) -> list:
+    """Espera um datagrama (timeout do socket) e junta os que já estiverem na fila."""
+    lote = [sock.recv(tamanho)]
+    while len(lote) < limite and select.select((sock,), (), (), 0)[0]:
+        lote.append(sock.recv(tamanho))
+    return lote
+
+# Fontes preguiçosas de payloads (lidas só quando a janela abre)
+def _fatias(dados, mss: int):
+    """Payloads de até 'mss' bytes de um buffer (views, sem cópia)."""
+    dados = memoryview(dados)
+    for idx in range(0, len(dados), mss):
+        yield dados[idx : idx + mss]
+
+def _blocos_arquivo(arquivo, mss: int):
+    """Payloads lidos de um arquivo binário, 'mss' bytes por vez (um objeto por segmento)."""
+    while True:
+        bloco = arquivo.read(mss)
+        if not bloco:
+            return
+        yield bloco
+
+def _mapear(caminho):
+    """Conteúdo do arquivo via mmap (as páginas só são lidas quando acessadas)."""
+    with open(caminho, 'rb') as arquivo:
+        if os.fstat(arquivo.fileno()).st_size == 0:
+            return b'' # mmap não aceita arquivo vazio
+        # O mmap continua válido depois de fechar o arquivo e vive enquanto houver views dele
+        return mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+
+# Handle de cada mensagem enfileirada
+class Confirmacao:
+    """Conclui quando o último byte da mensagem é confirmado (a base passa do fim dela)."""
+
+    def __init__(self, envio):
+        self._envio = envio
+        # Intervalo [inicio, fim) de seqs (em bits) da mensagem, preenchido conforme ela é numerada:
+        # inicio é o seq do primeiro segmento (None até lá) e fim o seq logo depois do último
+        # (None enquanto a fonte ainda está sendo lida). Custo constante, qualquer que seja o tamanho.
+        self.inicio = None
+        self.fim = None
+        self.segmentos = 0
+        self.concluida = False
+        self.erro = None # Exceção ao ler a fonte (o fluxo termina onde a leitura parou)
+        # Instantes (relógio do Envio) de enfileiramento e de confirmação
+        self.enfileirada_em = envio.agora()
+        self.concluida_em = None
+
+    def esperar(self, timeout=None) -> bool:
+        """Bloqueia até a confirmação (ou timeout / remetente fechado); retorna se concluiu sem erro."""
+        self._envio._esperar(lambda: self.concluida, timeout)
+        return self.concluida and self.erro is None
+
+    @property
+    def latencia(self):
+        """Segundos entre enfileirar e confirmar (None se ainda pendente)."""
+        if self.concluida_em is None:
+            return None
+        return self.concluida_em - self.enfileirada_em
 
-def bytes_para_string_binaria(b: bytes) -> str:
-    return ''.join([bin(byte)[2:].zfill(8) for byte in b])
+    def __repr__(self):
+        estado = 'confirmada' if self.concluida else 'pendente'
+        return f"<Confirmacao {self.segmentos} segmentos [{self.inicio}, {self.fim}) ({estado})>"
 
-#Classe Envio Modificada para Multi-Thread
-class Envio:
-    def __init__(self, ip, porta):
-        self.dest = (ip, porta) # Destino
+
+# Transporte: por onde um fluxo (Envio ou Recepcao) manda e recebe datagramas, e o seu relógio
+class Transporte(ABC):
+    """Interface dos transportes passados como 'canal' ao Envio e à Recepcao.
+
+    O transporte entrega os datagramas recebidos chamando
+    fluxo._tratar_datagramas(mensagens, addr) e envia com enviar(partes, dest).
+    Transportes síncronos (sincrono = True, ex.: simulacao.py) não usam
+    threads: os fluxos também não criam as suas, os timers vêm de criar_roda()
+    e as esperas avançam o próprio transporte (executar_ate(pronto, timeout)).
+    Eles também oferecem agendar(atraso, funcao, *args).
+    """
+
+    sincrono = False
+    exige_conexao = False # True se vários fluxos dividem o transporte pelo ID de conexão
+    sock = None
+
+    def agora(self) -> float:
+        return time.monotonic()
+
+    def criar_roda(self, ao_expirar, nome: str):
+        return RodaTemporizadora(ao_expirar, nome=nome)
+
+    def endereco(self):
+        return self.sock.getsockname() if self.sock is not None else None
+
+    @abstractmethod
+    def registrar(self, fluxo):
+        """Passa a entregar ao fluxo os datagramas endereçados a ele."""
+
+    @abstractmethod
+    def remover(self, fluxo):
+        """Deixa de entregar datagramas ao fluxo (o transporte continua aberto)."""
+
+    @abstractmethod
+    def enviar(self, partes: list, dest):
+        """Envia as partes concatenadas como um datagrama para 'dest'."""
+
+    def fechar(self):
+        pass
+
+
+# Socket compartilhado por vários fluxos lógicos (um Envio por ID de conexão)
+class CanalCompartilhado(Transporte):
+    """Um socket UDP e uma thread de recepção que entrega cada ACK ao Envio da sua conexão."""
+
+    exige_conexao = True
+
+    def __init__(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(('', 0))
-        # <<< MODIFICADO: Timeout no socket para a thread de ACK não bloquear indefinidamente
         self.sock.settimeout(0.5)
-        # self.sock.setblocking(False) # Não é mais necessário com timeout e thread separada
-        print(f"Remetente (Envio) ouvindo em: {self.sock.getsockname()}")
+        log.info("Canal compartilhado ouvindo em: %s", self.sock.getsockname())
+        self.fluxos = {} # {conexao: Envio}
+        self.rodando = True
+        self.th_rx = threading.Thread(target=self._receber, daemon=True)
+        self.th_rx.start()
+
+    def registrar(self, envio):
+        if envio.conexao in self.fluxos:
+            raise ValueError(f"Conexão {envio.conexao} já registrada neste canal")
+        self.fluxos[envio.conexao] = envio
+
+    def remover(self, envio):
+        self.fluxos.pop(envio.conexao, None)
+
+    def enviar(self, partes: list, dest):
+        segmento.enviar_partes(self.sock, partes, dest)
+
+    def _receber(self):
+        while self.rodando:
+            try:
+                lote = receber_lote(self.sock, segmento.TAM_MAX_DATAGRAMA)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            # Agrupa por conexão: cada Envio trata os seus ACKs de uma vez
+            por_fluxo = {}
+            for msg_bytes in lote:
+                por_fluxo.setdefault(segmento.conexao_de(msg_bytes), []).append(msg_bytes)
+            for conexao, mensagens in por_fluxo.items():
+                envio = self.fluxos.get(conexao)
+                if envio is not None:
+                    envio._tratar_datagramas(mensagens, None)
+
+    def fechar(self):
+        self.rodando = False
+        if self.th_rx.is_alive():
+            self.th_rx.join(timeout=1.0)
+        self.sock.close()
+
+
+# Thread de transmissão do remetente
+class Transmissor:
+    """Monta e envia os segmentos pedidos pelo Envio, fora do lock da janela.
+
+    A fila é um deque (append/popleft atômicos, sem lock) com um único
+    produtor por vez, porque o Envio só enfileira segurando o seu lock, e um
+    único consumidor, esta thread. O Event só é sinalizado quando a thread
+    pode estar dormindo.
+    """
+
+    def __init__(self, enviar, montar, nome="Envio-tx"):
+        self.enviar_partes = enviar # partes -> datagrama para o destino
+        self.montar = montar # (seq, payload) -> partes do segmento (padrão de enviar())
+        self._fila = deque()
+        self._evento = threading.Event()
+        self.rodando = True
+        self._thread = threading.Thread(target=self._executar, name=nome, daemon=True)
+        self._thread.start()
+
+    def enviar(self, seq: int, payload, montar=None):
+        self._fila.append((seq, payload, montar))
+        if not self._evento.is_set():
+            self._evento.set()
+
+    def _executar(self):
+        fila = self._fila
+        while True:
+            while fila:
+                seq, payload, montar = fila.popleft()
+                try:
+                    self.enviar_partes((montar or self.montar)(seq, payload))
+                except Exception as e:
+                    # Fica como um segmento perdido: o timeout (ou o fast retransmit) reenvia
+                    log.erro("Erro ao enviar segmento %d: %s", seq, e)
+            if not self.rodando:
+                return
+            self._evento.clear()
+            if not fila: # Sem corrida: quem enfileirou depois do clear() sinaliza de novo
+                self._evento.wait()
+
+    def pendentes(self) -> int:
+        return len(self._fila)
+
+    def parar(self):
+        """Envia o que já estava na fila e encerra a thread."""
+        self.rodando = False
+        self._evento.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+
+# Estado de um segmento enviado e ainda não deslizado para trás da base
+class _Slot:
+    __slots__ = ('seq', 'bits', 'payload', 'enviado_em', 'retransmissoes', 'em_timer', 'confirmado', 'rapido')
+
+    def __init__(self):
+        self.liberar()
+
+    def ocupar(self, seq: int, bits: int, payload, enviado_em: float):
+        self.seq = seq
+        self.bits = bits # Tamanho do segmento no fio, em bits
+        self.payload = payload # Remontado pelo transmissor a cada (re)envio
+        self.enviado_em = enviado_em # Primeiro envio (RTT)
+        self.retransmissoes = 0 # Karn: só mede o RTT de segmentos nunca reenviados
+        self.em_timer = False # Timeout armado na roda
+        self.confirmado = False
+        self.rapido = False # Já reenviado por fast retransmit
+
+    def liberar(self):
+        self.ocupar(-1, 0, None, 0.0)
+
+
+#Classe Envio Modificada para Multi-Thread
+class Envio:
+    def __init__(self, ip, porta, controle=None, mss=TAM_PAYLOAD_BYTES, janela_receptor=JANELA_RECEPCAO,
+                 conexao=None, canal=None, limiar_retransmissao=LIMIAR_RETRANSMISSAO,
+                 capacidade=CAPACIDADE_JANELA, thread_tx=True, fec=None, rto_minimo=RTO_MINIMO):
+        self.dest = (ip, porta) # Destino
+        if not 0 < mss <= segmento.MSS_MAXIMO:
+            raise ValueError(f"MSS deve estar entre 1 e {segmento.MSS_MAXIMO} bytes")
+        if conexao is not None and not 0 < conexao <= 0xFFFF:
+            raise ValueError("ID de conexão deve estar entre 1 e 65535")
+        if canal is not None and conexao is None and canal.exige_conexao:
+            raise ValueError("Um canal compartilhado exige um ID de conexão")
+        # ID de conexão no cabeçalho (0 = sem ID, roteamento só pelo endereço)
+        self.conexao = conexao or 0
+        # Payload máximo por segmento; acima de 255 bytes (ou com ID de conexão) usa o cabeçalho estendido
+        self.mss = mss
+        self.estendido = segmento.precisa_estender(mss, self.conexao)
+        # Buffer de recepção grande o bastante para um segmento cheio
+        self.tam_buffer_recepcao = max(2048, segmento.tamanho_segmento(mss, self.estendido))
+        # Transporte (Transporte): socket compartilhado por vários fluxos ou rede simulada
+        self.canal = canal
+        sincrono = canal is not None and canal.sincrono
+        # Relógio dos RTTs, prazos e latências (virtual no transporte simulado)
+        self.agora = canal.agora if canal is not None else time.monotonic
+        if canal is not None:
+            # O canal entrega os ACKs desta conexão
+            self.sock = canal.sock
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(('', 0))
+            # <<< MODIFICADO: Timeout no socket para a thread de ACK não bloquear indefinidamente
+            self.sock.settimeout(0.5)
+            # self.sock.setblocking(False) # Não é mais necessário com timeout e thread separada
+        log.info("Remetente (Envio) ouvindo em: %s (conexão %s)",
+                 canal.endereco() if canal is not None else self.sock.getsockname(), self.conexao)
 
         #Controle da janela deslizante
         self.base = 0
         self.prox_seq_num = 0
-        # Buffer armazena {seq_bits: (segmento_bytes, tamanho_segmento_bits)}
-        self.buffer_segmentos = {}
-        # <<< MODIFICADO: Armazena {seq_bits: threading.Timer object}
-        self.tempos_envio = {}
-        self.acks_confirmados = set()
-        self.buffer_envio = [] # Fila da aplicação [(seq, payload, tamanho_bits)]
+        # Anel de capacidade fixa com um _Slot por segmento enviado, em ordem de seq: o
+        # slot da base fica em _inicio e os _em_uso seguintes estão ocupados. Os slots são
+        # criados no primeiro uso e depois reaproveitados, então a memória do remetente não
+        # cresce com a transferência (nem paga a capacidade inteira para fluxos curtos).
+        if capacidade < 1:
+            raise ValueError("A capacidade da janela deve ser de ao menos um segmento")
+        self.capacidade = capacidade
+        self._slots = [None] * capacidade
+        self._inicio = 0
+        self._em_uso = 0
+        self.pico_em_voo = 0 # Mais segmentos em voo (sem confirmação) ao mesmo tempo: o quanto a janela encheu
+        self._confirmados = 0 # Slots confirmados ainda no anel (acima de um buraco)
+        self.buffer_envio = deque() # Segmentos numerados ainda não enviados [(seq, payload, tamanho_bits)]
+        # Fontes lidas e numeradas só quando a janela abre: [(gerador de payloads, Confirmacao)]
+        self.fontes = deque()
+        # Payloads já lidos das fontes e ainda sem seq [(payload, Confirmacao)]; payload None marca o
+        # fim de uma fonte. A leitura é feita fora do lock da janela, uma thread por vez (_lock_leitura)
+        self._lidos = deque()
+        self._lock_leitura = threading.Lock()
         self.ultimo_seq_necessario = -1
-        self.seq_nums_gerados = set() # Guarda todos os seq nums gerados
 
         # <<< ADICIONADO: Lock para segurança de thread >>>
-        self.lock = threading.Lock()
+        # Cobre só a contabilidade da janela; mede espera e posse (estatisticas_lock())
+        self.lock = LockMedido()
+        # Sinaliza confirmações de mensagens (mesmo lock da janela)
+        self.cond = threading.Condition(self.lock)
+        self.confirmacoes_pendentes = deque() # Confirmacao em ordem de 'fim'
         self.rodando = True # Flag para controlar a thread de ACK
 
+        # Uma única thread de temporização para todos os segmentos em voo
+        self.roda = (canal.criar_roda(self._tratar_timeouts, "Envio-timers") if canal is not None
+                     else RodaTemporizadora(self._tratar_timeouts, nome="Envio-timers"))
+        # RTO adaptativo (SRTT/RTTVAR + backoff exponencial + algoritmo de Karn)
+        self.rtt = EstimadorRTT(rto_inicial=TEMPO, rto_minimo=rto_minimo)
+        # Controle de congestionamento: janela (cwnd) em bytes, padrão Reno
+        self.controle = controle if controle is not None else Reno()
+        self.controle.iniciar(segmento.tamanho_segmento(mss, self.estendido))
+        self.bytes_em_voo = 0 # Bytes enviados e ainda não confirmados
+        # Janela de recepção do destinatário (bytes): limita a distância entre base e o próximo envio.
+        # O padrão é a janela padrão da Recepcao, para não mandar além do anel dela; None desliga
+        self.janela_receptor = janela_receptor
+        # Fast retransmit: reenvia um segmento quando 'limiar' segmentos posteriores já foram
+        # confirmados (None ou 0 desliga e deixa só o timeout)
+        self.limiar_retransmissao = limiar_retransmissao
+        self.fim_recuperacao = 0 # A janela só é reduzida de novo depois que a base passar daqui
+        # FEC (fec.py): uma paridade XOR a cada fec.k segmentos de dados novos (None desliga)
+        if fec is not None and tamanho_paridade(fec.k_maximo, mss) > segmento.MSS_MAXIMO:
+            raise ValueError("A paridade do FEC não cabe em um datagrama com este MSS; use um K menor")
+        self.fec = fec
+        self._grupo_fec = [] # Payloads do grupo em formação
+        self._inicio_grupo_fec = 0 # Seq do primeiro segmento do grupo
+        self._fim_grupo_fec = 0 # Seq logo depois do último segmento do grupo
+        # Paridades enviadas [(fim do grupo, bytes)]: ocupam a janela (bytes_em_voo) como os dados, mas
+        # nunca são confirmadas; saem da conta quando a base passa do fim do seu grupo
+        self._paridades_em_voo = deque()
+        self.metricas = Metricas(f"envio-{self.conexao}", relogio=self.agora)
+        # Montagem e envio dos segmentos em uma thread própria (thread_tx=False, ou um
+        # transporte síncrono, envia direto, segurando o lock, como antes)
+        self.tx = None
+        if thread_tx and not sincrono:
+            self.tx = Transmissor(self._enviar_partes, self._montar_dados, f"Envio-tx-{self.conexao}")
+
         # <<< ADICIONADO: Inicia a thread de recebimento de ACKs >>>
-        self.th_ack = threading.Thread(target=self._receber_acks, daemon=True)
-        self.th_ack.start()
-
-
-    # (Funções _montar_segmento e _ler_segmento - Sem Mudanças Funcionais)
-    #Montar e Ler Segmentos
-    def _montar_segmento(self, seq: int, ack_num: int, ack_flag: int, dados_payload: bytes) -> bytes:
-        dados_bin = bytes_para_string_binaria(dados_payload)
-        dados_bin = dados_bin.ljust(((len(dados_bin) + 15) // 16) * 16, '0')
-        seq_bin = bin(seq & 0xFFFFFFFF)[2:].zfill(32)
-        ack_bin = bin(ack_num & 0xFFFFFFFF)[2:].zfill(32)
-        tamanho_bytes = len(dados_payload)
-        tamanho_bin = bin(tamanho_bytes & 0xFF)[2:].zfill(8)
-        ack_bit_bin = '1' if ack_flag == 1 else '0'
-        zeros_finais = '0' * 7
-        header_sem_checksum = '0' * 16 + tamanho_bin + ack_bit_bin + zeros_finais
-        segmento_str_temp = seq_bin + ack_bin + header_sem_checksum + dados_bin
-        checksum_bin = calc_checksum(segmento_str_temp)
-        header_final = checksum_bin + tamanho_bin + ack_bit_bin + zeros_finais
-        segmento_final_str = seq_bin + ack_bin + header_final + dados_bin
-        segmento_bytes = string_binaria_para_bytes(segmento_final_str)
-        return segmento_bytes
+        self.th_ack = None
+        if canal is not None:
+            canal.registrar(self)
+        else:
+            self.th_ack = threading.Thread(target=self._receber_acks, daemon=True)
+            self.th_ack.start()
+
+
+    #Montar e Ler Segmentos (codec binário em segmento.py)
+    def _montar_segmento(self, seq: int, ack_num: int, ack_flag: int, dados_payload: bytes) -> list:
+        """Retorna as partes [cabeçalho, payload, (padding)] do segmento, sem concatenar."""
+        return segmento.partes_segmento(seq, ack_num, ack_flag, dados_payload, self.estendido, self.conexao)
+
+    def _montar_dados(self, seq: int, payload) -> list:
+        return self._montar_segmento(seq, 0, 0, payload)
+
+    def _montar_paridade(self, seq: int, payloads: list) -> list:
+        # O XOR é calculado aqui, na thread de transmissão quando houver uma
+        return segmento.partes_segmento(seq, 0, 0, montar_paridade(payloads, self.estendido),
+                                        conexao=self.conexao, flags_extra=segmento.FLAG_FEC)
+
+    def _enviar_partes(self, partes: list):
+        if self.canal is not None:
+            self.canal.enviar(partes, self.dest)
+        else:
+            segmento.enviar_partes(self.sock, partes, self.dest)
+
+    def _transmitir(self, seq: int, payload, montar=None):
+        """Entrega o segmento ao transmissor (ou envia já, sem thread de transmissão)."""
+        if self.tx is not None:
+            self.tx.enviar(seq, payload, montar)
+            return
+        try:
+            self._enviar_partes((montar or self._montar_dados)(seq, payload))
+        except Exception as e:
+            log.erro("Erro ao enviar segmento %d: %s", seq, e)
 
     def _ler_segmento(self, msg_bytes: bytes):
-        msg_bin = bytes_para_string_binaria(msg_bytes)
-        if len(msg_bin) < 96:
-            return None
-        if not verify_checksum(msg_bin):
-            print("[ACK RECV] Checksum inválido no ACK.") # Debug
-            return None
-        seq_bin = msg_bin[0:32]
-        ack_bin = msg_bin[32:64]
-        header3_bin = msg_bin[64:96]
-        dados_bin = msg_bin[96:]
-        tamanho_bin = header3_bin[16:24]
-        ack_bit_bin = header3_bin[24:25]
-        seq_int = int(seq_bin, 2)
-        ack_int = int(ack_bin, 2)
-        flag_int = int(ack_bit_bin, 2)
-        tamanho_int = int(tamanho_bin, 2)
-        dados_bytes_com_padding = string_binaria_para_bytes(dados_bin)
-        dados_payload_originais = dados_bytes_com_padding[:tamanho_int]
-        return {'seq': seq_int, 'ack': ack_int, 'flag': flag_int, 'dados': dados_payload_originais}
+        info = segmento.ler_segmento(msg_bytes)
+        if info is None and len(msg_bytes) >= segmento.TAM_CABECALHO:
+            self.metricas.falhas_checksum += 1
+            log.debug("[ACK RECV] Checksum inválido no ACK.")
+        return info
 
     # <<< NOVA FUNÇÃO: Thread para receber ACKs >>>
     def _receber_acks(self):
         """Função executada pela thread dedicada ao recebimento de ACKs."""
         while self.rodando:
             try:
-                msg_bytes, _ = self.sock.recvfrom(2048) # Espera por dados (com timeout)
-                info = self._ler_segmento(msg_bytes)
-                if info and info['flag'] == 1: # Se for um ACK válido
-                    with self.lock: # <<< Protege acesso às variáveis compartilhadas
-                        mudou_janela = self._processar_ack_recebido(info['ack'])
-                        if mudou_janela:
-                            # Tenta enviar mais segmentos se a janela deslizou
-                            self._enviar_novos_segmentos()
+                # Espera por dados (com timeout) e trata de uma vez tudo o que já chegou
+                self._tratar_datagramas(receber_lote(self.sock, self.tam_buffer_recepcao))
             except socket.timeout:
                 continue # Timeout é normal, apenas tenta receber de novo
             except OSError:
                 if self.rodando: # Se o socket foi fechado, encerra a thread
-                    print("[ACK Thread] Socket fechado.")
+                    log.info("[ACK Thread] Socket fechado.")
                 break
             except Exception as e:
                 if self.rodando:
-                    print(f"[ACK Thread] Erro inesperado: {e}")
-
-    # <<< NOVAS FUNÇÕES: Controle de Timers Individuais >>>
-    def _iniciar_timer(self, seq):
-        """Inicia um timer individual para o segmento 'seq'."""
-        self._parar_timer(seq) # Garante que não haja timer antigo rodando para o mesmo seq
-        # Cria um timer que chamará _tratar_timeout(seq) após TEMPO segundos
-        timer = threading.Timer(TEMPO, self._tratar_timeout, args=(seq,))
-        self.tempos_envio[seq] = timer # Armazena o objeto Timer
-        timer.start()
-
-    def _parar_timer(self, seq):
-        """Para e remove o timer associado ao segmento 'seq'."""
-        timer = self.tempos_envio.pop(seq, None) # Remove o timer do dicionário
-        if timer:
-            timer.cancel() # Cancela a execução do timer se ele ainda não disparou
-
-    # <<< MODIFICADO: Função chamada pelo Timer quando ocorre Timeout >>>
-    def _tratar_timeout(self, seq):
-        """Função chamada por um objeto threading.Timer quando o tempo expira."""
+                    log.erro("[ACK Thread] Erro inesperado: %s", e)
+
+    def _tratar_datagramas(self, mensagens, addr=None):
+        """Processa um lote de datagramas sob uma única aquisição do lock.
+
+        Os segmentos confirmados por todos os ACKs do lote são marcados
+        primeiro; a base desliza e novos segmentos são enviados uma vez só.
+        """
+        # Checksum e decodificação fora do lock
+        acks = []
+        recuperados = 0 # ACKs avisando de segmentos reconstruídos pela paridade
+        for msg_bytes in mensagens:
+            info = self._ler_segmento(msg_bytes)
+            if info and info['flag'] == 1 and info['conexao'] == self.conexao: # Se for um ACK válido
+                blocos = segmento.ler_blocos_sack(info['dados']) if info['flags'] & segmento.FLAG_SACK else None
+                acks.append((info['ack'], blocos))
+                if info['flags'] & segmento.FLAG_FEC:
+                    recuperados += 1
+        if not acks:
+            return
+        with self.lock: # <<< Protege acesso às variáveis compartilhadas
+            if recuperados:
+                self.metricas.recuperados_fec += recuperados
+                if self.fec is not None:
+                    self.fec.ao_perda(recuperados)
+            confirmados = 0
+            for ack, blocos in acks:
+                if blocos is not None:
+                    novos = self._aplicar_sack(ack, blocos)
+                else:
+                    novos = self._confirmar_segmento(segmento.seq_absoluto(ack, self.base))
+                if not novos:
+                    self.metricas.acks_duplicados += 1
+                confirmados += novos
+            if confirmados:
+                self._deslizar_base()
+                self._retransmitir_perdidos()
+                # Tenta enviar mais segmentos: a janela deslizou ou liberou bytes em voo
+                self._enviar_novos_segmentos()
+        # Repõe, fora do lock, os payloads que a janela consumiu
+        self._ler_fontes()
+
+    # Anel de slots
+    def _slot(self, posicao: int) -> _Slot:
+        """Slot na 'posicao' a partir da base (0 = segmento da base)."""
+        return self._slots[(self._inicio + posicao) % self.capacidade]
+
+    def _posicao(self, seq: int) -> int:
+        """Posição do primeiro slot com seq >= 'seq' (busca binária: os slots estão em ordem de seq)."""
+        slots, inicio, capacidade = self._slots, self._inicio, self.capacidade
+        baixo, alto = 0, self._em_uso
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if slots[(inicio + meio) % capacidade].seq < seq:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def _slot_de(self, seq: int):
+        """Slot do segmento 'seq' em voo (ou confirmado acima da base), ou None."""
+        posicao = self._posicao(seq)
+        if posicao < self._em_uso:
+            slot = self._slot(posicao)
+            if slot.seq == seq:
+                return slot
+        return None
+
+    # Controle de Timers Individuais (todos na mesma roda de temporização)
+    def _iniciar_timer(self, slot: _Slot):
+        """(Re)arma o timeout do segmento do slot."""
+        slot.em_timer = True
+        self.roda.armar(slot.seq, self.rtt.rto)
+
+    def _parar_timer(self, slot: _Slot):
+        """Cancela o timeout do segmento do slot."""
+        if slot.em_timer:
+            slot.em_timer = False
+            self.roda.cancelar(slot.seq)
+
+    def _reenviar(self, slot: _Slot):
+        slot.retransmissoes += 1 # Karn: o RTT deste segmento não será medido
+        self.metricas.retransmitidos += 1
+        if self.fec is not None:
+            self.fec.ao_perda()
+        self._transmitir(slot.seq, slot.payload)
+        self._iniciar_timer(slot) # Reinicia o timer para este segmento
+
+    # Função chamada pela roda quando um ou mais timeouts vencem
+    def _tratar_timeouts(self, seqs):
+        """Retransmite, sob um único lock, todos os segmentos cujo prazo venceu."""
         with self.lock: # <<< Protege acesso
-            # Se o segmento já foi confirmado enquanto o timer estava 'voando', ignora
-            if seq in self.acks_confirmados:
-                return
-            # Se o segmento não está mais no buffer (foi confirmado e base deslizou), ignora
-            if seq not in self.buffer_segmentos:
+            if _CHAVE_PARIDADE in seqs:
+                seqs = [seq for seq in seqs if seq != _CHAVE_PARIDADE]
+                if self._grupo_fec:
+                    self._fechar_grupo_fec()
+            # Ignora segmentos confirmados enquanto o timer estava 'voando' ou já deslizados
+            slots = [slot for slot in map(self._slot_de, seqs)
+                     if slot is not None and slot.em_timer and not slot.confirmado]
+            if not slots:
                 return
-
-            print(f"[TIMEOUT] Reenviando segmento {seq}")
-            segmento_bytes, _ = self.buffer_segmentos[seq] # Pega os bytes para reenviar
-            try:
-                self.sock.sendto(segmento_bytes, self.dest)
-                self._iniciar_timer(seq) # Reinicia o timer para este segmento
-            except Exception as e:
-                print(f"Erro ao reenviar segmento {seq} no timeout: {e}")
-                # Não remove do buffer, tentará reenviar no próximo ciclo ou timeout
-
-    # (Função _processar_ack_recebido - Sem Mudanças Funcionais, mas agora chamada pela thread de ACK)
-    def _processar_ack_recebido(self, ack_num_recebido):
-        """Processa um ACK, marca como confirmado e desliza a janela."""
-        # Acesso a self.acks_confirmados, self.tempos_envio, self.base, self.buffer_segmentos
+            self.rtt.backoff() # Um timeout dobra o RTO (uma vez por lote)
+            self.controle.ao_timeout(self.bytes_em_voo)
+            metricas = self.metricas
+            metricas.registrar_janela(self.controle.janela)
+            for slot in slots:
+                metricas.timeouts += 1
+                log.debug("[TIMEOUT] Reenviando segmento %d", slot.seq)
+                self._reenviar(slot)
+
+    def _aplicar_sack(self, ack_cumulativo: int, blocos: list) -> int:
+        """Marca os segmentos cobertos por um ACK seletivo; retorna quantos eram novos."""
         # PRECISA ser chamado dentro de 'with self.lock:'
-        if ack_num_recebido in self.acks_confirmados or ack_num_recebido < self.base:
+        # Tudo antes do ACK cumulativo, depois cada bloco [início, fim)
+        intervalos = [(self.base, segmento.seq_absoluto(ack_cumulativo, self.base))]
+        for inicio, fim in blocos:
+            inicio = segmento.seq_absoluto(inicio, self.base)
+            intervalos.append((inicio, segmento.seq_absoluto(fim, inicio)))
+        novos = 0
+        for inicio, fim in intervalos:
+            posicao = self._posicao(inicio)
+            while posicao < self._em_uso:
+                slot = self._slot(posicao)
+                if slot.seq + slot.bits > fim:
+                    break
+                novos += self._confirmar(slot)
+                posicao += 1
+        return novos
+
+    def _confirmar_segmento(self, ack_num_recebido) -> bool:
+        """Marca um segmento em voo como confirmado (sem deslizar a janela)."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        slot = self._slot_de(ack_num_recebido)
+        return slot is not None and self._confirmar(slot)
+
+    def _confirmar(self, slot: _Slot) -> bool:
+        if slot.confirmado:
             return False
-        self.acks_confirmados.add(ack_num_recebido)
-        self._parar_timer(ack_num_recebido) # <<< MODIFICADO: Chama _parar_timer
-        print(f"[ACK] Recebido para segmento {ack_num_recebido}")
-        #Deslizar a Janela
+        metricas = self.metricas
+        slot.confirmado = True
+        self._confirmados += 1
+        self._parar_timer(slot)
+        bytes_confirmados = slot.bits // 8
+        self.bytes_em_voo -= bytes_confirmados
+        self.controle.ao_confirmar(bytes_confirmados, self.bytes_em_voo)
+        metricas.acks += 1
+        metricas.bytes_entregues += len(slot.payload)
+        metricas.registrar_janela(self.controle.janela)
+        if slot.retransmissoes == 0: # Karn: ignora segmentos retransmitidos
+            rtt = self.agora() - slot.enviado_em
+            self.rtt.amostra(rtt)
+            metricas.registrar_rtt(rtt)
+        log.debug("[ACK] Recebido para segmento %d", slot.seq)
+        return True
+
+    def _deslizar_base(self):
+        """Desliza a base sobre os segmentos confirmados e libera seus slots."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
         mudou_base = False
-        while self.base in self.acks_confirmados:
-            dados_segmento = self.buffer_segmentos.pop(self.base, None)
-            if dados_segmento is None:
+        while self._em_uso:
+            slot = self._slots[self._inicio]
+            if not slot.confirmado:
                 break
-            _, tamanho_segmento_bits = dados_segmento
-            self.acks_confirmados.remove(self.base) # Remove do set de ACKs pendentes
-            # Note: Não precisamos mais remover de self.tempos_envio aqui, _parar_timer já fez
-            self.base += tamanho_segmento_bits
-            print(f"Janela deslizou, nova base (em bits): {self.base}")
+            self.base += slot.bits
+            slot.liberar() # Solta o payload do segmento
+            self._inicio = (self._inicio + 1) % self.capacidade
+            self._em_uso -= 1
+            self._confirmados -= 1
             mudou_base = True
-        return mudou_base # Retorna True se a base deslizou
+        if mudou_base:
+            log.debug("Janela deslizou, nova base (em bits): %d", self.base)
+            paridades = self._paridades_em_voo
+            while paridades and paridades[0][0] <= self.base:
+                self.bytes_em_voo -= paridades.popleft()[1]
+            self._concluir_confirmacoes()
+
+    def _retransmitir_perdidos(self):
+        """Fast retransmit dos segmentos com 'limiar' ou mais segmentos posteriores já confirmados."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        limiar = self.limiar_retransmissao
+        # Depois de deslizar a base, todo slot confirmado está acima de um buraco
+        acima = self._confirmados
+        if not limiar or acima < limiar:
+            return
+        perdidos = []
+        posicao = 0
+        while acima >= limiar and posicao < self._em_uso:
+            slot = self._slot(posicao)
+            if slot.confirmado:
+                acima -= 1
+            elif not slot.rapido:
+                perdidos.append(slot)
+            posicao += 1
+        if not perdidos:
+            return
+        if self.base >= self.fim_recuperacao:
+            # Uma redução da janela por episódio de perda (até tudo o que estava em voo ser confirmado)
+            self.controle.ao_perda(self.bytes_em_voo)
+            ultimo = self._slot(self._em_uso - 1)
+            self.fim_recuperacao = ultimo.seq + ultimo.bits
+            self.metricas.registrar_janela(self.controle.janela)
+        for slot in perdidos:
+            slot.rapido = True # Se este reenvio se perder, fica para o timeout
+            self.metricas.retransmissoes_rapidas += 1
+            log.debug("[FAST RETRANSMIT] Reenviando segmento %d", slot.seq)
+            self._reenviar(slot)
+
+    def _concluir_confirmacoes(self):
+        """Conclui as mensagens cujo último segmento ficou para trás da base."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        concluiu = False
+        pendentes = self.confirmacoes_pendentes
+        while pendentes and pendentes[0].fim is not None and pendentes[0].fim <= self.base:
+            confirmacao = pendentes.popleft()
+            confirmacao.concluida_em = self.agora()
+            confirmacao.concluida = True
+            concluiu = True
+        if concluiu or self._tudo_confirmado():
+            self.cond.notify_all()
+
+    def _tudo_confirmado(self) -> bool:
+        return self.base == self.prox_seq_num and not self.fontes and not self._lidos
+
+    def _numerar(self, payload):
+        """Dá o próximo seq ao payload e o coloca na fila de envio."""
+        seq = self.prox_seq_num
+        tamanho_segmento_bits = segmento.tamanho_segmento(len(payload), self.estendido) * 8
+        self.buffer_envio.append((seq, payload, tamanho_segmento_bits))
+        log.debug("[FILA] Segmento %d preparado (%dB, %d bits)", seq, len(payload), tamanho_segmento_bits)
+        self.prox_seq_num += tamanho_segmento_bits
+        self.ultimo_seq_necessario = seq
+
+    def _numerar_da_fonte(self) -> bool:
+        """Numera o próximo payload já lido das fontes; False se não há nenhum à mão."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        while self._lidos:
+            payload, confirmacao = self._lidos.popleft()
+            if payload is None:
+                # Fonte esgotada: agora o fim da mensagem é conhecido
+                confirmacao.fim = self.prox_seq_num
+                self._concluir_confirmacoes()
+                continue
+            if confirmacao.inicio is None:
+                confirmacao.inicio = self.prox_seq_num
+            self._numerar(payload)
+            confirmacao.segmentos += 1
+            return True
+        return False
+
+    def _ler_fontes(self):
+        """Lê payloads das fontes fora do lock da janela e envia os que a janela aceitar.
+
+        O read() dos arquivos e os page faults do mmap acontecem aqui; o lock só
+        é adquirido para entregar cada lote e numerar e enviar. Se outra thread
+        já está lendo, retorna na hora: quem lê confere de novo, depois de
+        liberar a leitura, se a janela consumiu os lidos nesse meio tempo.
+        """
+        # NÃO pode ser chamado dentro de 'with self.lock:'
+        while self.fontes and len(self._lidos) < PRE_LEITURA:
+            if not self._lock_leitura.acquire(blocking=False):
+                return
+            try:
+                self._ler_lote()
+            finally:
+                self._lock_leitura.release()
+
+    def _ler_lote(self):
+        # PRECISA ser chamado com _lock_leitura: só quem lê tira fontes da fila
+        payloads, confirmacao = self.fontes[0]
+        lote = []
+        esgotou = False
+        for _ in range(PRE_LEITURA - len(self._lidos)):
+            try:
+                payload = next(payloads, None)
+            except Exception as e:
+                log.erro("Erro ao ler a fonte do fluxo: %s", e)
+                confirmacao.erro = e
+                payload = None
+            if not payload:
+                lote.append((None, confirmacao))
+                esgotou = True
+                break
+            lote.append((payload, confirmacao))
+        with self.lock:
+            if esgotou:
+                self.fontes.popleft()
+            self._lidos.extend(lote)
+            self._enviar_novos_segmentos()
 
     # (Função _tentar_receber_ack foi removida, a lógica está em _receber_acks)
-    # (Função _verificar_timeouts foi removida, a lógica está em _tratar_timeout)
+    # (Função _verificar_timeouts foi removida, a lógica está em _tratar_timeouts)
 
     # <<< MODIFICADO: Função de Envio >>>
     def _enviar_novos_segmentos(self):
         """Envia novos segmentos da fila buffer_envio se a janela permitir."""
-        # Acesso a self.buffer_envio, self.buffer_segmentos, self.tempos_envio
         # PRECISA ser chamado dentro de 'with self.lock:'
-        # Envia enquanto houver pacotes "não enviados" ou "não confirmados"
-        # E o número de pacotes "em voo" (com timer ativo) for menor que JANELA
-        while (len(self.tempos_envio) < JANELA) and self.buffer_envio:
+        # Envia enquanto houver pacotes "não enviados", houver slot livre no anel
+        # e o próximo segmento couber na janela de congestionamento (em bytes).
+        # Das fontes, só numera o que _ler_fontes() já leu (no máximo PRE_LEITURA à frente)
+        while self._em_uso < self.capacidade and (self.buffer_envio or self._numerar_da_fonte()):
             seq, payload_bytes, tamanho_segmento_bits = self.buffer_envio[0] # Pega sem remover ainda
-
-            # Se este segmento já está no buffer (foi preparado mas ainda não enviado/confirmado)
-            # E ainda não tem um timer (significa que não foi enviado ainda)
-            if seq not in self.tempos_envio:
-                self.buffer_envio.pop(0) # Remove da fila de espera
-                segmento_bytes = self._montar_segmento(seq, 0, 0, payload_bytes)
-                self.buffer_segmentos[seq] = (segmento_bytes, tamanho_segmento_bits) # Guarda para retransmitir
-                try:
-                    self.sock.sendto(segmento_bytes, self.dest)
-                    print(f"[ENVIO] Segmento {seq} enviado pela primeira vez")
-                    self._iniciar_timer(seq) # <<< MODIFICADO: Inicia timer individual
-                except Exception as e:
-                    print(f"Erro ao enviar segmento {seq}: {e}")
-                    # Devolve para o início da fila se falhar o envio
-                    self.buffer_envio.insert(0, (seq, payload_bytes, tamanho_segmento_bits))
-                    self.buffer_segmentos.pop(seq, None) # Remove do buffer de retransmissão
-                    break # Para de tentar enviar por ora
-            else:
-                 # Se o primeiro da fila já foi enviado (tem timer),
-                 # não há novos segmentos para enviar no momento
-                 break
+            custo = tamanho_segmento_bits // 8
+            if self.fec is not None and len(self._grupo_fec) + 1 >= self.fec.k:
+                # Este segmento fecha o grupo: a paridade sai junto e também precisa caber na janela
+                custo += self._bytes_paridade(self._grupo_fec + [payload_bytes])
+            if not self.controle.pode_enviar(self.bytes_em_voo, custo):
+                break
+            if (self.janela_receptor is not None
+                    and (seq + tamanho_segmento_bits - self.base) // 8 > self.janela_receptor):
+                break # O destinatário descartaria este segmento
+
+            self.buffer_envio.popleft() # Remove da fila de espera
+            indice = (self._inicio + self._em_uso) % self.capacidade
+            slot = self._slots[indice] # Guarda para retransmitir
+            if slot is None:
+                slot = self._slots[indice] = _Slot()
+            slot.ocupar(seq, tamanho_segmento_bits, payload_bytes, self.agora())
+            self._em_uso += 1
+            self.bytes_em_voo += tamanho_segmento_bits // 8
+            self.metricas.enviados += 1
+            log.debug("[ENVIO] Segmento %d enviado pela primeira vez", seq)
+            self._iniciar_timer(slot) # <<< MODIFICADO: Inicia timer individual
+            self._transmitir(seq, payload_bytes) # Montagem e envio fora do lock (thread de transmissão)
+            if self.fec is not None:
+                self._agrupar_fec(seq, payload_bytes, tamanho_segmento_bits)
+        if self._em_uso - self._confirmados > self.pico_em_voo:
+            self.pico_em_voo = self._em_uso - self._confirmados
+        if (self._grupo_fec and not self.buffer_envio and not self._lidos and not self.fontes
+                and _CHAVE_PARIDADE not in self.roda):
+            # Acabaram os dados por ora: se nada completar o grupo logo, ele sai incompleto
+            # (senão uma perda no fim da transferência só seria recuperada pelo timeout)
+            self.roda.armar(_CHAVE_PARIDADE, ESPERA_PARIDADE)
+
+    def _bytes_paridade(self, payloads: list) -> int:
+        """Tamanho no fio do segmento de paridade de um grupo."""
+        tamanho = tamanho_paridade(len(payloads), max(len(payload) for payload in payloads))
+        return segmento.tamanho_segmento(tamanho, segmento.precisa_estender(tamanho, self.conexao))
+
+    def _agrupar_fec(self, seq: int, payload, bits: int):
+        """Põe um segmento novo no grupo do FEC e envia a paridade quando o grupo completa."""
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        if not self._grupo_fec:
+            self._inicio_grupo_fec = seq
+        self._grupo_fec.append(payload)
+        self._fim_grupo_fec = seq + bits
+        self.fec.ao_enviar()
+        if len(self._grupo_fec) >= self.fec.k:
+            self._fechar_grupo_fec()
+
+    def _fechar_grupo_fec(self):
+        # PRECISA ser chamado dentro de 'with self.lock:'
+        payloads, self._grupo_fec = self._grupo_fec, []
+        self.roda.cancelar(_CHAVE_PARIDADE)
+        if self._fim_grupo_fec <= self.base:
+            return # Grupo incompleto já todo confirmado enquanto esperava: a paridade não serviria
+        # Cobrada da janela como um segmento de dados (o grupo completo já reservou o espaço em
+        # _enviar_novos_segmentos; a de um grupo incompleto só sai quando os dados acabaram)
+        tamanho = self._bytes_paridade(payloads)
+        self.bytes_em_voo += tamanho
+        self._paridades_em_voo.append((self._fim_grupo_fec, tamanho))
+        self.metricas.paridades += 1
+        log.debug("[FEC] Paridade de %d segmentos a partir de %d", len(payloads), self._inicio_grupo_fec)
+        self._transmitir(self._inicio_grupo_fec, payloads, self._montar_paridade)
 
     # <<< MODIFICADO: Função para Enfileirar Mensagens >>>
-    def enfileirar_mensagens(self, lista_mensagens: list):
-        """Coloca mensagens na fila de envio, dividindo e aplicando numeração."""
+    def enfileirar_mensagens(self, lista_mensagens: list) -> list:
+        """Coloca mensagens na fila de envio, dividindo e aplicando numeração.
+
+        Retorna uma Confirmacao por mensagem, na mesma ordem; dá para esperar
+        uma delas enquanto lotes seguintes continuam sendo enfileirados.
+        """
         with self.lock: # <<< Protege acesso
             if isinstance(lista_mensagens, str):
                 lista_mensagens = [lista_mensagens]
 
-            novos_seqs = [] # Guarda os seq nums gerados nesta chamada
+            confirmacoes = []
             for mensagem in lista_mensagens:
                 mensagem_bytes = mensagem.encode('utf-8') if isinstance(mensagem, str) else mensagem
-                idx = 0
-                while idx < len(mensagem_bytes):
-                    payload = mensagem_bytes[idx : idx + TAM_PAYLOAD_BYTES]
-                    if not payload:
-                        break
-
-                    seq = self.prox_seq_num
-                    dados_bin = bytes_para_string_binaria(payload)
-                    dados_bin_len_padded = ((len(dados_bin) + 15) // 16) * 16
-                    tamanho_segmento_bits = 96 + dados_bin_len_padded
-
-                    # Adiciona na fila de espera para envio
-                    self.buffer_envio.append((seq, payload, tamanho_segmento_bits))
-                    self.seq_nums_gerados.add(seq) # Guarda o seq num gerado
-                    novos_seqs.append(seq)
-
-                    print(f"[FILA] Segmento {seq} preparado ({len(payload)}B, {tamanho_segmento_bits} bits)")
-
-                    self.prox_seq_num += tamanho_segmento_bits
-                    self.ultimo_seq_necessario = seq
-                    idx += TAM_PAYLOAD_BYTES
-
-            # Tenta enviar imediatamente o que couber na janela
-            self._enviar_novos_segmentos()
-        return novos_seqs # Retorna os seq nums gerados
+                # Como nos fluxos, a mensagem é fatiada (sem cópia) e numerada só quando a
+                # janela abre; a Confirmacao recebe o intervalo de seqs nesse momento
+                confirmacao = Confirmacao(self)
+                self.fontes.append((_fatias(mensagem_bytes, self.mss), confirmacao))
+                self.confirmacoes_pendentes.append(confirmacao)
+                confirmacoes.append(confirmacao)
+
+        # Lê (fora do lock) e envia imediatamente o que couber na janela
+        self._ler_fontes()
+        return confirmacoes
+
+    def enfileirar_fluxo(self, origem) -> Confirmacao:
+        """Envia um arquivo inteiro sem carregá-lo na memória.
+
+        'origem' é um caminho (lido via mmap) ou um arquivo binário aberto
+        (lido com read(), mss bytes por vez; quem chamou continua dono dele).
+        Os segmentos só são lidos e numerados quando a janela abre, então a
+        memória fica limitada aos segmentos em voo. Mensagens enfileiradas
+        depois seguem o fluxo, na ordem.
+        """
+        if isinstance(origem, (str, os.PathLike)):
+            payloads = _fatias(_mapear(origem), self.mss)
+        elif isinstance(origem, io.TextIOBase):
+            raise TypeError("enfileirar_fluxo precisa de um arquivo aberto em modo binário")
+        elif hasattr(origem, 'read'):
+            payloads = _blocos_arquivo(origem, self.mss)
+        else:
+            raise TypeError("A origem deve ser um caminho ou um arquivo binário aberto")
+        with self.lock:
+            confirmacao = Confirmacao(self)
+            self.fontes.append((payloads, confirmacao))
+            self.confirmacoes_pendentes.append(confirmacao)
+        self._ler_fontes()
+        return confirmacao
+
+    def estatisticas_lock(self) -> dict:
+        """Aquisições, disputas, espera e tempo de posse (s) do lock da janela."""
+        return self.lock.snapshot()
+
+    def estimativas_rtt(self) -> dict:
+        """SRTT, RTTVAR e RTO atuais (em segundos)."""
+        return self.rtt.estimativas()
+
+    def estatisticas(self) -> dict:
+        """Estado atual do remetente: janela, bytes em voo e estimativas de RTT."""
+        with self.lock:
+            stats = self.controle.estado()
+            stats.update({
+                'base': self.base,
+                'prox_seq_num': self.prox_seq_num,
+                'bytes_em_voo': self.bytes_em_voo,
+                'segmentos_em_voo': self._em_uso - self._confirmados,
+                'fila': len(self.buffer_envio),
+                'fontes': len(self.fontes),
+                'lidos': len(self._lidos),
+                'pico_em_voo': self.pico_em_voo,
+            })
+            if self.fec is not None:
+                stats.update(self.fec.estado())
+        stats.update(self.rtt.estimativas())
+        return stats
+
+    def _esperar(self, pronto, timeout) -> bool:
+        """Espera pronto() (ou o remetente fechar); no transporte síncrono, avança a simulação."""
+        if self.canal is not None and self.canal.sincrono:
+            # Sem lock: os eventos do transporte (ACKs, timeouts) o adquirem
+            return self.canal.executar_ate(lambda: pronto() or not self.rodando, timeout)
+        with self.cond:
+            return self.cond.wait_for(lambda: pronto() or not self.rodando, timeout)
 
     # <<< MODIFICADO: Função para Esperar Confirmação >>>
-    def esperar_confirmacao_total(self):
+    def esperar_confirmacao_total(self, timeout=None) -> bool:
         """Espera (bloqueia) até que todos os segmentos enfileirados sejam confirmados."""
-        print(f"Aguardando confirmação para todos os segmentos...")
+        log.info("Aguardando confirmação para todos os segmentos...")
 
-        # Espera enquanto o conjunto de todos os seq nums gerados
-        # não for um subconjunto dos acks confirmados.
-        while True:
-            with self.lock: # <<< Protege acesso
-                if self.seq_nums_gerados.issubset(self.acks_confirmados):
-                    break # Todos foram confirmados
-            time.sleep(0.1) # Pausa para não consumir CPU excessivamente
+        # Acordado pela thread de ACK quando a base alcança o último seq gerado
+        self._esperar(self._tudo_confirmado, timeout)
+        with self.lock:
+            confirmado = self._tudo_confirmado()
 
-        print("[FIM] Todos os segmentos enfileirados foram confirmados.") #
+        if confirmado:
+            log.info("[FIM] Todos os segmentos enfileirados foram confirmados.")
+        return confirmado
 
     # <<< MODIFICADO: Função para Encerrar >>>
     def fechar(self):
         """Encerra a thread de ACK, fecha o socket e cancela timers."""
-        print("Fechando o remetente...")
-        self.rodando = False # Sinaliza para a thread de ACK parar
-        if self.th_ack.is_alive():
+        log.info("Fechando o remetente...")
+        with self.cond:
+            self.rodando = False # Sinaliza para a thread de ACK parar
+            self.cond.notify_all() # Libera quem está esperando confirmações
+        if self.th_ack is not None and self.th_ack.is_alive():
              self.th_ack.join(timeout=1.0) # Espera a thread de ACK terminar (com timeout)
-        self.sock.close()
-        with self.lock: # Cancela todos os timers restantes
-            for seq in list(self.tempos_envio.keys()):
-                self._parar_timer(seq)
-        print("[FECHADO]")
+        self.roda.parar() # Cancela todos os timers restantes
+        if self.tx is not None:
+            self.tx.parar()
+        if self.canal is not None:
+            self.canal.remover(self) # O socket é do canal e continua aberto para os outros fluxos
+        else:
+            self.sock.close()
+        with self.lock:
+            for posicao in range(self._em_uso):
+                self._slot(posicao).em_timer = False
+        log.info("[FECHADO]")
@@ -0,0 +1,71 @@
+import os, time
+
+import checksum
+
+# Microbenchmark do checksum: implementação antiga (strings de '0'/'1')
+# contra os backends de checksum.py, para vários tamanhos de payload.
+# Uso: python bench_checksum.py
+
+TAMANHOS = [16, 64, 256, 1024, 4096, 16384, 65507]
+TEMPO_MINIMO = 0.2 # Segundos medidos por caso
+
+
+# Implementação original (Janela.py / functs.py), mantida aqui como referência
+def _binary_sum_especial(A: str, B: str) -> str:
+    soma = int(A, 2) + int(B, 2)
+    if soma >= 2 ** 16:
+        soma = (soma + 1) % (2 ** 16)
+    return bin(soma)[2:].zfill(16)
+
+def _calc_checksum_string(data: str) -> str:
+    if len(data) % 16 != 0:
+        data = data.ljust(((len(data) // 16) + 1) * 16, '0')
+    result = '0' * 16
+    for i in range(0, len(data), 16):
+        bloco = data[i:i + 16]
+        result = _binary_sum_especial(result, bloco)
+    return result
+
+def _checksum_string(dados: bytes) -> int:
+    # Inclui a conversão para string binária, como o Envio fazia a cada segmento
+    data = ''.join([bin(byte)[2:].zfill(8) for byte in dados])
+    return int(_calc_checksum_string(data), 2)
+
+
+def medir(funcao, dados) -> float:
+    """Tempo médio (em microssegundos) de uma chamada de funcao(dados)."""
+    repeticoes = 0
+    inicio = time.perf_counter()
+    while True:
+        funcao(dados)
+        repeticoes += 1
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= TEMPO_MINIMO:
+            return decorrido / repeticoes * 1e6
+
+
+def main():
+    nomes = ['string'] + list(checksum.BACKENDS)
+    print(f"{'bytes':>8} " + ' '.join(f"{nome:>12}" for nome in nomes) + f" {'verificar':>12}")
+    for tamanho in TAMANHOS:
+        dados = os.urandom(tamanho)
+        esperado = _checksum_string(dados)
+        tempos = [medir(_checksum_string, dados)]
+        for nome in nomes[1:]:
+            checksum.definir_backend(nome)
+            assert checksum.calc_checksum(dados) == esperado, f"backend {nome} divergiu em {tamanho} bytes"
+            tempos.append(medir(checksum.calc_checksum, dados))
+        checksum.definir_backend('auto')
+
+        # Fast path de verificação: segmento com o checksum nos bytes 8 e 9
+        segmento = bytearray(dados.ljust(12, b'\x00'))
+        segmento[8:10] = b'\x00\x00'
+        segmento[8:10] = checksum.calc_checksum(segmento).to_bytes(2, 'big')
+        assert checksum.verificar(segmento)
+        tempos.append(medir(checksum.verificar, bytes(segmento)))
+
+        print(f"{tamanho:>8} " + ' '.join(f"{t:>10.2f}us" for t in tempos))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+import argparse, json, os, platform, socket, sys, threading, time
+from collections import deque
+
+import registro
+import segmento
+from congestionamento import JanelaFixa, Reno
+from fec import politica_de
+from Janela import Envio, CAPACIDADE_JANELA
+from metricas import ExportadorJSONL
+from perturbacao import PerfilPerturbacao, AtrasoFixo
+from recepcao import Recepcao, JANELA_RECEPCAO
+from roteador_pc2 import Servidor, Operations, BUFFER_SIZE, MSS as MSS_ROTEADOR
+
+# Benchmark ponta a ponta em loopback: roteador (Servidor), destinatário
+# (Recepcao) e remetente (Envio) no mesmo processo, variando o tamanho do
+# payload (MSS), a janela, o modo de operação do roteador e o FEC do remetente.
+#
+# Cada caso envia mensagens em laço fechado e mede vazão, latência por mensagem (enfileirar ->
+# confirmação), taxa de retransmissão e tempo de CPU por MB. O resultado é
+# gravado em JSON e comparado com uma baseline salva, e o script sai com
+# código 1 se algum caso piorar além da tolerância.
+#
+# As mensagens sem confirmação somam ao menos duas janelas de payload e, com
+# janela fixa, o volume é de JANELAS_POR_CASO janelas, então é a janela (e
+# não o laço fechado) que limita o voo; a coluna "pico" mostra quantos segmentos
+# chegaram a estar em voo ao mesmo tempo, ao lado da disputa do lock. Os
+# buffers de recepção dos sockets são aumentados para caber duas janelas
+# (até net.core.rmem_max): sem isso, uma janela de 1000 segmentos grandes
+# transbordaria o buffer padrão do roteador e o caso mediria descartes.
+#
+# A baseline depende da máquina e não vai para o repositório: a primeira
+# execução sem ela (bench_e2e.py) grava o próprio resultado como baseline, e
+# as seguintes comparam os casos em comum. --salvar-baseline a substitui.
+#
+# Uso: python bench_e2e.py [--rapido] [--salvar-baseline] [--operacoes PERDA,ATRASO] [--fec sem,adaptativa] ...
+
+MSS_PADRAO = [16, 256, 1400]
+JANELAS_PADRAO = ['4', '16', 'reno']
+TAXA_PADRAO = 0.05 # Probabilidade por pacote nos modos de perda, corrupção, duplicação e reordenação
+ATRASO_PADRAO = 0.01 # Segundos no modo ATRASO
+TAMANHO_MENSAGEM = 4096
+VOLUME = 512 * 1024 # Bytes por caso (limitado a 2000 segmentos para MSS pequeno, salvo se a janela pedir mais)
+PENDENTES = 8 # Mínimo de mensagens sem confirmação (sobe com a janela)
+JANELAS_POR_CASO = 8 # Volume mínimo por caso, em janelas de payload
+LIMITE_CASO = 60.0 # Segundos por caso antes de desistir
+TOLERANCIA = 0.25
+SAIDA = 'bench_e2e.json'
+BASELINE = 'bench_e2e_baseline.json'
+
+# Métricas comparadas com a baseline: (chave, True se maior é melhor)
+COMPARADAS = [('vazao_mbps', True), ('latencia_p99_ms', False), ('cpu_s_por_mb', False)]
+
+
+def perfil_para(op: Operations, taxa: float, atraso: float) -> PerfilPerturbacao:
+    """Perfil do modo com probabilidade 'taxa' (os presets do roteador usam 100%)."""
+    match op:
+        case Operations.PERDA:
+            return PerfilPerturbacao(perda=taxa)
+        case Operations.CORRUPÇÃO:
+            return PerfilPerturbacao(corrupcao=taxa)
+        case Operations.ATRASO:
+            return PerfilPerturbacao(atraso=AtrasoFixo(atraso))
+        case Operations.DUPLICAÇÃO:
+            return PerfilPerturbacao(duplicacao=taxa)
+        case Operations.REORDENAÇÃO:
+            return PerfilPerturbacao(reordenacao=taxa)
+    return PerfilPerturbacao()
+
+
+def controle_para(janela: str):
+    return Reno() if janela == 'reno' else JanelaFixa(int(janela))
+
+
+def ampliar_buffer(sock, tamanho: int):
+    """SO_RCVBUF de ao menos 'tamanho' bytes (o kernel limita a net.core.rmem_max)."""
+    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) < tamanho:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, tamanho)
+
+
+def percentil(valores: list, fracao: float):
+    """Percentil por posição (nearest-rank) de uma lista ordenada."""
+    if not valores:
+        return None
+    indice = min(len(valores) - 1, max(0, int(round(fracao * len(valores) + 0.5)) - 1))
+    return valores[indice]
+
+
+def executar_caso(op: Operations, mss: int, janela: str, fec: str, args) -> dict:
+    caso = {'operacao': op.name, 'mss': mss, 'janela': janela}
+    if fec != 'sem':
+        caso['fec'] = fec
+    if op in (Operations.PERDA, Operations.CORRUPÇÃO, Operations.DUPLICAÇÃO, Operations.REORDENAÇÃO):
+        caso['taxa'] = args.taxa
+    elif op == Operations.ATRASO:
+        caso['atraso'] = args.atraso
+
+    srv = Servidor('127.0.0.1', 0, BUFFER_SIZE, LIMITE_CASO * 2, MSS_ROTEADOR)
+    srv.motor.rng.seed(args.semente) # Mesmas perturbações a cada execução
+    srv.definir_perfil(perfil_para(op, args.taxa, args.atraso))
+    th_roteador = threading.Thread(target=srv.executar_lotes, daemon=True)
+    th_roteador.start()
+    addr = srv.server_socket.getsockname()
+
+    recebidos = [0]
+    def contar(trecho):
+        recebidos[0] += len(trecho)
+
+    tamanho_segmento = segmento.tamanho_segmento(mss)
+    controle = controle_para(janela)
+    janela_bytes = JANELA_RECEPCAO if janela == 'reno' else int(janela) * tamanho_segmento
+    # Carga que enche a janela: pendentes com duas janelas de payload e, com janela fixa, volume de
+    # várias janelas (no Reno a janela do receptor é só o teto da cwnd; fica o volume padrão)
+    janela_payload = JANELA_RECEPCAO if janela == 'reno' else int(janela) * mss
+    pendentes_maximo = max(args.pendentes, -(-2 * janela_payload // args.tamanho_mensagem))
+    volume = min(args.volume, mss * 2000)
+    if janela != 'reno':
+        volume = max(volume, JANELAS_POR_CASO * janela_payload)
+    caso['pendentes'] = pendentes_maximo
+    r = Recepcao(*addr, janela=max(JANELA_RECEPCAO, 2 * janela_bytes), mss=mss, entregar=contar)
+    e = Envio(*addr, controle=controle, mss=mss, janela_receptor=r.capacidade, thread_tx=not args.sem_tx,
+              fec=politica_de(fec),
+              capacidade=max(CAPACIDADE_JANELA, 2 * int(janela)) if janela != 'reno' else CAPACIDADE_JANELA)
+    for sock in (srv.server_socket, r.sock, e.sock):
+        ampliar_buffer(sock, 2 * janela_bytes)
+    r.iniciar()
+    exportador = None
+    if args.metricas_jsonl:
+        # Roteador, destinatário e remetente, uma linha cada por intervalo, marcadas com o caso
+        exportador = ExportadorJSONL(args.metricas_jsonl, [srv.metricas, r.metricas, e.metricas],
+                                     args.intervalo_metricas, extra={'caso': chave(caso)}).iniciar()
+
+    mensagens = max(1, volume // args.tamanho_mensagem)
+    mensagem = os.urandom(args.tamanho_mensagem)
+    latencias = []
+    pendentes = deque()
+    ok = True
+    inicio, cpu_inicio = time.perf_counter(), time.process_time()
+    prazo = inicio + LIMITE_CASO
+    try:
+        enviadas = 0
+        while enviadas < mensagens or pendentes:
+            if enviadas < mensagens and len(pendentes) < pendentes_maximo:
+                pendentes.extend(e.enfileirar_mensagens([mensagem]))
+                enviadas += 1
+                continue
+            # As mensagens são confirmadas em ordem: espera a mais antiga
+            confirmacao = pendentes[0]
+            if not confirmacao.esperar(max(0.0, prazo - time.perf_counter())):
+                ok = False
+                break
+            latencias.append(pendentes.popleft().latencia)
+        decorrido = time.perf_counter() - inicio
+        cpu = time.process_time() - cpu_inicio
+        time.sleep(0.05) # Últimas entregas no destinatário
+    finally:
+        if exportador is not None:
+            exportador.parar()
+        metricas = e.metricas.snapshot(serie_janela=False)
+        lock = e.estatisticas_lock()
+        pico_em_voo = e.pico_em_voo
+        e.fechar()
+        r.fechar()
+        srv.rodando = False
+        th_roteador.join(timeout=2.0)
+
+    total = len(latencias) * args.tamanho_mensagem
+    latencias.sort()
+    p50, p99 = percentil(latencias, 0.5), percentil(latencias, 0.99)
+    caso.update({
+        'ok': ok and recebidos[0] == total,
+        'mensagens': len(latencias),
+        'bytes': total,
+        'tempo_s': round(decorrido, 4),
+        'vazao_mbps': round(total * 8 / decorrido / 1e6, 4) if decorrido > 0 else 0.0,
+        'latencia_p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+        'latencia_p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+        'retransmissao': round(metricas['retransmitidos'] / metricas['enviados'], 4) if metricas['enviados'] else 0.0,
+        'retransmissoes_rapidas': metricas['retransmissoes_rapidas'],
+        'timeouts': metricas['timeouts'],
+        'paridades': metricas['paridades'],
+        'recuperados_fec': r.metricas.recuperados_fec,
+        'cpu_s_por_mb': round(cpu / (total / 1e6), 4) if total else None,
+        # Lock da janela do remetente: disputas e tempo total esperando/segurando
+        'lock_disputadas': lock['disputadas'],
+        'lock_espera_ms': round(lock['espera_total'] * 1000, 3),
+        'lock_espera_max_ms': round(lock['espera_maxima'] * 1000, 3),
+        'lock_posse_ms': round(lock['posse_total'] * 1000, 3),
+        'pico_em_voo': pico_em_voo, # Mostra se a janela chegou a encher
+    })
+    return caso
+
+
+def chave(caso: dict) -> str:
+    texto = f"{caso['operacao']}/mss={caso['mss']}/janela={caso['janela']}"
+    return texto + f"/fec={caso['fec']}" if 'fec' in caso else texto
+
+
+def comparar(casos: list, baseline: dict, tolerancia: float) -> list:
+    """Lista de regressões (textos) em relação à baseline."""
+    anteriores = {chave(caso): caso for caso in baseline.get('casos', [])}
+    regressoes = []
+    for caso in casos:
+        anterior = anteriores.get(chave(caso))
+        if anterior is None:
+            continue
+        if anterior.get('ok') and not caso['ok']:
+            regressoes.append(f"{chave(caso)}: falhou (na baseline passava)")
+            continue
+        for metrica, maior_melhor in COMPARADAS:
+            atual, antes = caso.get(metrica), anterior.get(metrica)
+            if atual is None or not antes:
+                continue
+            variacao = (atual - antes) / antes
+            if (maior_melhor and variacao < -tolerancia) or (not maior_melhor and variacao > tolerancia):
+                regressoes.append(f"{chave(caso)}: {metrica} {antes} -> {atual} ({variacao:+.0%})")
+    return regressoes
+
+
+def imprimir_cabecalho():
+    print(f"{'caso':<48} {'ok':>3} {'tempo s':>8} {'Mbps':>9} {'p50 ms':>9} {'p99 ms':>9} {'retx':>7} {'FEC rec.':>8} "
+          f"{'CPU s/MB':>9} {'disputas':>9} {'espera ms':>10} {'posse ms':>9} {'pico':>6}")
+
+
+def imprimir_caso(caso: dict):
+    print(f"{chave(caso):<48} {'s' if caso['ok'] else 'N':>3} {caso['tempo_s']:>8.3f} {caso['vazao_mbps']:>9.3f} "
+          f"{caso['latencia_p50_ms'] or 0:>9.2f} {caso['latencia_p99_ms'] or 0:>9.2f} "
+          f"{caso['retransmissao']:>7.2%} {caso['recuperados_fec']:>8} {caso['cpu_s_por_mb'] or 0:>9.3f} "
+          f"{caso['lock_disputadas']:>9} {caso['lock_espera_ms']:>10.1f} {caso['lock_posse_ms']:>9.1f} "
+          f"{caso['pico_em_voo']:>6}", flush=True)
+
+
+def _lista(texto: str) -> list:
+    return [item.strip() for item in texto.split(',') if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do RDT em loopback")
+    parser.add_argument('--operacoes', default=','.join(op.name for op in Operations),
+                        help="Modos do roteador separados por vírgula")
+    parser.add_argument('--mss', default=','.join(map(str, MSS_PADRAO)), help="Tamanhos de payload (bytes)")
+    parser.add_argument('--janelas', default=','.join(JANELAS_PADRAO),
+                        help="Janelas fixas em segmentos, ou 'reno'")
+    parser.add_argument('--taxa', type=float, default=TAXA_PADRAO)
+    parser.add_argument('--atraso', type=float, default=ATRASO_PADRAO)
+    parser.add_argument('--tamanho-mensagem', type=int, default=TAMANHO_MENSAGEM)
+    parser.add_argument('--volume', type=int, default=VOLUME,
+                        help=f"Bytes por caso (com janela fixa, no mínimo {JANELAS_POR_CASO} janelas)")
+    parser.add_argument('--pendentes', type=int, default=PENDENTES,
+                        help="Mínimo de mensagens sem confirmação (no mínimo duas janelas de payload)")
+    parser.add_argument('--semente', type=int, default=1)
+    parser.add_argument('--saida', default=SAIDA)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true', help="Grava o resultado como nova baseline")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    parser.add_argument('--sem-tx', action='store_true',
+                        help="Remetente sem thread de transmissão (envia segurando o lock da janela)")
+    parser.add_argument('--fec', default='sem',
+                        help="FEC do remetente separados por vírgula: 'sem', 'adaptativa' ou K segmentos por paridade")
+    parser.add_argument('--rapido', action='store_true', help="Só MSS 1400 e janela reno")
+    parser.add_argument('--log', default='AVISO', help="Nível do registro durante o benchmark")
+    parser.add_argument('--metricas-jsonl', metavar='ARQUIVO',
+                        help="Acrescenta ao arquivo snapshots das métricas de cada caso (uma linha JSON por fonte)")
+    parser.add_argument('--intervalo-metricas', type=float, default=1.0, help="Segundos entre dois snapshots")
+    args = parser.parse_args(argv)
+
+    registro.definir_nivel(args.log)
+    operacoes = [Operations[nome.upper()] for nome in _lista(args.operacoes)]
+    lista_mss = [1400] if args.rapido else [int(mss) for mss in _lista(args.mss)]
+    janelas = ['reno'] if args.rapido else _lista(args.janelas)
+
+    casos = []
+    imprimir_cabecalho()
+    for op in operacoes:
+        for mss in lista_mss:
+            for janela in janelas:
+                for fec in _lista(args.fec):
+                    casos.append(executar_caso(op, mss, janela, fec, args))
+                    imprimir_caso(casos[-1])
+
+    resultado = {
+        'ambiente': {'python': platform.python_version(), 'plataforma': platform.platform(),
+                     'data': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'parametros': {chave_arg: valor for chave_arg, valor in vars(args).items()
+                       if chave_arg not in ('saida', 'baseline', 'salvar_baseline', 'log', 'metricas_jsonl',
+                                            'intervalo_metricas')},
+        'casos': casos,
+    }
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {args.saida}")
+
+    if args.salvar_baseline or not os.path.exists(args.baseline):
+        if not args.salvar_baseline:
+            print(f"Primeira execução: não havia baseline em {args.baseline}; este resultado passa a ser a baseline.")
+        with open(args.baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+        print(f"Baseline gravada em {args.baseline}; as próximas execuções comparam com ela.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as arquivo:
+        baseline = json.load(arquivo)
+    em_comum = {chave(caso) for caso in casos} & {chave(caso) for caso in baseline.get('casos', [])}
+    if not em_comum:
+        print(f"\nNenhum caso desta execução está na baseline {args.baseline}: nada foi comparado "
+              f"(rode com os mesmos parâmetros da baseline ou substitua-a com --salvar-baseline).")
+        return 0
+    regressoes = comparar(casos, baseline, args.tolerancia)
+    if regressoes:
+        print(f"\nREGRESSÕES (tolerância {args.tolerancia:.0%}):")
+        for texto in regressoes:
+            print("  " + texto)
+        return 1
+    print(f"\nSem regressões em relação a {args.baseline} ({len(em_comum)} de {len(casos)} casos comparados, "
+          f"tolerância {args.tolerancia:.0%}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import random, string, sys, time
+
+import functs
+
+# Ida e volta seg_message -> decode_segments (functs.py) com texto UTF-8,
+# para verificar que o tempo cresce linearmente com o tamanho da mensagem.
+# Uso: python bench_functs.py [MB ...]
+
+TAMANHOS_MB = [1, 10]
+
+
+def gerar_texto(tamanho: int) -> str:
+    """Texto de 'tamanho' caracteres misturando ASCII e caracteres de 2 a 4 bytes."""
+    alfabeto = string.ascii_letters + string.digits + ' áéíóúçãõ€𝄞'
+    bloco = ''.join(random.choice(alfabeto) for _ in range(4096))
+    return (bloco * (tamanho // len(bloco) + 1))[:tamanho]
+
+
+def main(argv=None):
+    tamanhos = [float(mb) for mb in (argv or TAMANHOS_MB)]
+    print(f"{'MB':>6} {'segmentos':>10} {'segmentar s':>12} {'decodificar s':>14} {'MB/s':>8}")
+    for mb in tamanhos:
+        texto = gerar_texto(int(mb * 1024 * 1024))
+        inicio = time.perf_counter()
+        segmentos = list(functs.seg_message(texto, 0))
+        meio = time.perf_counter()
+        recuperado = ''.join(functs.decode_segments(segmentos))
+        fim = time.perf_counter()
+        assert recuperado == texto, "ida e volta divergiu"
+        tamanho_mb = len(texto.encode('utf-8')) / 1e6
+        print(f"{mb:>6g} {len(segmentos):>10} {meio - inicio:>12.2f} {fim - meio:>14.2f} "
+              f"{tamanho_mb / (fim - inicio):>8.1f}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,123 @@
+import argparse, multiprocessing, socket, sys, time
+
+import registro
+import segmento
+from perturbacao import PerfilPerturbacao
+from roteador_pc2 import Servidor, BUFFER_SIZE, MSS
+
+# Pacotes por segundo do laço em lotes do roteador (executar_lotes) em função
+# do tamanho do lote: quantos datagramas são drenados a cada select().
+# O Python não expõe recvmmsg/sendmmsg; o lote é o dreno sem bloqueio de até N
+# recvfrom_into por select(), que é o que amortiza o custo fixo por pacote.
+#
+# Roteador e gerador rodam em processos separados (spawn). O gerador manda o
+# mesmo segmento o mais rápido que consegue durante --duracao segundos e o
+# destino só mantém a porta aberta. "kernel" é o que o gerador enviou e o
+# roteador nunca leu (buffer de recepção cheio); "envio" é o que o roteador
+# descartou com o buffer de envio cheio (MotorPerturbacao.descartados_envio).
+#
+# Uso: python bench_roteador.py [--lotes 1,4,16,64,256] [--duracao 2] [--tamanho 64]
+
+LOTES_PADRAO = [1, 4, 16, 64, 256]
+DURACAO = 2.0 # Segundos de carga por lote
+TAMANHO = 64 # Payload dos segmentos gerados (bytes)
+CONEXAO = 7
+RAJADA = 64 # sendto entre duas consultas ao relógio no gerador
+
+
+def _roteador(lote, conn):
+    registro.definir_nivel('AVISO') # Processo novo (spawn): não herda o nível do pai
+    srv = Servidor('127.0.0.1', 0, BUFFER_SIZE, 60, MSS)
+    srv.definir_perfil(PerfilPerturbacao())
+    conn.send(srv.server_socket.getsockname())
+
+    def ao_controle():
+        while conn.poll():
+            comando = conn.recv()
+            if comando == 'estatisticas':
+                conn.send((srv.metricas.recebidos, srv.metricas.enviados, srv.motor.contadores['descartados_envio']))
+            elif comando == 'parar':
+                srv.rodando = False
+
+    srv.executar_lotes(lote, conn, ao_controle)
+
+
+def _gerador(endereco, tamanho, duracao, conn):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    pacote = segmento.montar_segmento(0, 0, 0, bytes(tamanho), conexao=CONEXAO)
+    sock.sendto(pacote, endereco) # Registra o gerador como extremidade da conexão
+    conn.send('pronto')
+    conn.recv() # Largada
+    enviados = 0
+    inicio = time.monotonic()
+    fim = inicio + duracao
+    while time.monotonic() < fim:
+        for _ in range(RAJADA):
+            sock.sendto(pacote, endereco)
+        enviados += RAJADA
+    conn.send((enviados, time.monotonic() - inicio))
+    sock.close()
+
+
+def medir(lote: int, duracao: float, tamanho: int) -> dict:
+    contexto = multiprocessing.get_context('spawn')
+    conn_roteador, conn_filho = contexto.Pipe()
+    roteador = contexto.Process(target=_roteador, args=(lote, conn_filho), daemon=True)
+    roteador.start()
+    endereco = conn_roteador.recv()
+
+    # Destino: só mantém a porta aberta (sem ela o roteador receberia ICMP de porta inalcançável)
+    destino = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destino.bind(('127.0.0.1', 0))
+    destino.sendto(f"INIT_PC2:{CONEXAO}".encode(), endereco)
+
+    conn_gerador, conn_filho = contexto.Pipe()
+    gerador = contexto.Process(target=_gerador, args=(endereco, tamanho, duracao, conn_filho), daemon=True)
+    gerador.start()
+    conn_gerador.recv()
+    time.sleep(0.1) # Registro processado pelo roteador
+    conn_roteador.send('estatisticas')
+    recebidos, encaminhados, descartados = conn_roteador.recv()
+
+    conn_gerador.send('largada')
+    gerados, decorrido = conn_gerador.recv()
+    time.sleep(0.1) # O que ainda estava no buffer de recepção
+    conn_roteador.send('estatisticas')
+    recebidos_fim, encaminhados_fim, descartados_fim = conn_roteador.recv()
+    conn_roteador.send('parar')
+    roteador.join(timeout=2.0)
+    gerador.join(timeout=2.0)
+    destino.close()
+
+    recebidos = recebidos_fim - recebidos
+    return {
+        'lote': lote,
+        'gerados': gerados,
+        'recebidos': recebidos,
+        'encaminhados': encaminhados_fim - encaminhados,
+        'pps_recebidos': recebidos / decorrido,
+        'pps_encaminhados': (encaminhados_fim - encaminhados) / decorrido,
+        'descartes_kernel': max(0, gerados - recebidos),
+        'descartes_envio': descartados_fim - descartados,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pacotes por segundo do roteador por tamanho de lote")
+    parser.add_argument('--lotes', default=','.join(map(str, LOTES_PADRAO)),
+                        help="Tamanhos de lote separados por vírgula")
+    parser.add_argument('--duracao', type=float, default=DURACAO)
+    parser.add_argument('--tamanho', type=int, default=TAMANHO, help="Payload dos segmentos (bytes)")
+    args = parser.parse_args(argv)
+
+    print(f"{'lote':>6} {'gerados':>10} {'recebidos':>10} {'pps rx':>10} {'pps tx':>10} {'kernel':>8} {'envio':>7}")
+    for lote in (int(texto) for texto in args.lotes.split(',') if texto.strip()):
+        r = medir(lote, args.duracao, args.tamanho)
+        print(f"{r['lote']:>6} {r['gerados']:>10} {r['recebidos']:>10} {r['pps_recebidos']:>10.0f} "
+              f"{r['pps_encaminhados']:>10.0f} {r['descartes_kernel'] / max(1, r['gerados']):>8.1%} "
+              f"{r['descartes_envio']:>7}", flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
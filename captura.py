@@ -0,0 +1,397 @@
+import argparse, mmap, os, socket, struct, sys, threading, time, weakref
+
+import segmento
+
+# Captura de pacotes do roteador em arquivo binário, só de acréscimo.
+#
+# O arquivo começa com um cabeçalho (assinatura + instante de início, em
+# segundos de época) seguido de registros:
+#     instante (s desde o início, float64) | marca (u32) | direção (u8) |
+#     ações (u8, bits de ACOES) | origem (IPv4 + porta) | destino (IPv4 + porta) |
+#     tamanho (u16) | bytes do datagrama
+# A marca liga a ENTRADA de um pacote às suas SAÍDAS (zero, uma ou duas, com
+# duplicação). Cada captura começa com um registro SESSAO (as marcas
+# recomeçam nele); uma captura nova no mesmo arquivo continua acrescentando
+# registros, com instantes contados a partir do cabeçalho original.
+#
+# A gravação monta os registros em um buffer pré-alocado (pack_into, sem
+# objetos por pacote) e só escreve no arquivo quando ele enche ou no fechar().
+# A leitura (LeitorCaptura) usa mmap e entrega os bytes de cada datagrama como
+# view, sem cópia, válida até o próximo registro; fechar() (ou o with) libera o mapa.
+#
+# Uso: python captura.py resumir captura.rdtcap
+#      python captura.py reproduzir captura.rdtcap 127.0.0.1:55555 [--escala 2] [--direcao saida]
+
+ASSINATURA = b'RDTCAP\x00\x01'
+_CABECALHO = struct.Struct('!8sd')
+_REGISTRO = struct.Struct('!dIBB4sH4sHH')
+TAM_BUFFER = 1 << 20 # Bytes acumulados antes de escrever no arquivo
+
+ENTRADA = 0 # Datagrama que chegou ao roteador
+SAIDA = 1 # Datagrama encaminhado pelo roteador (depois das perturbações)
+SESSAO = 2 # Início de uma captura (sem dados)
+DIRECOES = ('entrada', 'saida')
+
+# Ações do MotorPerturbacao (e do roteador) e o seu bit no registro
+ACOES = ('PERDA', 'CORRUPÇÃO', 'ATRASO', 'DUPLICAÇÃO', 'REORDENAÇÃO', 'DESCARTE NA FILA', 'SEM ROTA', 'REGISTRO')
+_BIT_ACAO = {acao: 1 << indice for indice, acao in enumerate(ACOES)}
+_SEM_ENDERECO = (b'\x00' * 4, 0)
+
+
+def bits_acoes(acoes) -> int:
+    bits = 0
+    for acao in acoes:
+        bits |= _BIT_ACAO.get(acao, 0)
+    return bits
+
+
+def nomes_acoes(bits: int) -> tuple:
+    return tuple(acao for acao in ACOES if bits & _BIT_ACAO[acao])
+
+
+class GravadorCaptura:
+    """Grava os datagramas do roteador; registrar() pode ser chamado de várias threads."""
+
+    def __init__(self, caminho, tamanho_buffer: int = TAM_BUFFER):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'ab', buffering=0)
+        if self._arquivo.tell() == 0:
+            inicio_epoca = time.time()
+            self._arquivo.write(_CABECALHO.pack(ASSINATURA, inicio_epoca))
+        else:
+            with open(caminho, 'rb') as existente:
+                assinatura, inicio_epoca = _CABECALHO.unpack(existente.read(_CABECALHO.size))
+            if assinatura != ASSINATURA:
+                self._arquivo.close()
+                raise ValueError(f"{caminho} não é uma captura do roteador")
+        # Instantes relativos ao cabeçalho, medidos com o relógio monotônico
+        self._deslocamento = time.time() - inicio_epoca
+        self._inicio = time.monotonic()
+        self._buffer = bytearray(max(tamanho_buffer, _REGISTRO.size + segmento.TAM_MAX_DATAGRAMA))
+        self._view = memoryview(self._buffer)
+        self._usado = 0
+        self._lock = threading.Lock()
+        self._proxima_marca = 0
+        self._enderecos = {} # Cache {endereço: (IPv4 empacotado, porta)}
+        self.registros = 0
+        self.bytes = 0
+        self.registrar(SESSAO, 0, 0, None, None, b'')
+
+    def agora(self) -> float:
+        """Instante (s desde o início da captura) para passar a registrar()."""
+        return self._deslocamento + time.monotonic() - self._inicio
+
+    def proxima_marca(self) -> int:
+        with self._lock:
+            self._proxima_marca = (self._proxima_marca % 0xFFFFFFFF) + 1 # 0 = sem marca
+            return self._proxima_marca
+
+    def _endereco(self, addr) -> tuple:
+        if addr is None:
+            return _SEM_ENDERECO
+        empacotado = self._enderecos.get(addr)
+        if empacotado is None:
+            try:
+                empacotado = (socket.inet_aton(addr[0]), addr[1])
+            except (OSError, TypeError, IndexError):
+                empacotado = _SEM_ENDERECO # Não IPv4
+            self._enderecos[addr] = empacotado
+        return empacotado
+
+    def registrar(self, direcao: int, marca: int, acoes, origem, destino, dados, instante: float = None):
+        """Acrescenta um registro; 'acoes' é a lista de ações do motor (ou os bits já montados)."""
+        if instante is None:
+            instante = self.agora()
+        bits = acoes if isinstance(acoes, int) else bits_acoes(acoes)
+        ip_origem, porta_origem = self._endereco(origem)
+        ip_destino, porta_destino = self._endereco(destino)
+        tamanho = len(dados)
+        total = _REGISTRO.size + tamanho
+        with self._lock:
+            if self._arquivo is None:
+                return
+            if self._usado + total > len(self._buffer):
+                self._descarregar()
+            pos = self._usado
+            _REGISTRO.pack_into(self._buffer, pos, instante, marca, direcao, bits,
+                                ip_origem, porta_origem, ip_destino, porta_destino, tamanho)
+            pos += _REGISTRO.size
+            self._buffer[pos:pos + tamanho] = dados
+            self._usado = pos + tamanho
+            self.registros += 1
+            self.bytes += total
+
+    def entrada(self, marca: int, acoes, origem, destino, dados, instante: float = None):
+        """Pacote recebido pelo roteador, com as perturbações sorteadas para ele."""
+        self.registrar(ENTRADA, marca, acoes, origem, destino, dados, instante)
+
+    def saida(self, marca: int, destino, dados):
+        """Pacote (ou cópia duplicada) encaminhado pelo roteador."""
+        self.registrar(SAIDA, marca, 0, None, destino, dados)
+
+    def _descarregar(self):
+        # PRECISA ser chamado com self._lock
+        if self._usado:
+            self._arquivo.write(self._view[:self._usado])
+            self._usado = 0
+
+    def descarregar(self):
+        """Escreve no arquivo o que estiver no buffer."""
+        with self._lock:
+            if self._arquivo is not None:
+                self._descarregar()
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo is None:
+                return
+            self._descarregar()
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def _decodificar_endereco(ip: bytes, porta: int, cache: dict):
+    chave = (ip, porta)
+    addr = cache.get(chave)
+    if addr is None and chave not in cache:
+        addr = cache[chave] = None if chave == _SEM_ENDERECO else (socket.inet_ntoa(ip), porta)
+    return addr
+
+
+class LeitorCaptura:
+    """Registros de uma captura lidos via mmap; fechar() (ou o with) libera o mapa.
+
+    Iterar gera (instante, marca, direção, bits das ações, origem, destino,
+    dados) de cada registro. 'dados' é uma view sobre o mapa válida só até o
+    próximo registro: quem precisar guardá-los copia (bytes(dados)). Um
+    registro incompleto no fim (captura interrompida) é ignorado.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with open(caminho, 'rb') as arquivo:
+            if os.fstat(arquivo.fileno()).st_size < _CABECALHO.size:
+                raise ValueError(f"{caminho} não é uma captura do roteador")
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        assinatura, self.inicio_epoca = _CABECALHO.unpack_from(self._mapa, 0)
+        if assinatura != ASSINATURA:
+            self.fechar()
+            raise ValueError(f"{caminho} não é uma captura do roteador")
+        self._iteracoes = weakref.WeakSet() # Iterações em andamento (seguram views do mapa)
+
+    def __iter__(self):
+        if self._mapa is None:
+            raise ValueError("Captura já fechada")
+        iteracao = self._registros(self._mapa)
+        self._iteracoes.add(iteracao)
+        return iteracao
+
+    def _registros(self, mapa):
+        view = memoryview(mapa)
+        dados = None
+        enderecos = {}
+        pos, fim = _CABECALHO.size, len(mapa)
+        try:
+            while pos + _REGISTRO.size <= fim:
+                instante, marca, direcao, bits, ip_o, porta_o, ip_d, porta_d, tamanho = _REGISTRO.unpack_from(mapa, pos)
+                inicio = pos + _REGISTRO.size
+                if inicio + tamanho > fim:
+                    break
+                dados = view[inicio:inicio + tamanho]
+                yield (instante, marca, direcao, bits, _decodificar_endereco(ip_o, porta_o, enderecos),
+                       _decodificar_endereco(ip_d, porta_d, enderecos), dados)
+                dados.release() # Nenhuma view sobrevive ao seu registro: o mapa pode ser fechado
+                pos = inicio + tamanho
+        finally:
+            if dados is not None:
+                dados.release()
+            view.release()
+
+    def fechar(self):
+        """Encerra as iterações em andamento e libera o mapa (idempotente)."""
+        mapa, self._mapa = self._mapa, None
+        if mapa is None:
+            return
+        for iteracao in list(getattr(self, '_iteracoes', ())):
+            iteracao.close()
+        mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def ler_captura(caminho):
+    """Registros da captura (ver LeitorCaptura); o mapa é liberado quando a geração termina."""
+    with LeitorCaptura(caminho) as leitor:
+        yield from leitor
+
+
+def inicio_captura(caminho) -> float:
+    """Instante (segundos de época) em que a captura começou."""
+    with open(caminho, 'rb') as arquivo:
+        return _CABECALHO.unpack(arquivo.read(_CABECALHO.size))[1]
+
+
+# Resumo por fluxo
+def _percentil(ordenados: list, fracao: float):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, max(0, int(round(fracao * len(ordenados) + 0.5)) - 1))]
+
+
+def _casar_saidas(entradas: dict, saidas: list):
+    """Soma as SAÍDAS da sessão ao fluxo da ENTRADA com a mesma marca e esvazia os dois."""
+    vistas = set()
+    for marca, instante, tamanho in saidas:
+        entrada = entradas.get(marca)
+        if entrada is None:
+            continue
+        fluxo, instante_entrada = entrada
+        fluxo['encaminhados'] += 1
+        fluxo['bytes_encaminhados'] += tamanho
+        fluxo['fim'] = max(fluxo['fim'], instante)
+        if marca not in vistas: # A cópia duplicada não conta como latência
+            vistas.add(marca)
+            fluxo['latencias'].append(instante - instante_entrada)
+    entradas.clear()
+    saidas.clear()
+
+
+def resumir(caminho) -> dict:
+    """Pacotes, bytes, vazão encaminhada e latência no roteador por fluxo (origem, destino, conexão).
+
+    A latência é o tempo entre a ENTRADA e a primeira SAÍDA do mesmo pacote
+    (perturbações, fila do enlace e atrasos do motor).
+    """
+    fluxos = {}
+    entradas = {} # {marca: (fluxo, instante)} da sessão atual
+    saidas = [] # (marca, instante, tamanho): a saída pode vir antes da entrada no arquivo
+    with LeitorCaptura(caminho) as leitor:
+        for instante, marca, direcao, bits, origem, destino, dados in leitor:
+            if direcao == SESSAO:
+                _casar_saidas(entradas, saidas) # As marcas recomeçam
+                continue
+            if direcao == SAIDA:
+                saidas.append((marca, instante, len(dados)))
+                continue
+            if bits & _BIT_ACAO['REGISTRO']:
+                continue # Pacotes INIT_PC2 do destinatário
+            chave = (origem, destino, segmento.conexao_de(dados))
+            fluxo = fluxos.get(chave)
+            if fluxo is None:
+                fluxo = fluxos[chave] = {'pacotes': 0, 'bytes': 0, 'encaminhados': 0, 'bytes_encaminhados': 0,
+                                         'acoes': {}, 'inicio': instante, 'fim': instante, 'latencias': []}
+            fluxo['pacotes'] += 1
+            fluxo['bytes'] += len(dados)
+            fluxo['fim'] = max(fluxo['fim'], instante)
+            for acao in nomes_acoes(bits):
+                fluxo['acoes'][acao] = fluxo['acoes'].get(acao, 0) + 1
+            if marca:
+                entradas[marca] = (fluxo, instante)
+    _casar_saidas(entradas, saidas)
+
+    resumo = {}
+    for (origem, destino, conexao), fluxo in fluxos.items():
+        latencias = sorted(fluxo.pop('latencias'))
+        duracao = fluxo['fim'] - fluxo['inicio']
+        fluxo.update({
+            'origem': origem,
+            'destino': destino,
+            'conexao': conexao,
+            'duracao_s': duracao,
+            'vazao_bps': fluxo['bytes_encaminhados'] * 8 / duracao if duracao > 0 else 0.0,
+            'latencia_media_s': sum(latencias) / len(latencias) if latencias else None,
+            'latencia_p50_s': _percentil(latencias, 0.5),
+            'latencia_p99_s': _percentil(latencias, 0.99),
+            'latencia_max_s': latencias[-1] if latencias else None,
+        })
+        resumo[f"{origem} -> {destino} (conexão {conexao})"] = fluxo
+    return resumo
+
+
+# Reprodução
+def reproduzir(caminho, destino, escala: float = 1.0, direcao: int = ENTRADA) -> dict:
+    """Reenvia os datagramas da captura para 'destino' com o intervalo original vezes 'escala'.
+
+    escala=0 envia o mais rápido possível. Cada origem original (ou destino,
+    com direcao=SAIDA) ganha um socket próprio, então o roteador reproduzido vê
+    as mesmas extremidades separadas. Retorna quantos pacotes e bytes saíram,
+    a duração e o maior atraso em relação ao horário pedido.
+    """
+    socks = {}
+    pacotes = total = 0
+    atraso_maximo = 0.0
+    primeiro = None
+    inicio = time.perf_counter()
+    leitor = LeitorCaptura(caminho)
+    try:
+        for instante, _, direcao_registro, _, origem, destino_original, dados in leitor:
+            if direcao_registro != direcao:
+                continue
+            if primeiro is None:
+                primeiro = instante
+            alvo = inicio + (instante - primeiro) * escala
+            espera = alvo - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+            else:
+                atraso_maximo = max(atraso_maximo, -espera)
+            chave = origem if direcao == ENTRADA else destino_original
+            sock = socks.get(chave)
+            if sock is None:
+                sock = socks[chave] = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.sendto(dados, destino)
+            pacotes += 1
+            total += len(dados)
+    finally:
+        leitor.fechar() # Terminada a reprodução, o mapa não é mais necessário
+        for sock in socks.values():
+            sock.close()
+    return {'pacotes': pacotes, 'bytes': total, 'duracao_s': time.perf_counter() - inicio,
+            'atraso_maximo_s': atraso_maximo, 'origens': len(socks)}
+
+
+def _endereco_arg(texto: str):
+    host, _, porta = texto.rpartition(':')
+    return (host or '127.0.0.1', int(porta))
+
+
+def _ms(valor):
+    return f"{valor * 1000:.2f}" if valor is not None else '-'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Resumo e reprodução de capturas do roteador")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    p_resumir = comandos.add_parser('resumir', help="Vazão e latência por fluxo")
+    p_resumir.add_argument('arquivo')
+    p_reproduzir = comandos.add_parser('reproduzir', help="Reenvia os datagramas com o tempo original (ou escalado)")
+    p_reproduzir.add_argument('arquivo')
+    p_reproduzir.add_argument('destino', help="host:porta (ex.: o roteador em 127.0.0.1:55555)")
+    p_reproduzir.add_argument('--escala', type=float, default=1.0,
+                              help="Multiplica os intervalos (2 = metade da taxa; 0 = sem esperar)")
+    p_reproduzir.add_argument('--direcao', choices=DIRECOES, default='entrada',
+                              help="entrada: como os pacotes chegaram ao roteador; saida: como ele os encaminhou")
+    args = parser.parse_args(argv)
+
+    if args.comando == 'resumir':
+        print(f"Captura iniciada em {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(inicio_captura(args.arquivo)))}")
+        for nome, fluxo in resumir(args.arquivo).items():
+            acoes = ', '.join(f"{acao}={n}" for acao, n in fluxo['acoes'].items()) or 'nenhuma'
+            print(f"{nome}\n  {fluxo['pacotes']} pacotes / {fluxo['bytes']} B recebidos, "
+                  f"{fluxo['encaminhados']} / {fluxo['bytes_encaminhados']} B encaminhados em {fluxo['duracao_s']:.3f} s "
+                  f"({fluxo['vazao_bps'] / 1e6:.3f} Mbps)\n  latência no roteador (ms): média {_ms(fluxo['latencia_media_s'])}, "
+                  f"p50 {_ms(fluxo['latencia_p50_s'])}, p99 {_ms(fluxo['latencia_p99_s'])}, "
+                  f"máx {_ms(fluxo['latencia_max_s'])}\n  perturbações: {acoes}")
+        return 0
+    resultado = reproduzir(args.arquivo, _endereco_arg(args.destino), args.escala, DIRECOES.index(args.direcao))
+    print(f"{resultado['pacotes']} pacotes ({resultado['bytes']} B) de {resultado['origens']} origens "
+          f"em {resultado['duracao_s']:.3f} s; maior atraso em relação ao original: {_ms(resultado['atraso_maximo_s'])} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
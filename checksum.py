@@ -0,0 +1,113 @@
+import os
+
+# Checksum do RDT: soma em complemento de um das palavras de 16 bits
+# (big-endian, com carry circular), sem inverter o resultado no final.
+# É o mesmo cálculo feito pelo MaquinaC.java e pelas antigas funções de string.
+#
+# Backends:
+#   'int'   -> o buffer inteiro vira um int e é reduzido mod 0xFFFF de uma vez
+#   'numpy' -> soma vetorizada das palavras (usado em payloads grandes, se instalado)
+#   'auto'  -> 'numpy' a partir de LIMIAR_NUMPY bytes, senão 'int'
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+LIMIAR_NUMPY = 4096
+_MOD = 0xFFFF
+
+
+# Backends (retornam a soma mod 0xFFFF e se o buffer tem algum bit 1)
+def _soma_int(dados) -> tuple:
+    numero = int.from_bytes(dados, 'big')
+    if len(dados) % 2:
+        numero <<= 8  # padding com um byte zero no final
+    # 2**16 ≡ 1 (mod 0xFFFF): o número é congruente à soma das suas palavras
+    return numero % _MOD, numero != 0
+
+
+def _soma_numpy(dados) -> tuple:
+    if len(dados) % 2:
+        dados = bytes(dados) + b'\x00'
+    soma = int(np.frombuffer(dados, dtype='>u2').sum(dtype=np.uint64))
+    return soma % _MOD, soma != 0
+
+
+def _soma_auto(dados) -> tuple:
+    if len(dados) >= LIMIAR_NUMPY:
+        return _soma_numpy(dados)
+    return _soma_int(dados)
+
+
+BACKENDS = {'int': _soma_int}
+if np is not None:
+    BACKENDS['numpy'] = _soma_numpy
+    BACKENDS['auto'] = _soma_auto
+else:
+    BACKENDS['auto'] = _soma_int
+
+_backend_atual = BACKENDS['auto']
+
+
+def definir_backend(nome: str):
+    """Troca o backend usado por todas as funções deste módulo."""
+    global _backend_atual
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de checksum desconhecido: {nome} (disponíveis: {', '.join(BACKENDS)})")
+    _backend_atual = BACKENDS[nome]
+
+
+if os.environ.get('RDT_CHECKSUM'):
+    definir_backend(os.environ['RDT_CHECKSUM'])
+
+
+def somar_palavras(dados) -> tuple:
+    """Soma (mod 0xFFFF) das palavras de 16 bits de 'dados' e se há algum bit 1."""
+    return _backend_atual(dados)
+
+
+def dobrar(soma: int, nao_vazio: bool) -> int:
+    """Reduz uma soma a 16 bits com carry circular (end-around carry)."""
+    soma %= _MOD
+    if soma == 0 and nao_vazio:
+        return 0xFFFF
+    return soma
+
+
+def calc_checksum(dados) -> int:
+    """Checksum de um buffer (bytes, bytearray ou memoryview)."""
+    return dobrar(*somar_palavras(dados))
+
+
+def verificar(segmento, offset: int = 8) -> bool:
+    """Confere o checksum guardado em segmento[offset:offset+2] sem zerar o campo.
+
+    A soma do segmento inteiro inclui o próprio checksum C; basta descontá-lo
+    da soma em vez de montar uma cópia do cabeçalho com o campo zerado.
+    """
+    if len(segmento) < offset + 2:
+        return False
+    recebido = (segmento[offset] << 8) | segmento[offset + 1]
+    soma, nao_vazio = somar_palavras(segmento)
+    # Os outros bytes são todos zero exatamente quando a soma "sem C" é zero
+    # e só o campo do checksum tinha bits 1.
+    resto_nao_vazio = nao_vazio and not (soma == recebido % _MOD and _so_checksum(segmento, offset))
+    return dobrar(soma - recebido, resto_nao_vazio) == recebido
+
+
+def _so_checksum(segmento, offset: int) -> bool:
+    """True se todos os bytes fora do campo de checksum forem zero."""
+    view = memoryview(segmento)
+    return not any(view[:offset]) and not any(view[offset + 2:])
+
+
+# Compatibilidade com as funções antigas baseadas em strings de '0'/'1'
+def calc_checksum_bits(data: str) -> str:
+    """Checksum de uma string binária ('0'/'1'), devolvido como string de 16 bits."""
+    if not data:
+        return '0' * 16
+    if len(data) % 16 != 0:
+        data = data.ljust(((len(data) // 16) + 1) * 16, '0')
+    numero = int(data, 2)
+    return bin(dobrar(numero % _MOD, numero != 0))[2:].zfill(16)
@@ -0,0 +1,86 @@
+# Controle de congestionamento do remetente.
+# A janela (cwnd) é medida em bytes de segmento no fio (cabeçalho + payload).
+# O Envio consulta pode_enviar() antes de cada segmento novo e avisa a
+# política sobre ACKs, timeouts e outros sinais de perda.
+
+
+class ControleCongestionamento:
+    """Interface das políticas de controle de congestionamento."""
+
+    nome = 'base'
+
+    def __init__(self):
+        self.mss = None # Bytes de um segmento cheio, definido em iniciar()
+        self.janela = 0 # cwnd em bytes
+        self.ssthresh = float('inf')
+
+    def iniciar(self, mss: int):
+        """Chamado pelo Envio com o tamanho em bytes de um segmento cheio."""
+        self.mss = mss
+
+    def pode_enviar(self, bytes_em_voo: int, tamanho: int) -> bool:
+        """True se um segmento de 'tamanho' bytes cabe na janela."""
+        # Sempre deixa ao menos um segmento em voo para a transferência andar
+        return bytes_em_voo == 0 or bytes_em_voo + tamanho <= self.janela
+
+    def ao_confirmar(self, bytes_confirmados: int, bytes_em_voo: int):
+        """ACK novo para 'bytes_confirmados' bytes."""
+
+    def ao_timeout(self, bytes_em_voo: int):
+        """Um ou mais segmentos sofreram timeout."""
+
+    def ao_perda(self, bytes_em_voo: int):
+        """Perda detectada sem timeout (ex.: ACKs fora de ordem)."""
+
+    def estado(self) -> dict:
+        return {'politica': self.nome, 'cwnd': self.janela, 'ssthresh': self.ssthresh}
+
+
+class JanelaFixa(ControleCongestionamento):
+    """Janela constante de 'segmentos' segmentos cheios (o antigo JANELA)."""
+
+    nome = 'fixa'
+
+    def __init__(self, segmentos: int):
+        super().__init__()
+        self.segmentos = segmentos
+
+    def iniciar(self, mss: int):
+        super().iniciar(mss)
+        self.janela = self.segmentos * mss
+
+
+class Reno(ControleCongestionamento):
+    """Slow start, congestion avoidance (AIMD) e redução multiplicativa na perda."""
+
+    nome = 'reno'
+
+    def __init__(self, segmentos_iniciais: int = 4, janela_maxima: int = None):
+        super().__init__()
+        self.segmentos_iniciais = segmentos_iniciais
+        self.janela_maxima = janela_maxima # Limite em bytes (ex.: janela do receptor)
+
+    def iniciar(self, mss: int):
+        super().iniciar(mss)
+        self.janela = self.segmentos_iniciais * mss
+
+    def _limitar(self):
+        if self.janela_maxima is not None:
+            self.janela = min(self.janela, self.janela_maxima)
+
+    def ao_confirmar(self, bytes_confirmados: int, bytes_em_voo: int):
+        if self.janela < self.ssthresh:
+            # Slow start: cresce até 1 MSS por ACK (dobra a cada RTT)
+            self.janela += min(bytes_confirmados, self.mss)
+        else:
+            # Congestion avoidance: ~1 MSS por RTT
+            self.janela += max(1, self.mss * self.mss // self.janela)
+        self._limitar()
+
+    def ao_timeout(self, bytes_em_voo: int):
+        self.ssthresh = max(bytes_em_voo // 2, 2 * self.mss)
+        self.janela = self.mss
+
+    def ao_perda(self, bytes_em_voo: int):
+        self.ssthresh = max(bytes_em_voo // 2, 2 * self.mss)
+        self.janela = self.ssthresh
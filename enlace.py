@@ -0,0 +1,172 @@
+import random, threading
+from collections import deque
+
+# Modelo de enlace gargalo para uma direção do roteador: taxa limitada por um
+# token bucket (bits/s), fila FIFO limitada (em pacotes ou bytes) e política
+# de descarte (tail-drop ou RED).
+#
+# A fila é simulada em tempo virtual: ao chegar, o pacote recebe o instante
+# em que sai do enlace (depois dos que já estão na fila e quando houver
+# tokens suficientes). O roteador só agenda o envio para esse instante, então
+# não há thread nem espera por enlace.
+
+
+class TailDrop:
+    """Descarta só quando a fila está cheia."""
+
+    nome = 'tail-drop'
+
+    def descartar(self, ocupacao: int, limite: int, rng: random.Random) -> bool:
+        return False
+
+    def copiar(self):
+        return TailDrop()
+
+
+class RED:
+    """Random Early Detection (Floyd & Jacobson) sobre a média móvel da fila.
+
+    'minimo' e 'maximo' são limiares na mesma unidade da fila; entre eles a
+    probabilidade de descarte cresce linearmente até 'p_maximo'.
+    """
+
+    nome = 'RED'
+
+    def __init__(self, minimo: float, maximo: float, p_maximo: float = 0.1, peso: float = 0.002):
+        if not 0 <= minimo < maximo:
+            raise ValueError("RED: é preciso 0 <= minimo < maximo")
+        self.minimo = minimo
+        self.maximo = maximo
+        self.p_maximo = p_maximo
+        self.peso = peso # Peso da média móvel exponencial (w_q)
+        self.media = 0.0
+        self.contagem = 0 # Pacotes aceitos desde o último descarte
+
+    def descartar(self, ocupacao: int, limite: int, rng: random.Random) -> bool:
+        self.media += self.peso * (ocupacao - self.media)
+        if self.media < self.minimo:
+            self.contagem = 0
+            return False
+        if self.media >= self.maximo:
+            self.contagem = 0
+            return True
+        p = self.p_maximo * (self.media - self.minimo) / (self.maximo - self.minimo)
+        # Espalha os descartes: a probabilidade sobe com os pacotes aceitos desde o último
+        denominador = 1 - self.contagem * p
+        p = 1.0 if denominador <= 0 else p / denominador
+        if rng.random() < p:
+            self.contagem = 0
+            return True
+        self.contagem += 1
+        return False
+
+    def copiar(self):
+        return RED(self.minimo, self.maximo, self.p_maximo, self.peso)
+
+
+class Enlace:
+    def __init__(self, taxa_bps: float, limite_fila: int = 64, unidade: str = 'pacotes',
+                 descarte=None, rajada: int = 0, semente=None):
+        """'taxa_bps' em bits/s; 'limite_fila' em 'pacotes' ou 'bytes'.
+
+        'rajada' é a capacidade do token bucket em bytes (0 = um pacote, ou
+        seja, só a taxa de serialização).
+        """
+        if taxa_bps <= 0:
+            raise ValueError("A taxa do enlace deve ser positiva")
+        if unidade not in ('pacotes', 'bytes'):
+            raise ValueError("Unidade da fila deve ser 'pacotes' ou 'bytes'")
+        self.taxa_bps = taxa_bps
+        self.limite_fila = limite_fila
+        self.unidade = unidade
+        self.descarte = descarte or TailDrop()
+        self.rajada = rajada
+        self.rng = random.Random(semente)
+        self._bytes_por_s = taxa_bps / 8
+
+        # Estado do token bucket no instante da última saída agendada
+        self._ultima_saida = 0.0
+        self._tokens = float(rajada)
+        # Pacotes aceitos que ainda não saíram: (instante de saída, bytes)
+        self._fila = deque()
+        self._bytes_fila = 0
+        self._lock = threading.Lock()
+
+        self.aceitos = 0
+        self.bytes_aceitos = 0
+        self.descartes = {'fila_cheia': 0, 'antecipado': 0}
+        self.ocupacao_maxima = 0
+        self._soma_espera = 0.0
+        self.espera_maxima = 0.0
+
+    def copiar(self):
+        """Enlace novo com os mesmos parâmetros (para outra direção)."""
+        return Enlace(self.taxa_bps, self.limite_fila, self.unidade, self.descarte.copiar(), self.rajada)
+
+    def __reduce__(self):
+        # Enviado a outros processos como modelo: só os parâmetros, com fila vazia
+        return (Enlace, (self.taxa_bps, self.limite_fila, self.unidade, self.descarte.copiar(), self.rajada))
+
+    def _drenar(self, agora: float):
+        fila = self._fila
+        while fila and fila[0][0] <= agora:
+            self._bytes_fila -= fila.popleft()[1]
+
+    def _ocupacao(self) -> int:
+        return len(self._fila) if self.unidade == 'pacotes' else self._bytes_fila
+
+    def admitir(self, tamanho: int, agora: float):
+        """Instante em que o pacote de 'tamanho' bytes sai do enlace, ou None se descartado."""
+        with self._lock:
+            self._drenar(agora)
+            ocupacao = self._ocupacao()
+            custo = 1 if self.unidade == 'pacotes' else tamanho
+            if ocupacao + custo > self.limite_fila:
+                self.descartes['fila_cheia'] += 1
+                return None
+            if self.descarte.descartar(ocupacao, self.limite_fila, self.rng):
+                self.descartes['antecipado'] += 1
+                return None
+
+            # FIFO: sai depois do anterior e quando houver tokens para o pacote inteiro
+            capacidade = max(self.rajada, tamanho)
+            saida = max(agora, self._ultima_saida)
+            tokens = min(capacidade, self._tokens + (saida - self._ultima_saida) * self._bytes_por_s)
+            if tokens < tamanho:
+                saida += (tamanho - tokens) / self._bytes_por_s
+                tokens = tamanho
+            self._tokens = tokens - tamanho
+            self._ultima_saida = saida
+
+            self._fila.append((saida, tamanho))
+            self._bytes_fila += tamanho
+            self.ocupacao_maxima = max(self.ocupacao_maxima, self._ocupacao())
+            espera = saida - agora
+            self._soma_espera += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+            self.aceitos += 1
+            self.bytes_aceitos += tamanho
+            return saida
+
+    def estatisticas(self, agora: float = None) -> dict:
+        """Ocupação da fila, atraso de enfileiramento (s) e descartes."""
+        with self._lock:
+            if agora is not None:
+                self._drenar(agora)
+            return {
+                'taxa_bps': self.taxa_bps,
+                'descarte': self.descarte.nome,
+                'unidade': self.unidade,
+                'limite_fila': self.limite_fila,
+                'ocupacao': self._ocupacao(),
+                'ocupacao_maxima': self.ocupacao_maxima,
+                'aceitos': self.aceitos,
+                'bytes_aceitos': self.bytes_aceitos,
+                'descartes': dict(self.descartes),
+                'espera_media': self._soma_espera / self.aceitos if self.aceitos else 0.0,
+                'espera_maxima': self.espera_maxima,
+            }
+
+    def __repr__(self):
+        return (f"Enlace({self.taxa_bps:g} bps, fila={self.limite_fila} {self.unidade}, "
+                f"{self.descarte.nome})")
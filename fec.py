@@ -0,0 +1,175 @@
+import struct
+
+import segmento
+
+# Correção de erros (FEC) por paridade XOR.
+#
+# Com FEC ligado, o remetente envia, depois de cada grupo de K segmentos de
+# dados novos (consecutivos no espaço de sequência), um segmento de paridade:
+# o bit FLAG_FEC (segmento.py) ligado, sem FLAG_ACK, seq = seq do primeiro
+# segmento do grupo e o payload:
+#   K (8 bits) | estendido (8 bits) | K tamanhos de payload (16 bits cada) | XOR dos payloads
+# Os payloads entram no XOR alinhados à esquerda e completados com zeros até
+# o maior deles. Com os tamanhos, o destinatário sabe o seq de cada membro do
+# grupo (o seq avança o tamanho do segmento no fio) e reconstrói qualquer um
+# que falte sozinho, sem esperar a retransmissão. O segmento de paridade não
+# ocupa espaço de sequência e nunca é confirmado nem retransmitido, mas conta
+# na janela de congestionamento do remetente (bytes em voo), como os dados,
+# até a base passar do fim do seu grupo.
+#
+# Um ACK com FLAG_FEC avisa o remetente de que o destinatário reconstruiu um
+# segmento: são perdas que não geram retransmissão e entram na estimativa da
+# taxa de perda usada por ParidadeAdaptativa.
+#
+# Só o destinatário em Python (recepcao.py) entende a paridade; o MaquinaC.java
+# a trataria como dados.
+
+K_MINIMO = 2
+K_MAXIMO = 16
+ALVO_IRRECUPERAVEL = 0.02 # Fração aceitável de grupos com duas ou mais perdas (não recuperáveis)
+INTERVALO_ESTIMATIVA = 64 # Segmentos de dados entre duas reavaliações de K
+PESO_ESTIMATIVA = 0.25 # Peso da amostra nova na média móvel da taxa de perda
+
+_GRUPO = struct.Struct('!BB')
+_TAMANHO = struct.Struct('!H')
+
+
+def tamanho_paridade(k: int, mss: int) -> int:
+    """Bytes do payload de paridade de um grupo de 'k' segmentos de até 'mss' bytes."""
+    return _GRUPO.size + k * _TAMANHO.size + mss
+
+
+def xor_payloads(payloads, tamanho: int) -> int:
+    """XOR dos payloads alinhados à esquerda em 'tamanho' bytes, como um inteiro."""
+    acumulado = 0
+    for payload in payloads:
+        acumulado ^= int.from_bytes(payload, 'big') << (8 * (tamanho - len(payload)))
+    return acumulado
+
+
+def montar_paridade(payloads: list, estendido: bool) -> bytes:
+    """Payload do segmento de paridade de um grupo (payloads na ordem de seq)."""
+    tamanhos = [len(payload) for payload in payloads]
+    tamanho = max(tamanhos)
+    return (_GRUPO.pack(len(payloads), 1 if estendido else 0)
+            + struct.pack(f'!{len(tamanhos)}H', *tamanhos)
+            + xor_payloads(payloads, tamanho).to_bytes(tamanho, 'big'))
+
+
+def ler_paridade(dados):
+    """(estendido, tamanhos, xor como inteiro) do payload de paridade, ou None se malformado."""
+    if len(dados) < _GRUPO.size:
+        return None
+    k, estendido = _GRUPO.unpack_from(dados)
+    inicio = _GRUPO.size + k * _TAMANHO.size
+    if k == 0 or len(dados) < inicio:
+        return None
+    tamanhos = struct.unpack_from(f'!{k}H', dados, _GRUPO.size)
+    if len(dados) - inicio != max(tamanhos):
+        return None
+    return bool(estendido), tamanhos, int.from_bytes(dados[inicio:], 'big')
+
+
+def seqs_grupo(seq_inicial: int, tamanhos, estendido: bool) -> list:
+    """[(seq, tamanho do segmento em bits)] de cada membro do grupo."""
+    membros = []
+    seq = seq_inicial
+    for tamanho in tamanhos:
+        bits = segmento.tamanho_segmento(tamanho, estendido) * 8
+        membros.append((seq, bits))
+        seq += bits
+    return membros
+
+
+def recuperar(xor: int, tamanho_maximo: int, tamanho: int) -> bytes:
+    """Payload de 'tamanho' bytes do membro que falta, dado o XOR da paridade com os outros."""
+    return (xor >> (8 * (tamanho_maximo - tamanho))).to_bytes(tamanho, 'big')
+
+
+def politica_de(texto: str):
+    """Política a partir de um texto de linha de comando: 'adaptativa', K (fixo) ou 'sem' (None)."""
+    if texto in (None, '', 'sem'):
+        return None
+    if texto == 'adaptativa':
+        return ParidadeAdaptativa()
+    return ParidadeFixa(int(texto))
+
+
+def prob_irrecuperavel(taxa: float, k: int) -> float:
+    """Probabilidade de duas ou mais perdas entre os k + 1 segmentos de um grupo."""
+    n = k + 1
+    return 1.0 - (1.0 - taxa) ** n - n * taxa * (1.0 - taxa) ** (n - 1)
+
+
+class PoliticaFEC:
+    """Interface das políticas de FEC: quantos segmentos de dados por paridade."""
+
+    nome = 'base'
+
+    def __init__(self, k: int):
+        if not 1 <= k <= 0xFF:
+            raise ValueError("K deve estar entre 1 e 255 segmentos")
+        self.k = k # Segmentos de dados do próximo grupo
+        self.k_maximo = k # Maior K possível (limita o tamanho da paridade)
+
+    def ao_enviar(self):
+        """Um segmento de dados novo foi enviado."""
+
+    def ao_perda(self, segmentos: int = 1):
+        """Segmentos perdidos (retransmitidos ou reconstruídos pelo destinatário)."""
+
+    def estado(self) -> dict:
+        return {'fec': self.nome, 'k': self.k}
+
+
+class ParidadeFixa(PoliticaFEC):
+    """Uma paridade a cada 'k' segmentos, sempre."""
+
+    nome = 'fixa'
+
+
+class ParidadeAdaptativa(PoliticaFEC):
+    """K escolhido pela taxa de perda observada.
+
+    A cada 'intervalo' segmentos enviados, a taxa de perda (média móvel) é
+    atualizada e K passa a ser o maior valor entre k_minimo e k_maximo em que a
+    chance de um grupo ter duas ou mais perdas fica abaixo de 'alvo': pouca
+    perda, pouca redundância; muita perda, grupos curtos.
+    """
+
+    nome = 'adaptativa'
+
+    def __init__(self, k_minimo: int = K_MINIMO, k_maximo: int = K_MAXIMO, alvo: float = ALVO_IRRECUPERAVEL,
+                 intervalo: int = INTERVALO_ESTIMATIVA, peso: float = PESO_ESTIMATIVA):
+        super().__init__(k_maximo)
+        if not 1 <= k_minimo <= k_maximo:
+            raise ValueError("k_minimo deve estar entre 1 e k_maximo")
+        self.k_minimo = k_minimo
+        self.alvo = alvo
+        self.intervalo = intervalo
+        self.peso = peso
+        self.taxa = None # Taxa de perda estimada (None antes do primeiro intervalo)
+        self._enviados = 0
+        self._perdas = 0
+
+    def ao_enviar(self):
+        self._enviados += 1
+        if self._enviados >= self.intervalo:
+            amostra = min(1.0, self._perdas / self._enviados)
+            self.taxa = amostra if self.taxa is None else self.taxa + self.peso * (amostra - self.taxa)
+            self._enviados = self._perdas = 0
+            self.k = self._escolher_k()
+
+    def ao_perda(self, segmentos: int = 1):
+        self._perdas += segmentos
+
+    def _escolher_k(self) -> int:
+        k = self.k_maximo
+        while k > self.k_minimo and prob_irrecuperavel(self.taxa, k) > self.alvo:
+            k -= 1
+        return k
+
+    def estado(self) -> dict:
+        estado = super().estado()
+        estado['taxa_perda'] = self.taxa
+        return estado
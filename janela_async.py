@@ -0,0 +1,239 @@
+import asyncio
+from collections import deque
+
+import registro
+import segmento
+from metricas import Metricas
+from Janela import IP, PORTA, JANELA, TEMPO, TAM_PAYLOAD_BYTES, LIMIAR_RETRANSMISSAO
+
+# Remetente Selective Repeat em asyncio: mesmo formato de segmento e mesma
+# numeração (em bits) do Envio de Janela.py, mas sem threads e sem polling.
+# Os timeouts são agendados com loop.call_at e os ACKs chegam pelo
+# DatagramProtocol, então um único event loop atende várias transferências.
+
+log = registro.obter('AsyncEnvio')
+
+
+class AsyncEnvio(asyncio.DatagramProtocol):
+    def __init__(self, ip, porta, loop=None, mss=TAM_PAYLOAD_BYTES, limiar_retransmissao=LIMIAR_RETRANSMISSAO):
+        self.dest = (ip, porta) # Destino
+        if not 0 < mss <= segmento.MSS_MAXIMO:
+            raise ValueError(f"MSS deve estar entre 1 e {segmento.MSS_MAXIMO} bytes")
+        self.mss = mss
+        self.estendido = segmento.precisa_estender(mss)
+        self.loop = loop or asyncio.get_running_loop()
+        self.transport = None
+
+        #Controle da janela deslizante
+        self.base = 0
+        self.prox_seq_num = 0
+        # Buffer armazena {seq_bits: (segmento_bytes, tamanho_segmento_bits, tamanho_payload)}
+        self.buffer_segmentos = {}
+        # Armazena {seq_bits: asyncio.TimerHandle} dos segmentos em voo
+        self.tempos_envio = {}
+        self.acks_confirmados = set()
+        self.limiar_retransmissao = limiar_retransmissao # Fast retransmit (None ou 0 desliga)
+        self.retransmitidos_rapido = set()
+        self.buffer_envio = deque() # Fila da aplicação [(seq, payload, tamanho_bits)]
+        self._esperando = [] # Futures de drenar() ainda pendentes
+        self.metricas = Metricas("async-envio")
+
+    @classmethod
+    async def criar(cls, ip=IP, porta=PORTA, mss=TAM_PAYLOAD_BYTES, limiar_retransmissao=LIMIAR_RETRANSMISSAO):
+        """Cria o socket UDP no loop atual e retorna o remetente pronto para uso."""
+        loop = asyncio.get_running_loop()
+        _, protocolo = await loop.create_datagram_endpoint(
+            lambda: cls(ip, porta, loop, mss, limiar_retransmissao), local_addr=('0.0.0.0', 0))
+        return protocolo
+
+    # Callbacks do DatagramProtocol
+    def connection_made(self, transport):
+        self.transport = transport
+        log.info("Remetente (AsyncEnvio) ouvindo em: %s", transport.get_extra_info('sockname'))
+
+    def datagram_received(self, data, addr):
+        info = segmento.ler_segmento(data)
+        if info is None:
+            self.metricas.falhas_checksum += 1
+            log.debug("[ACK RECV] Checksum inválido no ACK.")
+            return
+        if info['flag'] != 1:
+            return
+        if info['flags'] & segmento.FLAG_SACK:
+            novos = self._aplicar_sack(info['ack'], segmento.ler_blocos_sack(info['dados']))
+        else:
+            novos = self._confirmar_segmento(segmento.seq_absoluto(info['ack'], self.base))
+        if not novos:
+            self.metricas.acks_duplicados += 1
+            return
+        self._deslizar_base()
+        self._retransmitir_perdidos()
+        # Tenta enviar mais segmentos: a janela deslizou ou liberou timers
+        self._enviar_novos_segmentos()
+
+    def error_received(self, exc):
+        log.erro("[AsyncEnvio] Erro no socket: %s", exc)
+
+    def connection_lost(self, exc):
+        for futuro in self._esperando:
+            if not futuro.done():
+                futuro.set_exception(ConnectionError("Socket do remetente fechado"))
+        self._esperando.clear()
+
+    # Timers (um TimerHandle do loop por segmento em voo)
+    def _iniciar_timer(self, seq):
+        self._parar_timer(seq)
+        self.tempos_envio[seq] = self.loop.call_at(self.loop.time() + TEMPO, self._tratar_timeout, seq)
+
+    def _parar_timer(self, seq):
+        handle = self.tempos_envio.pop(seq, None)
+        if handle:
+            handle.cancel()
+
+    def _tratar_timeout(self, seq):
+        self.tempos_envio.pop(seq, None)
+        if seq in self.acks_confirmados or seq not in self.buffer_segmentos:
+            return
+        log.debug("[TIMEOUT] Reenviando segmento %d", seq)
+        self.metricas.timeouts += 1
+        self.metricas.retransmitidos += 1
+        segmento_bytes = self.buffer_segmentos[seq][0]
+        self.transport.sendto(segmento_bytes, self.dest)
+        self._iniciar_timer(seq)
+
+    # Janela
+    def _aplicar_sack(self, ack_cumulativo: int, blocos: list) -> int:
+        """Marca os segmentos cobertos por um ACK seletivo; retorna quantos eram novos."""
+        intervalos = [(self.base, segmento.seq_absoluto(ack_cumulativo, self.base))]
+        for inicio, fim in blocos:
+            inicio = segmento.seq_absoluto(inicio, self.base)
+            intervalos.append((max(inicio, self.base), segmento.seq_absoluto(fim, inicio)))
+        novos = 0
+        for seq, fim in intervalos:
+            while seq < fim:
+                dados_segmento = self.buffer_segmentos.get(seq)
+                if dados_segmento is None:
+                    break
+                novos += self._confirmar_segmento(seq)
+                seq += dados_segmento[1]
+        return novos
+
+    def _confirmar_segmento(self, ack_num_recebido) -> bool:
+        """Marca um segmento em voo como confirmado (sem deslizar a janela)."""
+        if ack_num_recebido in self.acks_confirmados or ack_num_recebido < self.base:
+            return False
+        dados_segmento = self.buffer_segmentos.get(ack_num_recebido)
+        if dados_segmento is None:
+            return False
+        self.acks_confirmados.add(ack_num_recebido)
+        self._parar_timer(ack_num_recebido)
+        self.metricas.acks += 1
+        self.metricas.bytes_entregues += dados_segmento[2]
+        log.debug("[ACK] Recebido para segmento %d", ack_num_recebido)
+        return True
+
+    def _deslizar_base(self):
+        mudou_base = False
+        while self.base in self.acks_confirmados:
+            tamanho_segmento_bits = self.buffer_segmentos.pop(self.base)[1]
+            self.acks_confirmados.remove(self.base)
+            self.retransmitidos_rapido.discard(self.base)
+            self.base += tamanho_segmento_bits
+            mudou_base = True
+        if mudou_base:
+            log.debug("Janela deslizou, nova base (em bits): %d", self.base)
+            self._acordar_esperando()
+
+    def _retransmitir_perdidos(self):
+        """Fast retransmit dos segmentos com 'limiar' ou mais segmentos posteriores já confirmados."""
+        limiar = self.limiar_retransmissao
+        acima = len(self.acks_confirmados)
+        seq = self.base
+        while limiar and acima >= limiar:
+            dados_segmento = self.buffer_segmentos.get(seq)
+            if dados_segmento is None:
+                break
+            if seq in self.acks_confirmados:
+                acima -= 1
+            elif seq not in self.retransmitidos_rapido:
+                self.retransmitidos_rapido.add(seq)
+                log.debug("[FAST RETRANSMIT] Reenviando segmento %d", seq)
+                self.metricas.retransmitidos += 1
+                self.metricas.retransmissoes_rapidas += 1
+                self.transport.sendto(dados_segmento[0], self.dest)
+                self._iniciar_timer(seq)
+            seq += dados_segmento[1]
+
+    def _enviar_novos_segmentos(self):
+        """Envia novos segmentos da fila buffer_envio se a janela permitir."""
+        while len(self.tempos_envio) < JANELA and self.buffer_envio:
+            seq, payload_bytes, tamanho_segmento_bits = self.buffer_envio.popleft()
+            segmento_bytes = segmento.montar_segmento(seq, 0, 0, payload_bytes, self.estendido)
+            # Guarda para retransmitir
+            self.buffer_segmentos[seq] = (segmento_bytes, tamanho_segmento_bits, len(payload_bytes))
+            self.transport.sendto(segmento_bytes, self.dest)
+            self.metricas.enviados += 1
+            log.debug("[ENVIO] Segmento %d enviado pela primeira vez", seq)
+            self._iniciar_timer(seq)
+
+    def _acordar_esperando(self):
+        if self.base != self.prox_seq_num:
+            return
+        for futuro in self._esperando:
+            if not futuro.done():
+                futuro.set_result(self.base)
+        self._esperando.clear()
+
+    # API
+    async def enviar_mensagens(self, lista_mensagens) -> list:
+        """Divide as mensagens em segmentos, enfileira e envia o que couber na janela."""
+        if isinstance(lista_mensagens, (str, bytes)):
+            lista_mensagens = [lista_mensagens]
+        novos_seqs = []
+        for mensagem in lista_mensagens:
+            mensagem_bytes = mensagem.encode('utf-8') if isinstance(mensagem, str) else mensagem
+            mensagem_bytes = memoryview(mensagem_bytes)
+            for idx in range(0, len(mensagem_bytes), self.mss):
+                payload = mensagem_bytes[idx : idx + self.mss]
+                seq = self.prox_seq_num
+                tamanho_segmento_bits = segmento.tamanho_segmento(len(payload), self.estendido) * 8
+                self.buffer_envio.append((seq, payload, tamanho_segmento_bits))
+                novos_seqs.append(seq)
+                self.prox_seq_num += tamanho_segmento_bits
+        self._enviar_novos_segmentos()
+        return novos_seqs
+
+    async def drenar(self):
+        """Espera até que todos os segmentos enfileirados sejam confirmados."""
+        if self.base == self.prox_seq_num:
+            return self.base
+        futuro = self.loop.create_future()
+        self._esperando.append(futuro)
+        return await futuro
+
+    def fechar(self):
+        """Cancela os timers pendentes e fecha o socket."""
+        for seq in list(self.tempos_envio):
+            self._parar_timer(seq)
+        if self.transport is not None:
+            self.transport.close()
+        log.info("[FECHADO]")
+
+
+# Exemplo de uso (equivalente ao pc1.py)
+async def _main():
+    remetente = await AsyncEnvio.criar(IP, PORTA)
+    try:
+        message = input("Digite sua mensagem:  ")
+        await remetente.enviar_mensagens([message])
+        await remetente.drenar()
+        print("[FIM] Todos os segmentos enfileirados foram confirmados.")
+    finally:
+        remetente.fechar()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        print("Envio interompido")
@@ -0,0 +1,231 @@
+import bisect, json, threading, time
+from array import array
+
+# Métricas do protocolo para o remetente, o roteador e o destinatário.
+#
+# Os contadores são atributos (__slots__) e o histograma de RTT e a série da
+# janela usam arrays pré-alocados, então registrar um evento não cria listas,
+# dicionários nem tuplas. snapshot() monta um dicionário com o estado atual
+# (sem lock: é uma leitura aproximada, como os próprios contadores, que são
+# incrementados pelas threads de ACK, timers e recepção).
+
+# Limites superiores (segundos) dos baldes do histograma de RTT; o último é "acima de 5 s"
+LIMITES_RTT = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+AMOSTRAS_JANELA = 512 # Pontos guardados da janela ao longo do tempo (anel)
+INTERVALO_JANELA = 0.01 # Intervalo mínimo (s) entre dois pontos da janela
+
+CONTADORES = (
+    'enviados',         # Segmentos/pacotes enviados pela primeira vez (roteador: encaminhados)
+    'retransmitidos',   # Segmentos reenviados (por timeout ou fast retransmit)
+    'timeouts',         # Segmentos que sofreram timeout
+    'retransmissoes_rapidas', # Reenviados por fast retransmit (sem esperar o timeout)
+    'acks',             # ACKs novos (remetente) ou ACKs enviados (destinatário)
+    'acks_duplicados',  # ACKs de segmentos já confirmados ou fora de voo
+    'recebidos',        # Segmentos/pacotes recebidos
+    'duplicados',       # Segmentos recebidos de novo (destinatário)
+    'falhas_checksum',  # Datagramas descartados por checksum inválido
+    'descartados',      # Descartados por outros motivos (fora da janela, perda, fila cheia)
+    'bytes_entregues',  # Bytes de payload entregues/confirmados (base do goodput)
+    'paridades',        # Segmentos de paridade (FEC) enviados ou recebidos
+    'recuperados_fec',  # Segmentos reconstruídos pela paridade (no remetente: avisados nos ACKs)
+)
+
+
+class Metricas:
+    __slots__ = CONTADORES + ('nome', 'limites_rtt', 'histograma_rtt', 'soma_rtt', 'amostras_rtt',
+                              '_t_janela', '_v_janela', '_pos_janela', '_pontos_janela', '_ultimo_ponto',
+                              'inicio', '_ultimo_snapshot', '_relogio')
+
+    def __init__(self, nome: str, limites_rtt=LIMITES_RTT, amostras_janela=AMOSTRAS_JANELA, relogio=time.monotonic):
+        """'relogio' dá o instante atual em segundos (o simulador passa o relógio virtual)."""
+        self.nome = nome
+        self._relogio = relogio
+        for contador in CONTADORES:
+            setattr(self, contador, 0)
+        self.limites_rtt = tuple(limites_rtt)
+        self.histograma_rtt = array('Q', [0] * (len(self.limites_rtt) + 1))
+        self.soma_rtt = 0.0
+        self.amostras_rtt = 0
+        # Anel (tempo desde o início, janela em bytes)
+        self._t_janela = array('d', [0.0] * amostras_janela)
+        self._v_janela = array('q', [0] * amostras_janela)
+        self._pos_janela = 0
+        self._pontos_janela = 0
+        self._ultimo_ponto = float('-inf')
+        self.inicio = relogio()
+        self._ultimo_snapshot = (self.inicio, 0) # (instante, bytes entregues)
+
+    def registrar_rtt(self, rtt: float):
+        self.histograma_rtt[bisect.bisect_left(self.limites_rtt, rtt)] += 1
+        self.soma_rtt += rtt
+        self.amostras_rtt += 1
+
+    def registrar_janela(self, janela: int):
+        """Guarda um ponto da janela (no máximo um a cada INTERVALO_JANELA)."""
+        agora = self._relogio()
+        if agora - self._ultimo_ponto < INTERVALO_JANELA:
+            return
+        self._ultimo_ponto = agora
+        pos = self._pos_janela
+        self._t_janela[pos] = agora - self.inicio
+        self._v_janela[pos] = janela
+        self._pos_janela = (pos + 1) % len(self._t_janela)
+        self._pontos_janela += 1
+
+    def _percentil_rtt(self, fracao: float):
+        """Limite superior do balde que contém o percentil (None sem amostras)."""
+        total = sum(self.histograma_rtt)
+        if total == 0:
+            return None
+        alvo = fracao * total
+        acumulado = 0
+        for indice, contagem in enumerate(self.histograma_rtt):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return self.limites_rtt[indice] if indice < len(self.limites_rtt) else float('inf')
+        return float('inf')
+
+    def serie_janela(self) -> list:
+        """Pontos [t, janela] guardados, do mais antigo ao mais recente."""
+        capacidade = len(self._t_janela)
+        quantidade = min(self._pontos_janela, capacidade)
+        primeiro = (self._pos_janela - quantidade) % capacidade
+        return [[round(self._t_janela[(primeiro + i) % capacidade], 4), self._v_janela[(primeiro + i) % capacidade]]
+                for i in range(quantidade)]
+
+    def snapshot(self, serie_janela: bool = True) -> dict:
+        agora = self._relogio()
+        decorrido = agora - self.inicio
+        entregues = self.bytes_entregues
+        t_anterior, entregues_anterior = self._ultimo_snapshot
+        self._ultimo_snapshot = (agora, entregues)
+        intervalo = agora - t_anterior
+        dados = {contador: getattr(self, contador) for contador in CONTADORES}
+        dados.update({
+            'nome': self.nome,
+            'tempo': round(decorrido, 4),
+            'goodput_bps': entregues * 8 / decorrido if decorrido > 0 else 0.0,
+            # Desde o snapshot anterior
+            'goodput_recente_bps': (entregues - entregues_anterior) * 8 / intervalo if intervalo > 0 else 0.0,
+            'rtt': {
+                'limites': list(self.limites_rtt),
+                'contagens': list(self.histograma_rtt),
+                'media': self.soma_rtt / self.amostras_rtt if self.amostras_rtt else None,
+                'p50': self._percentil_rtt(0.5),
+                'p99': self._percentil_rtt(0.99),
+            },
+        })
+        if serie_janela:
+            dados['janela'] = self.serie_janela()
+        return dados
+
+
+class ExportadorJSONL:
+    """Grava periodicamente o snapshot de cada fonte como uma linha JSON.
+
+    'fontes' são objetos Metricas (ou qualquer coisa com snapshot()); os
+    campos de 'extra' (ex.: o caso de um benchmark) entram em todas as linhas.
+    """
+
+    def __init__(self, caminho, fontes, intervalo: float = 1.0, serie_janela: bool = False, extra: dict = None):
+        self.caminho = caminho
+        self.fontes = list(fontes)
+        self.intervalo = intervalo
+        self.serie_janela = serie_janela
+        self.extra = extra or {}
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="Metricas-jsonl", daemon=True)
+
+    def iniciar(self):
+        self._thread.start()
+        return self
+
+    def _gravar(self, arquivo):
+        agora = time.time()
+        for fonte in self.fontes:
+            linha = fonte.snapshot(self.serie_janela)
+            linha['instante'] = agora
+            linha.update(self.extra)
+            arquivo.write(json.dumps(linha) + '\n')
+        arquivo.flush()
+
+    def _executar(self):
+        with open(self.caminho, 'a', encoding='utf-8') as arquivo:
+            while not self._parar.wait(self.intervalo):
+                self._gravar(arquivo)
+            self._gravar(arquivo) # Estado final
+
+    def parar(self):
+        self._parar.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.intervalo + 1.0)
+
+
+class LockMedido:
+    """threading.Lock que mede a espera para adquirir e o tempo de posse.
+
+    Serve como lock de um threading.Condition. Sem disputa, adquirir custa
+    uma tentativa não bloqueante e uma leitura do relógio.
+    """
+
+    __slots__ = ('_lock', '_adquirido_em', 'aquisicoes', 'disputadas', 'espera_total', 'espera_maxima',
+                 'posse_total', 'posse_maxima')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._adquirido_em = 0.0
+        self.zerar()
+
+    def zerar(self):
+        self.aquisicoes = 0
+        self.disputadas = 0 # Aquisições que precisaram esperar
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.posse_total = 0.0
+        self.posse_maxima = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            inicio = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            agora = time.perf_counter()
+            espera = agora - inicio
+            self.disputadas += 1
+            self.espera_total += espera
+            if espera > self.espera_maxima:
+                self.espera_maxima = espera
+        else:
+            agora = time.perf_counter()
+        self.aquisicoes += 1
+        self._adquirido_em = agora
+        return True
+
+    def release(self):
+        posse = time.perf_counter() - self._adquirido_em
+        self.posse_total += posse
+        if posse > self.posse_maxima:
+            self.posse_maxima = posse
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def snapshot(self) -> dict:
+        """Contagens e tempos em segundos (leitura aproximada, sem o lock)."""
+        return {
+            'aquisicoes': self.aquisicoes,
+            'disputadas': self.disputadas,
+            'espera_total': self.espera_total,
+            'espera_maxima': self.espera_maxima,
+            'espera_media': self.espera_total / self.disputadas if self.disputadas else 0.0,
+            'posse_total': self.posse_total,
+            'posse_maxima': self.posse_maxima,
+        }
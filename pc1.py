@@ -1,3 +1,5 @@
+import sys
+
 from Janela import Envio
 
 IP = '127.0.0.1'
@@ -6,12 +8,14 @@ PORTA = 55555
 remetente = Envio(IP,PORTA)
 
 try:
-    message = input("Digite sua mensagem:  ")
-
-    remetente.enfileirar_mensagens([message])
+    if len(sys.argv) > 1:
+        # python pc1.py arquivo: envia o arquivo sem carregá-lo inteiro na memória
+        remetente.enfileirar_fluxo(sys.argv[1])
+    else:
+        message = input("Digite sua mensagem:  ")
+        remetente.enfileirar_mensagens([message])
     remetente.esperar_confirmacao_total()
 except KeyboardInterrupt:
     print("Envio interompido")
 finally:
     remetente.fechar()
-
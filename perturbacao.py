@@ -0,0 +1,227 @@
+import heapq, itertools, random, select, threading, time
+
+import registro
+from metricas import Metricas
+
+# Motor de perturbações do roteador (perda, corrupção, atraso, duplicação e
+# reordenação). Cada pacote é sorteado de forma independente segundo o perfil
+# da sua direção, e os pacotes atrasados vão para um heap ordenado pelo prazo
+# de envio, atendido por uma thread de transmissão dedicada. Assim a thread
+# que faz recvfrom nunca dorme.
+# Com um Enlace (enlace.py), o pacote primeiro passa pela fila do gargalo e o
+# atraso do perfil (propagação) conta a partir da saída do enlace.
+# Com uma captura (captura.py), cada envio é registrado com a marca do pacote.
+
+log = registro.obter('Roteador')
+
+ESPERA_ENVIO = 0.05 # Espera máxima (s) pelo buffer de envio cheio de um socket sem bloqueio
+
+
+# Distribuições de atraso (em segundos)
+class AtrasoFixo:
+    def __init__(self, segundos: float = 0.0):
+        self.segundos = segundos
+
+    def amostrar(self, rng: random.Random) -> float:
+        return self.segundos
+
+    def __repr__(self):
+        return f"AtrasoFixo({self.segundos})"
+
+
+class AtrasoUniforme:
+    def __init__(self, minimo: float, maximo: float):
+        self.minimo = minimo
+        self.maximo = maximo
+
+    def amostrar(self, rng: random.Random) -> float:
+        return rng.uniform(self.minimo, self.maximo)
+
+    def __repr__(self):
+        return f"AtrasoUniforme({self.minimo}, {self.maximo})"
+
+
+class AtrasoNormal:
+    """Atraso médio 'media' com jitter gaussiano de desvio 'jitter' (nunca negativo)."""
+
+    def __init__(self, media: float, jitter: float):
+        self.media = media
+        self.jitter = jitter
+
+    def amostrar(self, rng: random.Random) -> float:
+        return max(0.0, rng.gauss(self.media, self.jitter))
+
+    def __repr__(self):
+        return f"AtrasoNormal({self.media}, {self.jitter})"
+
+
+SEM_ATRASO = AtrasoFixo(0.0)
+
+
+class PerfilPerturbacao:
+    """Probabilidades (0 a 1) de cada perturbação para uma direção do tráfego."""
+
+    def __init__(self, perda=0.0, corrupcao=0.0, duplicacao=0.0, reordenacao=0.0,
+                 atraso=SEM_ATRASO, atraso_duplicata=0.1, atraso_reordenacao=0.05):
+        self.perda = perda
+        self.corrupcao = corrupcao
+        self.duplicacao = duplicacao
+        self.reordenacao = reordenacao
+        self.atraso = atraso
+        self.atraso_duplicata = atraso_duplicata # Atraso extra da cópia duplicada
+        # Atraso extra de um pacote "reordenado": os seguintes passam na frente dele
+        self.atraso_reordenacao = atraso_reordenacao
+
+    def __repr__(self):
+        return (f"PerfilPerturbacao(perda={self.perda}, corrupcao={self.corrupcao}, "
+                f"duplicacao={self.duplicacao}, reordenacao={self.reordenacao}, atraso={self.atraso})")
+
+
+class MotorPerturbacao:
+    def __init__(self, sock, semente=None, metricas=None):
+        self.sock = sock
+        self.metricas = metricas if metricas is not None else Metricas("roteador")
+        self.rng = random.Random(semente)
+        # Heap de (instante de envio, desempate, dados, destino)
+        self._heap = []
+        self._contador = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self.contadores = {'encaminhados': 0, 'perdidos': 0, 'corrompidos': 0,
+                           'duplicados': 0, 'reordenados': 0, 'atrasados': 0, 'descartados_fila': 0,
+                           'descartados_envio': 0} # Buffer de envio do socket cheio por mais de ESPERA_ENVIO
+        self.captura = None # GravadorCaptura (ou None): registra as saídas
+        self.rodando = True
+        self._iniciar_transmissao()
+
+    def _iniciar_transmissao(self):
+        self._thread = threading.Thread(target=self._transmitir, name="Roteador-tx", daemon=True)
+        self._thread.start()
+
+    def processar(self, dados, dest, perfil: PerfilPerturbacao, enlace=None, marca: int = 0) -> list:
+        """Aplica o perfil (e o enlace, se houver) ao pacote e agenda o(s) envio(s).
+
+        Retorna as perturbações aplicadas. 'marca' identifica o pacote na captura.
+        """
+        rng = self.rng
+        acoes = []
+        if perfil.perda and rng.random() < perfil.perda:
+            self.contadores['perdidos'] += 1
+            self.metricas.descartados += 1
+            return ['PERDA']
+        if perfil.corrupcao and rng.random() < perfil.corrupcao and len(dados) > 0:
+            dados = bytearray(dados)
+            dados[rng.randrange(len(dados))] = rng.randrange(256)
+            self.contadores['corrompidos'] += 1
+            acoes.append('CORRUPÇÃO')
+        atraso = perfil.atraso.amostrar(rng)
+        fila = self._enfileirar(enlace, len(dados))
+        if fila is None:
+            self.contadores['descartados_fila'] += 1
+            self.metricas.descartados += 1
+            return acoes + ['DESCARTE NA FILA']
+        if perfil.reordenacao and rng.random() < perfil.reordenacao:
+            atraso += perfil.atraso_reordenacao
+            self.contadores['reordenados'] += 1
+            acoes.append('REORDENAÇÃO')
+        if atraso > 0:
+            self.contadores['atrasados'] += 1
+            acoes.append('ATRASO')
+        self.agendar(dados, dest, fila + atraso, marca)
+        if perfil.duplicacao and rng.random() < perfil.duplicacao:
+            self.contadores['duplicados'] += 1
+            self.metricas.duplicados += 1
+            acoes.append('DUPLICAÇÃO')
+            # A cópia também ocupa o enlace
+            fila = self._enfileirar(enlace, len(dados))
+            if fila is None:
+                self.contadores['descartados_fila'] += 1
+                self.metricas.descartados += 1
+            else:
+                self.agendar(dados, dest, fila + atraso + perfil.atraso_duplicata, marca)
+        return acoes
+
+    def _agora(self) -> float:
+        """Relógio dos prazos e do enlace (o simulador usa o relógio virtual)."""
+        return time.monotonic()
+
+    def _enfileirar(self, enlace, tamanho: int):
+        """Tempo (s) de fila e serialização no enlace; None se o pacote foi descartado."""
+        if enlace is None:
+            return 0.0
+        agora = self._agora()
+        saida = enlace.admitir(tamanho, agora)
+        return None if saida is None else saida - agora
+
+    def agendar(self, dados, dest, atraso: float, marca: int = 0):
+        """Envia 'dados' para 'dest' daqui a 'atraso' segundos, sem bloquear o chamador."""
+        if atraso <= 0:
+            self._enviar(dados, dest, marca) # Sem atraso: não precisa passar pela thread de transmissão
+            return
+        prazo = self._agora() + atraso
+        with self._cond:
+            # Copia: 'dados' pode ser uma view sobre o buffer de recepção reaproveitado
+            heapq.heappush(self._heap, (prazo, next(self._contador), bytes(dados), dest, marca))
+            if self._heap[0][0] == prazo:
+                self._cond.notify() # Novo prazo mais cedo: acorda a thread de transmissão
+
+    def _sendto(self, dados, dest) -> bool:
+        """sendto que, no socket sem bloqueio (executar_lotes), espera o buffer de envio esvaziar.
+
+        Retorna False se o socket não aceitou o pacote em ESPERA_ENVIO segundos.
+        """
+        prazo = None
+        while True:
+            try:
+                self.sock.sendto(dados, dest)
+                return True
+            except BlockingIOError:
+                agora = time.monotonic()
+                if prazo is None:
+                    prazo = agora + ESPERA_ENVIO
+                if agora >= prazo or not select.select((), (self.sock,), (), prazo - agora)[1]:
+                    return False
+
+    def _enviar(self, dados, dest, marca: int = 0):
+        try:
+            if not self._sendto(dados, dest):
+                self.contadores['descartados_envio'] += 1
+                self.metricas.descartados += 1
+                log.debug("[Roteador] Buffer de envio cheio, pacote para %s descartado", dest)
+                return
+            self.contadores['encaminhados'] += 1
+            self.metricas.enviados += 1
+            self.metricas.bytes_entregues += len(dados)
+            if self.captura is not None:
+                self.captura.saida(marca, dest, dados)
+        except OSError as e:
+            if self.rodando:
+                log.erro("[Roteador] Erro ao enviar mensagem: %s", e)
+
+    def _transmitir(self):
+        while True:
+            with self._cond:
+                while self.rodando and not self._heap:
+                    self._cond.wait()
+                if not self.rodando:
+                    return
+                espera = self._heap[0][0] - time.monotonic()
+                if espera > 0:
+                    self._cond.wait(espera)
+                    continue
+                vencidos = []
+                agora = time.monotonic()
+                while self._heap and self._heap[0][0] <= agora:
+                    vencidos.append(heapq.heappop(self._heap))
+            for _, _, dados, dest, marca in vencidos:
+                self._enviar(dados, dest, marca)
+
+    def pendentes(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def parar(self):
+        with self._cond:
+            self.rodando = False
+            self._heap.clear()
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
@@ -0,0 +1,393 @@
+import bisect, socket, threading, time
+
+import fec
+import registro
+import segmento
+from metricas import Metricas
+from Janela import IP, PORTA, TAM_PAYLOAD_BYTES, JANELA_RECEPCAO
+
+# Receptor Selective Repeat em Python (equivalente ao MaquinaC.java), usando o
+# mesmo codec e a mesma numeração em bits do Envio.
+#
+# Os dados são remontados em um anel de bytes pré-alocado indexado pelo
+# offset de sequência: o segmento com seq S (em bits) tem seu payload gravado
+# na posição (S // 8 + tamanho do cabeçalho) % capacidade. O anel tem o
+# tamanho da janela (JANELA_RECEPCAO, em Janela.py, por padrão; o Envio usa o
+# mesmo valor como janela_receptor padrão), então a memória do receptor é
+# limitada por ela.
+#
+# Com sack=True (padrão) os ACKs são seletivos: ACK cumulativo (rcv_base) mais
+# os blocos já recebidos fora de ordem. Segmentos em ordem são confirmados a
+# cada ack_a_cada segmentos ou depois de atraso_ack segundos, o que vier
+# primeiro; segmentos fora de ordem, duplicados ou que preenchem um buraco
+# são confirmados na hora. Com sack=False, um ACK por segmento (como o MaquinaC).
+#
+# Com 'canal' (um Transporte de Janela.py, ex.: a rede simulada de
+# simulacao.py) o destinatário não abre socket: o transporte entrega os
+# datagramas e dá o relógio; num transporte síncrono o ACK adiado é um evento.
+#
+# Segmentos de paridade (FEC, formato em fec.py) reconstroem o único segmento
+# que faltar no seu grupo, lendo os outros do anel (inclusive os já entregues,
+# enquanto não forem sobrescritos). Com duas ou mais perdas, a paridade espera
+# até a retransmissão de uma delas deixar só uma faltando. O ACK que segue uma
+# reconstrução leva o bit FLAG_FEC.
+
+ACK_A_CADA = 2 # Segmentos em ordem por ACK coalescido
+ATRASO_ACK = 0.005 # Espera máxima (s) de um ACK adiado; bem abaixo do RTO mínimo
+ESPERA_RX = 0.5 # Timeout do socket sem ACK adiado pendente
+_MODULO_SEQ = 1 << 32
+
+log = registro.obter('Recepcao')
+
+
+def _imprimir_dados(dados: memoryview):
+    # Camada de aplicação padrão
+    print("-> [CAMADA SUPERIOR] Dados entregues: " + bytes(dados).decode('utf-8', errors='replace'))
+
+
+class Recepcao:
+    def __init__(self, ip=IP, porta=PORTA, janela=JANELA_RECEPCAO, mss=TAM_PAYLOAD_BYTES, entregar=None,
+                 conexao=None, sack=True, ack_a_cada=ACK_A_CADA, atraso_ack=ATRASO_ACK, canal=None):
+        """'entregar' recebe cada trecho contíguo como memoryview sobre o anel.
+
+        A view só é válida durante a chamada: copie (bytes(view)) se precisar guardar.
+        Com 'conexao', só aceita segmentos desse ID e o anuncia ao roteador.
+        'ack_a_cada' e 'atraso_ack' só valem com sack=True (1 = sem adiar).
+        """
+        self.dest = (ip, porta) # Roteador
+        self.entregar = entregar or _imprimir_dados
+        self.conexao = conexao or 0
+        tamanho_maximo = segmento.tamanho_segmento(mss, segmento.precisa_estender(mss, self.conexao))
+        if janela < tamanho_maximo:
+            raise ValueError(f"Janela de recepção ({janela}B) menor que um segmento ({tamanho_maximo}B)")
+
+        self.canal = canal
+        self.agora = canal.agora if canal is not None else time.monotonic
+        if canal is not None:
+            self.sock = None
+            log.info("Destinatário (Recepcao) ouvindo em: %s", canal.endereco())
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(('', 0))
+            self.sock.settimeout(ESPERA_RX)
+            log.info("Destinatário (Recepcao) ouvindo em: %s", self.sock.getsockname())
+        self._espera_rx = ESPERA_RX
+
+        #Controle da janela de recepção (em bits, como o seq do Envio)
+        self.rcv_base = 0
+        self.capacidade = janela # Bytes do anel
+        self.anel = bytearray(janela)
+        self._view_anel = memoryview(self.anel)
+        # Segmentos fora de ordem já gravados no anel: {seq_bits: (inicio_payload, tamanho_payload, tamanho_segmento_bits)}
+        self.pendentes = {}
+        # Buffer de recepção reaproveitado a cada datagrama (recvfrom_into)
+        self._buffer_rx = bytearray(segmento.TAM_MAX_DATAGRAMA)
+        self._view_rx = memoryview(self._buffer_rx)
+        self.bytes_entregues = 0
+        # Paridades com duas ou mais perdas no grupo: {seq inicial: (fim, membros, tamanhos, xor, maior tamanho)}
+        self.paridades = {}
+        self._inicios_paridade = [] # Chaves de 'paridades' em ordem
+        self._maior_fim = 0 # Fim (em bits) do segmento mais adiantado já gravado no anel
+        self.metricas = Metricas(f"recepcao-{self.conexao}", relogio=self.agora)
+
+        # ACKs seletivos e adiados
+        self.sack = sack
+        self.ack_a_cada = max(1, ack_a_cada)
+        self.atraso_ack = atraso_ack
+        self._acks_devidos = 0 # Segmentos em ordem ainda não confirmados
+        self._prazo_ack = None # Instante (self.agora) em que o ACK adiado sai
+        self._addr_ack = None
+
+        self.lock = threading.Lock()
+        self.rodando = True
+        self.th_rx = None
+        if canal is not None:
+            canal.registrar(self)
+
+    def _enviar(self, pacote: bytes, addr):
+        if self.canal is not None:
+            self.canal.enviar((pacote,), addr)
+        else:
+            self.sock.sendto(pacote, addr)
+
+    def registrar(self):
+        """Envia o pacote inicial para o roteador aprender o endereço do destinatário."""
+        if self.canal is not None:
+            return # Sem roteador para aprender rotas: o transporte já entrega a este destinatário
+        if self.conexao:
+            self.sock.sendto(b"INIT_PC2:%d" % self.conexao, self.dest)
+        else:
+            self.sock.sendto(b"INIT_PC2", self.dest)
+        log.info("[Recepcao] Pacote de inicializacao enviado para o Roteador.")
+
+    # ACKs
+    def _enviar_ack(self, seq: int, addr, flags_extra: int = 0):
+        # seq = -1 (0xFFFFFFFF) indica que não é um pacote de dados, como no MaquinaC
+        self._enviar(segmento.montar_segmento(0xFFFFFFFF, seq, 1, conexao=self.conexao, flags_extra=flags_extra),
+                     addr)
+        self.metricas.acks += 1
+
+    def _blocos_sack(self, recente: int) -> list:
+        """Blocos [início, fim) recebidos acima de rcv_base; o que contém 'recente' primeiro."""
+        blocos = []
+        for seq in sorted(self.pendentes):
+            fim = seq + self.pendentes[seq][2]
+            if blocos and blocos[-1][1] == seq:
+                blocos[-1][1] = fim
+            else:
+                blocos.append([seq, fim])
+        for indice, (inicio, fim) in enumerate(blocos):
+            if inicio <= recente < fim:
+                blocos.insert(0, blocos.pop(indice))
+                break
+        return blocos
+
+    def _enviar_sack(self, addr, recente: int = -1, flags_extra: int = 0):
+        """ACK seletivo com o estado atual da janela (substitui qualquer ACK adiado)."""
+        pacote = segmento.montar_ack_sack(self.rcv_base, self._blocos_sack(recente) if self.pendentes else [],
+                                          self.conexao, flags_extra)
+        self._enviar(pacote, addr)
+        self.metricas.acks += 1
+        self._acks_devidos = 0
+        self._prazo_ack = None
+
+    def _adiar_ack(self, addr):
+        """Conta um segmento em ordem; confirma ao juntar ack_a_cada ou quando o prazo vencer."""
+        self._addr_ack = addr
+        self._acks_devidos += 1
+        if self._acks_devidos >= self.ack_a_cada:
+            self._enviar_sack(addr)
+        elif self._prazo_ack is None:
+            self._prazo_ack = self.agora() + self.atraso_ack
+            if self.canal is not None and self.canal.sincrono:
+                self.canal.agendar(self.atraso_ack, self._verificar_ack_adiado)
+
+    def _verificar_ack_adiado(self):
+        if self._prazo_ack is not None and self.agora() >= self._prazo_ack:
+            with self.lock:
+                if self._prazo_ack is not None:
+                    self._enviar_sack(self._addr_ack)
+
+    # Anel
+    def _gravar(self, inicio: int, dados: memoryview):
+        """Copia 'dados' para o anel a partir de 'inicio' (dando a volta se preciso)."""
+        pos = inicio % self.capacidade
+        primeiro = min(len(dados), self.capacidade - pos)
+        self.anel[pos:pos + primeiro] = dados[:primeiro]
+        if primeiro < len(dados):
+            self.anel[:len(dados) - primeiro] = dados[primeiro:]
+
+    def _trechos(self, inicio: int, tamanho: int):
+        """Views (sem cópia) do anel para 'tamanho' bytes a partir de 'inicio'."""
+        pos = inicio % self.capacidade
+        primeiro = min(tamanho, self.capacidade - pos)
+        yield self._view_anel[pos:pos + primeiro]
+        if primeiro < tamanho:
+            yield self._view_anel[:tamanho - primeiro]
+
+    def _guardar(self, seq_abs: int, dados, tamanho_segmento_bits: int):
+        """Grava o payload do segmento no anel e o marca como recebido."""
+        # O payload fica logo depois do espaço do cabeçalho no offset do segmento
+        tam_cabecalho = tamanho_segmento_bits // 8 - len(dados) - len(dados) % 2
+        inicio_payload = seq_abs // 8 + tam_cabecalho
+        self._gravar(inicio_payload, dados)
+        self.pendentes[seq_abs] = (inicio_payload, len(dados), tamanho_segmento_bits)
+        if seq_abs + tamanho_segmento_bits > self._maior_fim:
+            self._maior_fim = seq_abs + tamanho_segmento_bits
+
+    def _processar_segmento(self, info: dict, tamanho_segmento_bits: int, addr):
+        seq = info['seq']
+        dados = info['dados']
+        # Distância até a base no espaço de 32 bits (trata a volta do número de sequência)
+        offset = (seq - self.rcv_base) % _MODULO_SEQ
+        if offset + tamanho_segmento_bits <= self.capacidade * 8:
+            # Dentro da janela: confirma e guarda (se ainda não tinha)
+            if not self.sack:
+                self._enviar_ack(seq, addr)
+            seq_abs = self.rcv_base + offset
+            # Só o segmento novo que chega em ordem, sem buraco depois dele, pode ter o ACK adiado
+            em_ordem = offset == 0 and not self.pendentes
+            if seq_abs not in self.pendentes:
+                self._guardar(seq_abs, dados, tamanho_segmento_bits)
+                if self.paridades:
+                    self._reavaliar_paridade(seq_abs, addr)
+            else:
+                self.metricas.duplicados += 1
+            self._entregar_contiguos()
+            if self.sack:
+                if em_ordem:
+                    self._adiar_ack(addr)
+                else:
+                    self._enviar_sack(addr, seq_abs)
+        elif offset >= _MODULO_SEQ // 2:
+            # Segmento antigo (já entregue): o ACK pode ter se perdido, reenvia
+            self.metricas.duplicados += 1
+            if self.sack:
+                self._enviar_sack(addr)
+            else:
+                self._enviar_ack(seq, addr)
+        else:
+            self.metricas.descartados += 1
+            log.debug("[Recepcao] Segmento fora da janela descartado (Base: %d, Recebido: %d)", self.rcv_base, seq)
+
+    # FEC
+    def _processar_paridade(self, info: dict, addr):
+        lido = fec.ler_paridade(info['dados'])
+        if lido is None:
+            self.metricas.descartados += 1
+            return
+        estendido, tamanhos, xor = lido
+        # O grupo pode começar antes da base (membros já entregues)
+        offset = (info['seq'] - self.rcv_base) % _MODULO_SEQ
+        if offset >= _MODULO_SEQ // 2:
+            offset -= _MODULO_SEQ
+        inicio = self.rcv_base + offset
+        membros = fec.seqs_grupo(inicio, tamanhos, estendido)
+        fim = membros[-1][0] + membros[-1][1]
+        if fim <= self.rcv_base or inicio in self.paridades:
+            return # Grupo todo entregue, ou paridade duplicada de um grupo que já espera
+        grupo = (fim, membros, tamanhos, xor, max(tamanhos))
+        if not self._aplicar_paridade(grupo, addr):
+            self.paridades[inicio] = grupo
+            bisect.insort(self._inicios_paridade, inicio)
+
+    def _reavaliar_paridade(self, seq_abs: int, addr):
+        """Um segmento novo chegou: tenta de novo a paridade que espera pelo grupo dele."""
+        inicios = self._inicios_paridade
+        while inicios and self.paridades[inicios[0]][0] <= self.rcv_base:
+            del self.paridades[inicios.pop(0)] # Grupos já entregues
+        indice = bisect.bisect_right(inicios, seq_abs) - 1
+        if indice < 0:
+            return
+        grupo = self.paridades[inicios[indice]]
+        if seq_abs < grupo[0] and self._aplicar_paridade(grupo, addr):
+            del self.paridades[inicios.pop(indice)]
+
+    def _aplicar_paridade(self, grupo, addr) -> bool:
+        """Reconstrói o membro que falta no grupo; False se ainda faltam dois ou mais."""
+        _, membros, tamanhos, xor, tamanho_maximo = grupo
+        # Um segmento entregue abaixo deste seq pode ter sido sobrescrito no anel
+        limite_anel = self._maior_fim - self.capacidade * 8
+        faltando = None
+        for indice, (seq, bits) in enumerate(membros):
+            tamanho = tamanhos[indice]
+            if seq in self.pendentes:
+                inicio_payload = self.pendentes[seq][0]
+            elif seq < self.rcv_base:
+                if seq < limite_anel:
+                    return True # Sem os dados dele não há o que reconstruir: fica para a retransmissão
+                inicio_payload = (seq + bits) // 8 - tamanho - tamanho % 2
+            elif faltando is None:
+                faltando = indice
+                continue
+            else:
+                return False
+            trechos = list(self._trechos(inicio_payload, tamanho))
+            dados = trechos[0] if len(trechos) == 1 else b''.join(trechos)
+            xor ^= int.from_bytes(dados, 'big') << (8 * (tamanho_maximo - tamanho))
+        if faltando is None:
+            return True # Nada se perdeu
+        seq, bits = membros[faltando]
+        if seq + bits - self.rcv_base > self.capacidade * 8:
+            return False # Fora da janela por enquanto
+        self._guardar(seq, fec.recuperar(xor, tamanho_maximo, tamanhos[faltando]), bits)
+        self.metricas.recuperados_fec += 1
+        log.debug("[Recepcao] Segmento %d reconstruído pela paridade", seq)
+        self._entregar_contiguos()
+        if self.sack:
+            self._enviar_sack(addr, seq, segmento.FLAG_FEC)
+        else:
+            self._enviar_ack(seq, addr, segmento.FLAG_FEC)
+        return True
+
+    def _entregar_contiguos(self):
+        while self.rcv_base in self.pendentes:
+            inicio_payload, tamanho, tamanho_segmento_bits = self.pendentes.pop(self.rcv_base)
+            for trecho in self._trechos(inicio_payload, tamanho):
+                if trecho:
+                    self.entregar(trecho)
+            self.bytes_entregues += tamanho
+            self.metricas.bytes_entregues += tamanho
+            self.rcv_base += tamanho_segmento_bits
+
+    # Recepção
+    def receber(self) -> bool:
+        """Trata um datagrama; retorna False se o socket deu timeout."""
+        # Com um ACK adiado pendente, a espera do socket vai só até o prazo dele
+        espera = ESPERA_RX
+        if self._prazo_ack is not None:
+            espera = min(ESPERA_RX, max(0.0005, self._prazo_ack - self.agora()))
+        if espera != self._espera_rx:
+            self.sock.settimeout(espera)
+            self._espera_rx = espera
+        try:
+            n, addr = self.sock.recvfrom_into(self._buffer_rx)
+        except socket.timeout:
+            self._verificar_ack_adiado()
+            return False
+        self._tratar_datagrama(self._view_rx[:n], addr)
+        self._verificar_ack_adiado()
+        return True
+
+    def _tratar_datagrama(self, msg, addr):
+        info = segmento.ler_segmento(msg)
+        if info is None:
+            if len(msg) >= segmento.TAM_CABECALHO:
+                self.metricas.falhas_checksum += 1
+                log.debug("[Recepcao] PACOTE CORROMPIDO! Checksum falhou.")
+            return
+        if info['flag'] == 1 or info['conexao'] != self.conexao:
+            return # ACKs e segmentos de outras conexões não são para este destinatário
+        if info['flags'] & segmento.FLAG_FEC:
+            self.metricas.paridades += 1
+            with self.lock:
+                self._processar_paridade(info, addr)
+            return
+        self.metricas.recebidos += 1
+        with self.lock:
+            self._processar_segmento(info, len(msg) * 8, addr)
+
+    def _tratar_datagramas(self, mensagens, addr):
+        """Datagramas entregues por um transporte (canal), todos vindos de 'addr'."""
+        for msg in mensagens:
+            self._tratar_datagrama(msg, addr)
+
+    def executar(self):
+        """Recebe segmentos até fechar() ser chamado."""
+        while self.rodando:
+            try:
+                self.receber()
+            except OSError:
+                if self.rodando:
+                    log.info("[Recepcao] Socket fechado.")
+                break
+
+    def iniciar(self):
+        """Registra no roteador e passa a receber em uma thread dedicada."""
+        self.registrar()
+        if self.canal is not None:
+            return # Quem entrega os datagramas é o transporte
+        self.th_rx = threading.Thread(target=self.executar, daemon=True)
+        self.th_rx.start()
+
+    def fechar(self):
+        self.rodando = False
+        if self.th_rx is not None and self.th_rx.is_alive():
+            self.th_rx.join(timeout=1.0)
+        if self.canal is not None:
+            self.canal.remover(self)
+        else:
+            self.sock.close()
+        log.info("[FECHADO]")
+
+
+if __name__ == '__main__':
+    receptor = Recepcao(IP, PORTA)
+    print("[Recepcao] Destinatario RDT (Selective Repeat) iniciado.")
+    receptor.registrar()
+    try:
+        receptor.executar()
+    except KeyboardInterrupt:
+        print("\nEncerrando destinatário...")
+    finally:
+        receptor.fechar()
@@ -0,0 +1,174 @@
+import atexit, os, sys, threading
+from collections import deque
+
+# Registro (log) com níveis, compartilhado por Envio, Recepcao e roteador.
+#
+# As chamadas só guardam (nível, nome, mensagem, args) em um anel de tamanho
+# fixo; a formatação ('mensagem % args') e a escrita no terminal são feitas
+# por uma thread de fundo. Com o nível desligado a chamada é só uma
+# comparação. Se o anel encher, as mensagens mais antigas são descartadas
+# (nunca bloqueia quem registra).
+#
+# O nível inicial vem da variável de ambiente RDT_LOG (DEBUG, INFO, AVISO,
+# ERRO); o padrão é INFO, então as mensagens por pacote (DEBUG) ficam
+# desligadas.
+
+DEBUG = 10
+INFO = 20
+AVISO = 30
+ERRO = 40
+NIVEIS = {'DEBUG': DEBUG, 'INFO': INFO, 'AVISO': AVISO, 'ERRO': ERRO}
+
+CAPACIDADE = 8192 # Mensagens no anel
+INTERVALO = 0.05 # Espera máxima (s) da thread de escrita entre esvaziamentos
+
+
+def _converter_nivel(nivel) -> int:
+    if isinstance(nivel, str):
+        try:
+            return NIVEIS[nivel.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Nível de log desconhecido: {nivel}") from None
+    return int(nivel)
+
+
+_nivel = _converter_nivel(os.environ.get('RDT_LOG', 'INFO'))
+
+
+class _Saida:
+    """Anel de mensagens pendentes e a thread que as escreve."""
+
+    def __init__(self, capacidade=CAPACIDADE, arquivo=None):
+        self.anel = deque(maxlen=capacidade)
+        self.arquivo = arquivo
+        self.descartadas = 0
+        self._evento = threading.Event()
+        self._lock = threading.Lock() # Uma escrita por vez (thread de fundo ou esvaziar())
+        self._thread = None
+
+    def publicar(self, item):
+        anel = self.anel
+        if len(anel) == anel.maxlen:
+            self.descartadas += 1
+        anel.append(item)
+        if self._thread is None:
+            self._iniciar()
+        elif not self._evento.is_set():
+            self._evento.set()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._escrever, name="Registro", daemon=True)
+                self._thread.start()
+
+    def _escrever(self):
+        while True:
+            self._evento.wait(INTERVALO)
+            self._evento.clear()
+            self.esvaziar()
+
+    def esvaziar(self):
+        """Formata e escreve tudo o que está no anel."""
+        with self._lock:
+            anel = self.anel
+            if not anel:
+                return
+            linhas = []
+            while anel:
+                nivel, nome, mensagem, args = anel.popleft()
+                if args:
+                    try:
+                        mensagem = mensagem % args
+                    except Exception as e:
+                        mensagem = f"{mensagem!r} {args!r} (erro de formatação: {e})"
+                linhas.append(mensagem)
+            if self.descartadas:
+                linhas.append(f"[Registro] {self.descartadas} mensagens descartadas (anel cheio)")
+                self.descartadas = 0
+            arquivo = self.arquivo or sys.stdout
+            try:
+                arquivo.write('\n'.join(linhas) + '\n')
+                arquivo.flush()
+            except (OSError, ValueError):
+                pass # Terminal fechado no encerramento
+
+    def apos_fork(self):
+        # A thread não existe no processo filho; o que estava pendente é do pai
+        self.anel.clear()
+        self.descartadas = 0
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+
+_saida = _Saida()
+atexit.register(_saida.esvaziar)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_saida.apos_fork)
+
+
+class Registrador:
+    """Ponto de registro de um componente. Use formatação preguiçosa:
+
+        log.debug("[ACK] Recebido para segmento %d", seq)
+
+    em vez de f-strings, para não formatar nada quando o nível está desligado.
+    """
+
+    __slots__ = ('nome',)
+
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    @staticmethod
+    def ativo(nivel: int) -> bool:
+        """True se 'nivel' está ligado (para proteger argumentos caros de calcular)."""
+        return nivel >= _nivel
+
+    def debug(self, mensagem, *args):
+        if _nivel <= DEBUG:
+            _saida.publicar((DEBUG, self.nome, mensagem, args))
+
+    def info(self, mensagem, *args):
+        if _nivel <= INFO:
+            _saida.publicar((INFO, self.nome, mensagem, args))
+
+    def aviso(self, mensagem, *args):
+        if _nivel <= AVISO:
+            _saida.publicar((AVISO, self.nome, mensagem, args))
+
+    def erro(self, mensagem, *args):
+        if _nivel <= ERRO:
+            _saida.publicar((ERRO, self.nome, mensagem, args))
+
+
+_registradores = {}
+
+
+def obter(nome: str) -> Registrador:
+    registrador = _registradores.get(nome)
+    if registrador is None:
+        registrador = _registradores[nome] = Registrador(nome)
+    return registrador
+
+
+def definir_nivel(nivel):
+    """Muda o nível global: int ou nome ('DEBUG', 'INFO', 'AVISO', 'ERRO')."""
+    global _nivel
+    _nivel = _converter_nivel(nivel)
+
+
+def nivel_atual() -> int:
+    return _nivel
+
+
+def definir_saida(arquivo):
+    """Arquivo de saída (padrão: sys.stdout)."""
+    _saida.esvaziar()
+    _saida.arquivo = arquivo
+
+
+def esvaziar():
+    """Escreve imediatamente o que estiver pendente."""
+    _saida.esvaziar()
@@ -1,12 +1,20 @@
-import random
-import socket, threading, time
+import argparse, select, socket, threading, time
 from enum import Enum
+import registro
+import segmento
+from metricas import Metricas, ExportadorJSONL
+from perturbacao import MotorPerturbacao, PerfilPerturbacao, AtrasoFixo
+from enlace import Enlace
+from captura import GravadorCaptura
 
 HOST = '127.0.0.1'  
 PORT = 55555        
-BUFFER_SIZE = 4096
+BUFFER_SIZE = segmento.TAM_MAX_DATAGRAMA # Cabe qualquer segmento, inclusive com cabeçalho estendido
 TIMEOUT_TIMER = 300.0 # Timeout do servidor, não do RDT
 MSS = 2
+LOTE = 64 # Datagramas lidos por vez no laço em lotes (executar_lotes)
+
+log = registro.obter('Roteador')
 
 # class syntax
 class Operations(Enum):
@@ -18,152 +26,401 @@ class Operations(Enum):
     REORDENAÇÃO = 6
 
 op_atual = Operations.NORMAL
-        
+
+# Perfil de perturbação equivalente a cada modo (probabilidade 1 = todo pacote)
+PERFIS_OPERACAO = {
+    Operations.NORMAL: PerfilPerturbacao(),
+    Operations.PERDA: PerfilPerturbacao(perda=1.0),
+    Operations.CORRUPÇÃO: PerfilPerturbacao(corrupcao=1.0),
+    Operations.ATRASO: PerfilPerturbacao(atraso=AtrasoFixo(1.0)),
+    Operations.DUPLICAÇÃO: PerfilPerturbacao(duplicacao=1.0),
+    Operations.REORDENAÇÃO: PerfilPerturbacao(reordenacao=0.5),
+}
+# Campo do perfil ajustado quando o modo é digitado com uma probabilidade (ex.: "PERDA 0.1")
+_CAMPO_OPERACAO = {
+    Operations.PERDA: 'perda',
+    Operations.CORRUPÇÃO: 'corrupcao',
+    Operations.DUPLICAÇÃO: 'duplicacao',
+    Operations.REORDENAÇÃO: 'reordenacao',
+}
+
+
+def perfil_operacao(op: Operations, valor: float = None) -> PerfilPerturbacao:
+    """Perfil do modo; com 'valor', a probabilidade (ou os segundos, no ATRASO) no lugar do preset."""
+    if valor is not None:
+        if op == Operations.ATRASO:
+            return PerfilPerturbacao(atraso=AtrasoFixo(valor))
+        if op in _CAMPO_OPERACAO:
+            return PerfilPerturbacao(**{_CAMPO_OPERACAO[op]: valor})
+    return PERFIS_OPERACAO[op]
+
+
+class TabelaRotas:
+    """Rotas {(endereço de origem, ID de conexão): destino} e o aprendizado das extremidades.
+
+    ID 0 = sem ID de conexão (roteamento só pelo endereço, como PC1 <-> PC2).
+    """
+
+    def __init__(self, ao_adicionar=None):
+        self.rotas = {}
+        self.pc1_addr = None
+        self.pc2_addr = None
+        # Extremidades já vistas de cada conexão com ID, até o par ficar completo
+        self.conexoes = {}
+        self.ao_adicionar = ao_adicionar # Chamado com (addr_a, addr_b, conexao) a cada rota nova
+
+    def adicionar(self, addr_a, addr_b, conexao=0):
+        self.rotas[(addr_a, conexao)] = addr_b
+        self.rotas[(addr_b, conexao)] = addr_a
+        if self.ao_adicionar is not None:
+            self.ao_adicionar(addr_a, addr_b, conexao)
+
+    def registrar(self, remetente, conexao):
+        """Aprende as extremidades de fluxos ainda sem rota."""
+        if conexao == 0:
+            # Modo original: o primeiro endereço é o PC1 e o seguinte, o PC2
+            if self.pc1_addr is None:
+                self.pc1_addr = remetente
+                log.info("[Roteador] PC1 (Remetente) registrado: %s", remetente)
+
+            elif self.pc2_addr is None and self.pc1_addr != remetente:
+                self.pc2_addr = remetente
+                log.info("[Roteador] PC2 (Destinatário) registrado: %s", remetente)
+                self.adicionar(self.pc1_addr, self.pc2_addr)
+            return
+
+        pontas = self.conexoes.setdefault(conexao, [])
+        if remetente not in pontas:
+            pontas.append(remetente)
+            log.info("[Roteador] Conexão %d: extremidade registrada %s", conexao, remetente)
+            if len(pontas) == 2:
+                self.adicionar(pontas[0], pontas[1], conexao)
+                del self.conexoes[conexao]
+
 
 class Servidor:
-    def __init__(self, HOST, PORT, BUFFER_SIZE, TIMEOUT_TIMER, MSS):
+    def __init__(self, HOST, PORT, BUFFER_SIZE, TIMEOUT_TIMER, MSS, reuseport=False):
+        """Com reuseport=True, vários processos podem abrir o mesmo endereço (ver roteador_workers.py)."""
         self.host = HOST
         self.port = PORT
         self.buffer_size = BUFFER_SIZE
         self.timeout_timer = TIMEOUT_TIMER
         self.mss = MSS
-        self.pc1_addr = None
-        self.pc2_addr = None
+        self.tabela = TabelaRotas()
+        self.rotas = self.tabela.rotas
+        # Se definido, recebe (remetente, conexao) de fluxos sem rota no lugar do aprendizado local
+        self.ao_registrar = None
+        # Contadores por fluxo: {(endereço de origem, ID de conexão): [pacotes, bytes]}
+        self.fluxos = {}
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if reuseport:
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.server_socket.bind((HOST, PORT))
         self.server_socket.settimeout(TIMEOUT_TIMER)
-        self.buffer = None
-        self.count = 0  # Para reordenação simples
-        print(f"Servidor (Roteador B) iniciado em {HOST}:{PORT}")
-        print(f"Operação atual: {op_atual.name}")
+        self.rodando = True
+        # Pacotes recebidos/encaminhados/descartados (bytes_entregues = bytes encaminhados)
+        self.metricas = Metricas("roteador")
+        # Perturbações sorteadas por pacote; atrasos vão para a thread de transmissão
+        self.motor = MotorPerturbacao(self.server_socket, metricas=self.metricas)
+        # Perfis por direção: {endereço de origem: PerfilPerturbacao}
+        self.perfis = {}
+        self.perfil_padrao = None # Se None, usa o perfil do modo atual (op_atual)
+        # Enlaces gargalo por direção: {endereço de origem: Enlace}
+        self.enlaces = {}
+        self.enlace_modelo = None # Copiado para cada direção nova (None = sem limite)
+        self.captura = None # GravadorCaptura ativo (iniciar_captura)
+        if not reuseport: # Com vários processos, quem anuncia é o PoolRoteador
+            log.info("Servidor (Roteador B) iniciado em %s:%s", HOST, PORT)
+            log.info("Operação atual: %s", op_atual.name)
+
+    def adicionar_rota(self, addr_a, addr_b, conexao=0):
+        """Configura um par de extremidades: o que chega de uma vai para a outra."""
+        self.tabela.adicionar(addr_a, addr_b, conexao)
+
+    @staticmethod
+    def conexao_do_pacote(bytes_recebidos) -> int:
+        """ID de conexão de um segmento ou de um pacote de registro 'INIT_PC2:<id>'."""
+        if bytes_recebidos[:9] == b"INIT_PC2:":
+            try:
+                return int(bytes(bytes_recebidos[9:]))
+            except ValueError:
+                return 0
+        return segmento.conexao_de(bytes_recebidos)
+
+    def _registrar(self, remetente, conexao):
+        if self.ao_registrar is not None:
+            self.ao_registrar(remetente, conexao)
+        else:
+            self.tabela.registrar(remetente, conexao)
+
+    def estatisticas_fluxos(self) -> dict:
+        """Pacotes e bytes recebidos por fluxo (origem, ID de conexão)."""
+        return {chave: {'pacotes': pacotes, 'bytes': total}
+                for chave, (pacotes, total) in self.fluxos.items()}
+
+    def _tratar_pacote(self, bytes_recebidos, remetente):
+        conexao = self.conexao_do_pacote(bytes_recebidos)
+        chave = (remetente, conexao)
+        if chave not in self.rotas:
+            self._registrar(remetente, conexao)
+
+        contador = self.fluxos.get(chave)
+        if contador is None:
+            contador = self.fluxos[chave] = [0, 0]
+        contador[0] += 1
+        contador[1] += len(bytes_recebidos)
+        self.metricas.recebidos += 1
+
+        if bytes_recebidos[:8] == b"INIT_PC2":
+            if self.captura is not None:
+                self.captura.entrada(0, ('REGISTRO',), remetente, None, bytes_recebidos)
+            return # Pacote de registro do destinatário, não é encaminhado
+
+        self.receber_mensagem(bytes_recebidos, remetente, self.rotas.get(chave))
 
     def start_server(self):
         try:
             while True:
-                bytes_recebidos, remetente = self.server_socket.recvfrom(BUFFER_SIZE)
-                if self.pc1_addr is None:
-                    self.pc1_addr = remetente
-                    print(f"[Roteador] PC1 (Remetente) registrado: {remetente}")
-
-                elif self.pc2_addr is None and self.pc1_addr != remetente:
-                    self.pc2_addr = remetente
-                    print(f"[Roteador] PC2 (Destinatário) registrado: {remetente}")
-
-                self.receber_mensagem(bytes_recebidos, remetente)
+                bytes_recebidos, remetente = self.server_socket.recvfrom(self.buffer_size)
+                self._tratar_pacote(bytes_recebidos, remetente)
 
         except socket.timeout:
-            print(f"[Roteador] Servidor inativo a muito tempo, encerrando...")
+            log.info("[Roteador] Servidor inativo a muito tempo, encerrando...")
         except OSError as e:
-            print(f"[Roteador] Erro no servidor: {e}")
+            log.erro("[Roteador] Erro no servidor: %s", e)
         finally:
+            self.motor.parar()
+            self.parar_captura()
             self.server_socket.close()
-            print("[Roteador] Servidor encerrado.")
+            log.info("[Roteador] Servidor encerrado.")
+
+    def executar_lotes(self, lote=LOTE, controle=None, ao_controle=None):
+        """Laço sem bloqueio: espera o socket ficar legível e drena até 'lote' datagramas.
 
+        Lê com recvfrom_into em um buffer pré-alocado. Se 'controle' (objeto com
+        fileno()) ficar legível, chama ao_controle(). Termina quando rodando = False
+        ou após TIMEOUT_TIMER sem tráfego.
+        """
+        sock = self.server_socket
+        sock.setblocking(False)
+        buffer_rx = bytearray(self.buffer_size)
+        view_rx = memoryview(buffer_rx)
+        esperar = [sock] if controle is None else [sock, controle]
+        ultimo_pacote = time.monotonic()
+        try:
+            while self.rodando:
+                prontos, _, _ = select.select(esperar, [], [], 0.5)
+                if controle is not None and controle in prontos:
+                    ao_controle()
+                if sock not in prontos:
+                    if time.monotonic() - ultimo_pacote > self.timeout_timer:
+                        log.info("[Roteador] Servidor inativo a muito tempo, encerrando...")
+                        break
+                    continue
+                for _ in range(lote):
+                    try:
+                        n, remetente = sock.recvfrom_into(buffer_rx)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    # O motor copia o que precisar guardar (atrasos); o buffer é reaproveitado
+                    self._tratar_pacote(view_rx[:n], remetente)
+                ultimo_pacote = time.monotonic()
+        except OSError as e:
+            if self.rodando:
+                log.erro("[Roteador] Erro no servidor: %s", e)
+        finally:
+            self.motor.parar()
+            self.parar_captura()
+            sock.close()
 
-    def receber_mensagem(self, bytes_recebidos, addr):
+    def receber_mensagem(self, bytes_recebidos, addr, dest=None):
         # !!! BUG FIX: 'segmento' deve ser definido a partir dos bytes recebidos
-        print(f"[Roteador] Mensagem recebida de {addr}: {repr(bytes_recebidos[12:60])}...")
-        # print(bytes_recebidos)
+        if log.ativo(registro.DEBUG): # bytes() copia: só se a mensagem for ser registrada
+            log.debug("[Roteador] Mensagem recebida de %s: %r...", addr, bytes(bytes_recebidos[12:60]))
         
         try:
             if not bytes_recebidos:
-                print(f"[Roteador] Pacote vazio recebido de {addr}.")
+                log.debug("[Roteador] Pacote vazio recebido de %s.", addr)
                 return
 
-            match (op_atual):
-                case Operations.NORMAL:
-                    # Envio normal
-                    self.enviar_mensagem(addr, bytes_recebidos)
-                case Operations.PERDA:
-                    # Não envia a mensagem
-                    print(f"--- [Roteador] PACOTE PERDIDO de {addr} ---")
-                    pass  
-                case Operations.CORRUPÇÃO:
-                    # Corrompe um byte aleatório no payload
-                    segmento_corrompido = bytearray(bytes_recebidos)
-                    if len(segmento_corrompido) > 5: # Garante que há dados para corromper
-                        # Corrompe um byte (ex: depois de 'SEQ:N:' ou 'ACK:N')
-                        idx_corromper = random.randint(0, len(segmento_corrompido) - 1)
-                        byte_original = segmento_corrompido[idx_corromper]
-                        segmento_corrompido[idx_corromper] = random.randint(0, 255)
-                        print(f"--- [Roteador] CORROMPIDO segmento de número {bytes_recebidos[0:32]}")
-                    self.enviar_mensagem(addr, segmento_corrompido)
-                case Operations.ATRASO:
-                    # Atraso de 1 segundo
-                    print(f"--- [Roteador] PACOTE ATRASADO de {addr} ---")
-                    time.sleep(1)
-                    self.enviar_mensagem(addr, bytes_recebidos)
-                case Operations.DUPLICAÇÃO:
-                    # Envia o pacote duas vezes
-                    print(f"--- [Roteador] PACOTE DUPLICADO de {addr} ---")
-                    self.enviar_mensagem(addr, bytes_recebidos)
-                    time.sleep(0.1) # Pequeno delay para o duplicado
-                    self.enviar_mensagem(addr, bytes_recebidos)
-                case Operations.REORDENAÇÃO:
-                    if self.count == 0:
-                        self.buffer = bytes_recebidos  
-                        self.count = 1
-                        return
-                    else:
-                        self.enviar_mensagem(addr, self.buffer)
-                        self.count = 0
-                    self.enviar_mensagem(addr, bytes_recebidos)
+            if dest is None:
+                dest = self.rotas.get((addr, segmento.conexao_de(bytes_recebidos)))
+            captura = self.captura
+            if dest is None:
+                self.metricas.descartados += 1
+                if captura is not None:
+                    captura.entrada(0, ('SEM ROTA',), addr, None, bytes_recebidos)
+                return # Destinatário desconhecido, pacote descartado
+
+            # Nunca bloqueia: atrasos e duplicatas ficam agendados no motor
+            if captura is None:
+                acoes = self.motor.processar(bytes_recebidos, dest, self.perfil_para(addr), self.enlace_para(addr))
+            else:
+                # Marca e instante antes do motor: sem atraso, a saída é registrada dentro de processar()
+                marca, instante = captura.proxima_marca(), captura.agora()
+                acoes = self.motor.processar(bytes_recebidos, dest, self.perfil_para(addr), self.enlace_para(addr), marca)
+                captura.entrada(marca, acoes, addr, dest, bytes_recebidos, instante)
+            if acoes:
+                log.debug("--- [Roteador] %s em pacote de %s ---", '/'.join(acoes), addr)
+            log.debug("[Roteador] Mensagem de %s encaminhada para %s", addr, dest)
 
         except Exception as e:
-            print(f"[Roteador] Erro em receber_mensagem: {e}")
+            log.erro("[Roteador] Erro em receber_mensagem: %s", e)
 
 
-    def mudar_operacao(self):
+    def perfil_para(self, addr) -> PerfilPerturbacao:
+        """Perfil da direção que sai de 'addr' (ou o padrão / do modo atual)."""
+        perfil = self.perfis.get(addr)
+        if perfil is None:
+            perfil = self.perfil_padrao
+        if perfil is None:
+            perfil = PERFIS_OPERACAO[op_atual]
+        return perfil
+
+    def definir_perfil(self, perfil, origem=None):
+        """Define o perfil de perturbação de uma direção (origem) ou o padrão (origem=None)."""
+        if origem is None:
+            self.perfil_padrao = perfil
+        elif perfil is None:
+            self.perfis.pop(origem, None)
+        else:
+            self.perfis[origem] = perfil
+
+    def enlace_para(self, addr):
+        """Enlace da direção que sai de 'addr' (criado a partir do modelo na primeira vez)."""
+        enlace = self.enlaces.get(addr)
+        if enlace is None and self.enlace_modelo is not None:
+            enlace = self.enlaces[addr] = self.enlace_modelo.copiar()
+        return enlace
+
+    def definir_enlace(self, enlace, origem=None):
+        """Define o enlace de uma direção (origem) ou o modelo para todas (origem=None).
+
+        Cada direção tem a sua fila: o modelo é copiado, não compartilhado.
+        enlace=None remove o limite.
+        """
+        if origem is not None:
+            if enlace is None:
+                self.enlaces.pop(origem, None)
+            else:
+                self.enlaces[origem] = enlace
+            return
+        self.enlace_modelo = enlace
+        self.enlaces.clear()
+
+    def estatisticas_enlaces(self) -> dict:
+        """Ocupação, atraso de fila e descartes de cada direção com enlace."""
+        agora = time.monotonic()
+        return {origem: enlace.estatisticas(agora) for origem, enlace in list(self.enlaces.items())}
+
+    def iniciar_captura(self, caminho):
+        """Grava cada datagrama recebido e encaminhado em 'caminho' (formato de captura.py)."""
+        self.parar_captura()
+        self.captura = GravadorCaptura(caminho)
+        self.motor.captura = self.captura
+        log.info("[Roteador] Capturando pacotes em %s", caminho)
+
+    def parar_captura(self):
+        captura, self.captura = self.captura, None
+        self.motor.captura = None
+        if captura is not None:
+            captura.fechar()
+            log.info("[Roteador] Captura %s encerrada (%d registros)", captura.caminho, captura.registros)
+
+    def definir_operacao(self, op, perfil_padrao=None):
+        """Muda o modo atual; 'perfil_padrao' substitui o perfil do modo (ex.: PERDA 0.1)."""
         global op_atual
-        while True:
-            try:
-                print("\nOpções: NORMAL, PERDA, CORRUPÇÃO, ATRASO, DUPLICAÇÃO")
-                nova_op = input("Digite a nova operação do roteador: ").strip().upper()
-                match nova_op:
-                    case "NORMAL":
-                        op_atual = Operations.NORMAL
-                    case "PERDA":
-                        op_atual = Operations.PERDA
-                    case "CORRUPÇÃO":
-                        op_atual = Operations.CORRUPÇÃO
-                    case "ATRASO":
-                        op_atual = Operations.ATRASO
-                    case "DUPLICAÇÃO":
-                        op_atual = Operations.DUPLICAÇÃO
-                    case "REORDENAÇÃO":
-                        op_atual = Operations.REORDENAÇÃO
-                print(f"==> Operação atual alterada para: {op_atual.name} <==")
-            except KeyboardInterrupt:
-                print("\nEncerrando mudança de operação.")
-                break
-            except EOFError:
-                break
-                
-
-    def enviar_mensagem(self, addr, mensagem):
-        try:
-            dest = None
-            if addr == self.pc1_addr:
-                dest = self.pc2_addr
-            elif addr == self.pc2_addr:
-                dest = self.pc1_addr
-            
-            if dest:
-                self.server_socket.sendto(mensagem, dest)
-            # Usar repr() para imprimir bytes de forma segura (UTF-8 pode falhar se corrompido)
-            print(f"[Roteador] Mensagem de {addr} encaminhada para {dest}: {repr(mensagem[12:60])}...")
-            # else:
-            #    print(f"[Roteador] Destinatário desconhecido para {addr}. Pacote descartado.")
-        except Exception as e:
-                print(f"[Roteador] Erro ao enviar mensagem: {e}")
+        op_atual = op
+        self.perfil_padrao = perfil_padrao
 
+    def definir_nivel_log(self, nivel):
+        registro.definir_nivel(nivel)
+
+    def mudar_operacao(self):
+        console_operacao(self)
+
+
+def console_operacao(roteador):
+    """Lê comandos do terminal e os aplica ao roteador (Servidor ou PoolRoteador)."""
+    while True:
+        try:
+            print("\nOpções: NORMAL, PERDA, CORRUPÇÃO, ATRASO, DUPLICAÇÃO, REORDENAÇÃO")
+            print("(opcional: probabilidade, ou segundos no ATRASO, ex.: PERDA 0.1)")
+            print("ENLACE <bits/s> [fila em pacotes] limita a banda (ENLACE sozinho remove); FILAS mostra as filas")
+            print("LOG <DEBUG|INFO|AVISO|ERRO> muda o nível do registro (DEBUG mostra cada pacote)")
+            print("CAPTURA <arquivo> grava todos os pacotes (CAPTURA sozinho encerra); ver captura.py")
+            linha = input("Digite a nova operação do roteador: ").strip()
+            partes = linha.upper().split()
+            if not partes:
+                continue
+            nova_op = partes[0]
+            if nova_op == "CAPTURA":
+                caminho = linha.split(maxsplit=1)[1] if len(partes) > 1 else None # Mantém maiúsculas/minúsculas
+                if caminho:
+                    roteador.iniciar_captura(caminho)
+                else:
+                    roteador.parar_captura()
+                print(f"==> Captura: {caminho or 'encerrada'} <==")
+                continue
+            if nova_op == "ENLACE":
+                enlace = Enlace(float(partes[1]), int(partes[2]) if len(partes) > 2 else 64) if len(partes) > 1 else None
+                roteador.definir_enlace(enlace)
+                print(f"==> Enlace: {enlace or 'sem limite'} <==")
+                continue
+            if nova_op == "LOG" and len(partes) > 1:
+                roteador.definir_nivel_log(partes[1])
+                print(f"==> Nível do registro: {partes[1]} <==")
+                continue
+            if nova_op == "FILAS":
+                for origem, estatisticas in roteador.estatisticas_enlaces().items():
+                    print(f"{origem}: {estatisticas}")
+                continue
+            op = op_atual
+            match nova_op:
+                case "NORMAL":
+                    op = Operations.NORMAL
+                case "PERDA":
+                    op = Operations.PERDA
+                case "CORRUPÇÃO":
+                    op = Operations.CORRUPÇÃO
+                case "ATRASO":
+                    op = Operations.ATRASO
+                case "DUPLICAÇÃO":
+                    op = Operations.DUPLICAÇÃO
+                case "REORDENAÇÃO":
+                    op = Operations.REORDENAÇÃO
+            perfil = None
+            if len(partes) > 1:
+                valor = float(partes[1])
+                if op == Operations.ATRASO or op in _CAMPO_OPERACAO:
+                    perfil = perfil_operacao(op, valor)
+            roteador.definir_operacao(op, perfil)
+            print(f"==> Operação atual alterada para: {op.name} ({perfil or PERFIS_OPERACAO[op]}) <==")
+        except ValueError:
+            print("Valor inválido.")
+        except KeyboardInterrupt:
+            print("\nEncerrando mudança de operação.")
+            break
+        except EOFError:
+            break
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roteador entre PC1 e PC2 com perturbações configuráveis")
+    parser.add_argument('--metricas-jsonl', metavar='ARQUIVO',
+                        help="Acrescenta ao arquivo um snapshot das métricas do roteador (uma linha JSON) por intervalo")
+    parser.add_argument('--intervalo-metricas', type=float, default=1.0, help="Segundos entre dois snapshots")
+    args = parser.parse_args()
+
     servidor = Servidor(HOST, PORT, BUFFER_SIZE, TIMEOUT_TIMER, MSS)
+    exportador = None
+    if args.metricas_jsonl:
+        exportador = ExportadorJSONL(args.metricas_jsonl, [servidor.metricas], args.intervalo_metricas).iniciar()
     server_thread = threading.Thread(target=servidor.start_server, daemon=True)
     server_thread.start()
     
     # Permite que o usuário mude a operação
     servidor.mudar_operacao()
+    if exportador is not None:
+        exportador.parar() # Grava o estado final
     print("Encerrando programa principal...")
\ No newline at end of file
@@ -0,0 +1,195 @@
+import multiprocessing, os, socket, sys, threading
+
+import registro
+import roteador_pc2
+from roteador_pc2 import Servidor, TabelaRotas, HOST, PORT, BUFFER_SIZE, TIMEOUT_TIMER, MSS, LOTE
+
+# Roteador em vários processos: N trabalhadores abrem a mesma porta com
+# SO_REUSEPORT e o kernel distribui os datagramas pelo hash do endereço de
+# origem, então cada fluxo (e cada direção) fica sempre no mesmo trabalhador,
+# com seus perfis e enlaces. Cada trabalhador usa o laço em lotes do Servidor
+# (recvfrom_into em buffer pré-alocado; mensagens por pacote só em DEBUG).
+#
+# Os trabalhadores são criados com 'spawn': não herdam descritores do pai
+# (um socket herdado que ficasse no grupo do SO_REUSEPORT sem ninguém lendo
+# receberia parte dos fluxos e os descartaria).
+#
+# As rotas são aprendidas por um único coordenador (processo principal): os
+# trabalhadores avisam os fluxos sem rota por uma fila e recebem as rotas
+# novas e os comandos do console por um pipe cada.
+
+log = registro.obter('Roteador')
+
+
+def _trabalhador(indice, host, port, rotas, conn, eventos, lote, nivel_log):
+    registro.definir_nivel(nivel_log) # Processo novo (spawn): não herda o nível do pai
+    srv = Servidor(host, port, BUFFER_SIZE, TIMEOUT_TIMER, MSS, reuseport=True)
+    srv.rotas.update(rotas)
+    avisados = set()
+
+    def avisar(remetente, conexao):
+        # Um aviso por fluxo; os pacotes seguem descartados até a rota chegar
+        if (remetente, conexao) not in avisados:
+            avisados.add((remetente, conexao))
+            eventos.put(('registro', remetente, conexao))
+
+    def ao_controle():
+        while conn.poll():
+            comando, *args = conn.recv()
+            match comando:
+                case 'rota':
+                    srv.adicionar_rota(*args)
+                case 'operacao':
+                    srv.definir_operacao(*args)
+                case 'enlace':
+                    srv.definir_enlace(*args)
+                case 'log':
+                    srv.definir_nivel_log(*args)
+                case 'captura':
+                    # Um arquivo por trabalhador: <caminho>.<índice>
+                    if args[0]:
+                        srv.iniciar_captura(f"{args[0]}.{indice}")
+                    else:
+                        srv.parar_captura()
+                case 'estatisticas':
+                    conn.send({'trabalhador': indice, 'pid': os.getpid(),
+                               'fluxos': srv.estatisticas_fluxos(),
+                               'perturbacoes': dict(srv.motor.contadores),
+                               'metricas': srv.metricas.snapshot(serie_janela=False),
+                               'enlaces': srv.estatisticas_enlaces()})
+                case 'parar':
+                    srv.rodando = False
+
+    srv.ao_registrar = avisar
+    eventos.put(('pronto', indice))
+    srv.executar_lotes(lote, conn, ao_controle)
+
+
+class PoolRoteador:
+    def __init__(self, host=HOST, port=PORT, trabalhadores=None, lote=LOTE):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise OSError("SO_REUSEPORT não disponível nesta plataforma")
+        self.trabalhadores = trabalhadores or os.cpu_count() or 1
+        self.tabela = TabelaRotas(ao_adicionar=self._propagar_rota)
+        self.rotas = self.tabela.rotas
+        self._lock = threading.Lock() # Protege os pipes (coordenador e console)
+        contexto = multiprocessing.get_context('spawn')
+        self._eventos = contexto.Queue()
+        self._conns = []
+        self._processos = []
+
+        # Reserva a porta (útil com port=0) até todos os trabalhadores abrirem a sua
+        reserva = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        reserva.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        reserva.bind((host, port))
+        self.endereco = reserva.getsockname()
+        try:
+            for indice in range(self.trabalhadores):
+                conn_pai, conn_filho = contexto.Pipe()
+                processo = contexto.Process(
+                    target=_trabalhador, name=f"Roteador-{indice}", daemon=True,
+                    args=(indice, self.endereco[0], self.endereco[1], dict(self.rotas), conn_filho, self._eventos, lote,
+                          registro.nivel_atual()))
+                processo.start()
+                self._conns.append(conn_pai)
+                self._processos.append(processo)
+            prontos = 0
+            while prontos < self.trabalhadores:
+                if self._eventos.get(timeout=10)[0] == 'pronto':
+                    prontos += 1
+        finally:
+            # Fechada antes do tráfego: o kernel só distribui entre os trabalhadores
+            reserva.close()
+
+        self._coordenador = threading.Thread(target=self._coordenar, name="Roteador-rotas", daemon=True)
+        self._coordenador.start()
+        log.info("Servidor (Roteador B) iniciado em %s:%s com %d processos",
+                 self.endereco[0], self.endereco[1], self.trabalhadores)
+        log.info("Operação atual: %s", roteador_pc2.op_atual.name)
+
+    def _enviar_todos(self, comando):
+        with self._lock:
+            for conn in self._conns:
+                conn.send(comando)
+
+    def _propagar_rota(self, addr_a, addr_b, conexao):
+        self._enviar_todos(('rota', addr_a, addr_b, conexao))
+
+    def _coordenar(self):
+        while True:
+            try:
+                evento = self._eventos.get()
+            except (EOFError, OSError):
+                return
+            if evento[0] == 'registro':
+                self.tabela.registrar(evento[1], evento[2])
+            elif evento[0] == 'fim':
+                return
+
+    # Mesma interface de controle do Servidor (usada por console_operacao)
+    def adicionar_rota(self, addr_a, addr_b, conexao=0):
+        self.tabela.adicionar(addr_a, addr_b, conexao)
+
+    def definir_operacao(self, op, perfil_padrao=None):
+        roteador_pc2.op_atual = op
+        self._enviar_todos(('operacao', op, perfil_padrao))
+
+    def definir_enlace(self, enlace, origem=None):
+        self._enviar_todos(('enlace', enlace, origem))
+
+    def definir_nivel_log(self, nivel):
+        registro.definir_nivel(nivel)
+        self._enviar_todos(('log', nivel))
+
+    def iniciar_captura(self, caminho):
+        """Cada trabalhador grava a sua parte do tráfego em '<caminho>.<índice>'."""
+        self._enviar_todos(('captura', caminho))
+
+    def parar_captura(self):
+        self._enviar_todos(('captura', None))
+
+    def estatisticas(self) -> list:
+        """Estatísticas de cada trabalhador (fluxos, perturbações e enlaces)."""
+        resultado = []
+        with self._lock:
+            for conn in self._conns:
+                conn.send(('estatisticas',))
+            for conn in self._conns:
+                if conn.poll(2.0):
+                    resultado.append(conn.recv())
+        return resultado
+
+    def estatisticas_enlaces(self) -> dict:
+        enlaces = {}
+        for parcial in self.estatisticas():
+            enlaces.update(parcial['enlaces'])
+        return enlaces
+
+    def estatisticas_fluxos(self) -> dict:
+        fluxos = {}
+        for parcial in self.estatisticas():
+            fluxos.update(parcial['fluxos'])
+        return fluxos
+
+    def fechar(self):
+        try:
+            self._enviar_todos(('parar',))
+        except OSError:
+            pass
+        for processo in self._processos:
+            processo.join(timeout=2.0)
+            if processo.is_alive():
+                processo.terminate()
+        self._eventos.put(('fim',))
+        self._coordenador.join(timeout=1.0)
+        log.info("[Roteador] Servidor encerrado.")
+
+
+if __name__ == "__main__":
+    # python roteador_workers.py [número de processos]
+    pool = PoolRoteador(HOST, PORT, int(sys.argv[1]) if len(sys.argv) > 1 else None)
+    try:
+        roteador_pc2.console_operacao(pool)
+    finally:
+        print("Encerrando programa principal...")
+        pool.fechar()
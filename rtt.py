@@ -0,0 +1,57 @@
+import threading
+
+# Estimativa do RTT e cálculo do timeout de retransmissão (RTO), como no
+# RFC 6298: SRTT/RTTVAR suavizados, RTO = SRTT + max(G, K*RTTVAR),
+# backoff exponencial a cada timeout e algoritmo de Karn (amostras de
+# segmentos retransmitidos são descartadas pelo chamador).
+
+ALFA = 1 / 8
+BETA = 1 / 4
+K = 4
+GRANULARIDADE = 0.01 # Resolução do relógio de timeouts (tick da roda), em segundos
+# Piso do RTO: 200 ms, como no Linux (o RFC 6298 sugere 1 s). Bem acima do jitter de
+# escalonamento e das perturbações do roteador, que com pisos de dezenas de ms geram
+# timeouts espúrios (e cada um derruba a cwnd). Quem controla o relógio (simulador,
+# testes) pode baixar com rto_minimo.
+RTO_MINIMO = 0.2
+RTO_MAXIMO = 60.0
+
+
+class EstimadorRTT:
+    def __init__(self, rto_inicial=1.0, rto_minimo=RTO_MINIMO, rto_maximo=RTO_MAXIMO):
+        self.rto_minimo = rto_minimo
+        self.rto_maximo = rto_maximo
+        self.srtt = None # RTT suavizado (segundos)
+        self.rttvar = None # Variação do RTT (segundos)
+        self.rto = rto_inicial
+        self.backoffs = 0 # Quantas vezes o RTO foi dobrado desde a última amostra
+        self.amostras = 0
+        self._lock = threading.Lock()
+
+    def amostra(self, rtt: float):
+        """Incorpora uma medida de RTT de um segmento que NÃO foi retransmitido."""
+        with self._lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - ALFA) * self.srtt + ALFA * rtt
+            self.amostras += 1
+            self.backoffs = 0
+            self.rto = self._limitar(self.srtt + max(GRANULARIDADE, K * self.rttvar))
+
+    def backoff(self):
+        """Dobra o RTO após um timeout."""
+        with self._lock:
+            self.backoffs += 1
+            self.rto = self._limitar(self.rto * 2)
+
+    def _limitar(self, rto: float) -> float:
+        return min(max(rto, self.rto_minimo), self.rto_maximo)
+
+    def estimativas(self) -> dict:
+        """Valores atuais (em segundos) de SRTT, RTTVAR e RTO."""
+        with self._lock:
+            return {'srtt': self.srtt, 'rttvar': self.rttvar, 'rto': self.rto,
+                    'backoffs': self.backoffs, 'amostras': self.amostras}
@@ -0,0 +1,177 @@
+import struct
+
+import checksum
+
+# Codec binário dos segmentos RDT.
+# Layout do cabeçalho (12 bytes, big-endian), o mesmo usado pelo MaquinaC.java:
+#   seq (32 bits) | ack (32 bits) | checksum (16 bits) | tamanho (8 bits) | flags (8 bits)
+# O bit mais significativo do byte de flags é o ACK (0x80).
+# O payload é completado com zeros até um múltiplo de 16 bits.
+#
+# Cabeçalho estendido (16 bytes), sinalizado pelo bit FLAG_EXT (0x40), para
+# payloads maiores que 255 bytes ou fluxos com ID de conexão:
+#   ... os 12 bytes acima (tamanho de 8 bits = 0) ... | tamanho (16 bits) | conexão (16 bits)
+# Conexão 0 significa "sem ID" (roteamento só pelo endereço).
+#
+# ACK seletivo (bit FLAG_SACK, 0x20, junto com o ACK): o campo ack é o ACK
+# cumulativo (tudo antes dele foi recebido) e o payload traz até
+# MAX_BLOCOS_SACK blocos [início, fim) de 32+32 bits já recebidos acima dele.
+# Sem FLAG_SACK, o ack confirma só o segmento com aquele seq (como no MaquinaC).
+#
+# FEC (bit FLAG_FEC, 0x10): sem o ACK, o segmento é uma paridade XOR de um grupo
+# de segmentos de dados (formato em fec.py); num ACK, avisa que o destinatário
+# reconstruiu um segmento a partir da paridade.
+# O MaquinaC.java só entende o cabeçalho de 12 bytes (modo de 16 bytes de payload).
+
+TAM_CABECALHO = 12
+TAM_CABECALHO_EXT = 16
+FLAG_ACK = 0x80
+FLAG_EXT = 0x40
+FLAG_SACK = 0x20
+FLAG_FEC = 0x10
+MAX_BLOCOS_SACK = 8
+
+TAM_MAX_CURTO = 0xFF # Maior payload que cabe no campo de tamanho de 8 bits
+TAM_MAX_DATAGRAMA = 65507 # Maior payload UDP sobre IPv4
+MSS_MAXIMO = TAM_MAX_DATAGRAMA - TAM_CABECALHO_EXT - 1 # Payload par: o padding não estoura o datagrama
+MSS_ETHERNET = 1500 - 20 - 8 - TAM_CABECALHO_EXT # Cabe em um quadro Ethernet sem fragmentar
+
+_CABECALHO = struct.Struct('!IIHBB')
+_EXTENSAO = struct.Struct('!HH')
+_BLOCO_SACK = struct.Struct('!II')
+_PADDING = b'\x00'
+
+
+def _checksum_segmento(seq: int, ack_num: int, tamanho: int, flags: int, payload, extensao: int = 0) -> int:
+    """Checksum do segmento com o campo checksum zerado, sem montar o cabeçalho.
+
+    'extensao' é a soma das palavras dos 4 bytes extras do cabeçalho estendido.
+    """
+    soma_payload, payload_nao_vazio = checksum.somar_palavras(payload)
+    soma = ((seq >> 16) + (seq & 0xFFFF) + (ack_num >> 16) + (ack_num & 0xFFFF)
+            + ((tamanho << 8) | flags) + extensao + soma_payload)
+    return checksum.dobrar(soma, payload_nao_vazio or bool(seq or ack_num or tamanho or flags or extensao))
+
+
+def precisa_estender(tamanho_payload: int, conexao: int = 0) -> bool:
+    return tamanho_payload > TAM_MAX_CURTO or conexao != 0
+
+
+# Montagem
+def montar_cabecalho(seq: int, ack_num: int, ack_flag: int, payload=b'', estendido=None, conexao: int = 0,
+                     flags_extra: int = 0) -> bytes:
+    """Monta o cabeçalho (com checksum) para 'payload'.
+
+    Com estendido=None, o cabeçalho de 16 bytes só é usado se o payload
+    não couber no campo de tamanho de 8 bits ou se houver ID de conexão.
+    'flags_extra' são bits adicionais do byte de flags (ex.: FLAG_SACK).
+    """
+    seq &= 0xFFFFFFFF
+    ack_num &= 0xFFFFFFFF
+    tamanho_payload = len(payload)
+    if estendido is None:
+        estendido = precisa_estender(tamanho_payload, conexao)
+    estendido = estendido or conexao != 0 # O ID de conexão só existe no cabeçalho estendido
+    flags = (FLAG_ACK if ack_flag == 1 else 0) | flags_extra
+    if not estendido:
+        tamanho = tamanho_payload & 0xFF
+        valor_checksum = _checksum_segmento(seq, ack_num, tamanho, flags, payload)
+        return _CABECALHO.pack(seq, ack_num, valor_checksum, tamanho, flags)
+    flags |= FLAG_EXT
+    valor_checksum = _checksum_segmento(seq, ack_num, 0, flags, payload, tamanho_payload + conexao)
+    return _CABECALHO.pack(seq, ack_num, valor_checksum, 0, flags) + _EXTENSAO.pack(tamanho_payload, conexao)
+
+
+def partes_segmento(seq: int, ack_num: int, ack_flag: int, payload=b'', estendido=None, conexao: int = 0,
+                    flags_extra: int = 0) -> list:
+    """Lista de buffers [cabeçalho, payload, (padding)] para envio scatter-gather."""
+    partes = [montar_cabecalho(seq, ack_num, ack_flag, payload, estendido, conexao, flags_extra)]
+    if payload:
+        partes.append(payload)
+        if len(payload) % 2:
+            partes.append(_PADDING)
+    return partes
+
+
+def montar_segmento(seq: int, ack_num: int, ack_flag: int, payload=b'', estendido=None, conexao: int = 0,
+                    flags_extra: int = 0) -> bytes:
+    """Monta o segmento completo em um único objeto bytes."""
+    return b''.join(partes_segmento(seq, ack_num, ack_flag, payload, estendido, conexao, flags_extra))
+
+
+def seq_absoluto(valor: int, referencia: int) -> int:
+    """Seq de 32 bits do fio -> seq absoluto mais próximo de 'referencia' (trata a volta)."""
+    diferenca = (valor - referencia) & 0xFFFFFFFF
+    if diferenca >= 0x80000000:
+        diferenca -= 0x100000000
+    return referencia + diferenca
+
+
+def montar_ack_sack(ack_cumulativo: int, blocos, conexao: int = 0, flags_extra: int = 0) -> bytes:
+    """ACK seletivo: ACK cumulativo + blocos [(início, fim), ...] (no máximo MAX_BLOCOS_SACK)."""
+    payload = b''.join(_BLOCO_SACK.pack(inicio & 0xFFFFFFFF, fim & 0xFFFFFFFF)
+                       for inicio, fim in blocos[:MAX_BLOCOS_SACK])
+    return montar_segmento(0xFFFFFFFF, ack_cumulativo, 1, payload, conexao=conexao,
+                           flags_extra=FLAG_SACK | flags_extra)
+
+
+def ler_blocos_sack(dados) -> list:
+    """Blocos [(início, fim), ...] do payload de um ACK seletivo."""
+    return [_BLOCO_SACK.unpack_from(dados, pos) for pos in range(0, len(dados) - 7, _BLOCO_SACK.size)]
+
+
+def tamanho_segmento(tamanho_payload: int, estendido=None) -> int:
+    """Tamanho em bytes do segmento no fio (cabeçalho + payload com padding)."""
+    if estendido is None:
+        estendido = precisa_estender(tamanho_payload)
+    cabecalho = TAM_CABECALHO_EXT if estendido else TAM_CABECALHO
+    return cabecalho + tamanho_payload + (tamanho_payload % 2)
+
+
+# Leitura
+def verificar_checksum(msg) -> bool:
+    """Verifica o checksum de um segmento recebido."""
+    if len(msg) < TAM_CABECALHO:
+        return False
+    return checksum.verificar(msg, 8)
+
+
+def ler_segmento(msg):
+    """Decodifica um segmento; retorna None se curto ou corrompido.
+
+    'dados' é um memoryview sobre 'msg' (sem cópia), já sem o padding.
+    """
+    if not verificar_checksum(msg):
+        return None
+    seq, ack_num, _, tamanho, flags = _CABECALHO.unpack_from(msg)
+    inicio = TAM_CABECALHO
+    conexao = 0
+    if flags & FLAG_EXT:
+        if len(msg) < TAM_CABECALHO_EXT:
+            return None
+        tamanho, conexao = _EXTENSAO.unpack_from(msg, TAM_CABECALHO)
+        inicio = TAM_CABECALHO_EXT
+    view = memoryview(msg)
+    return {
+        'seq': seq,
+        'ack': ack_num,
+        'flag': 1 if flags & FLAG_ACK else 0,
+        'flags': flags,
+        'conexao': conexao,
+        'dados': view[inicio:inicio + tamanho],
+    }
+
+
+def conexao_de(msg) -> int:
+    """ID de conexão do segmento sem verificar o checksum (0 se não houver)."""
+    if len(msg) >= TAM_CABECALHO_EXT and msg[11] & FLAG_EXT:
+        return (msg[14] << 8) | msg[15]
+    return 0
+
+
+# Envio
+def enviar_partes(sock, partes: list, dest) -> int:
+    """Envia os buffers como um único datagrama, sem concatenar quando possível."""
+    if hasattr(sock, 'sendmsg'):
+        return sock.sendmsg(partes, [], 0, dest)
+    return sock.sendto(b''.join(partes), dest)
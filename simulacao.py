@@ -0,0 +1,373 @@
+import argparse, heapq, itertools, random, sys, time
+
+import registro
+from Janela import Envio, Transporte, TAM_PAYLOAD_BYTES
+from congestionamento import JanelaFixa, Reno
+from fec import politica_de
+from metricas import Metricas
+from perturbacao import MotorPerturbacao, PerfilPerturbacao
+from recepcao import Recepcao, JANELA_RECEPCAO
+from roteador_pc2 import Operations, perfil_operacao
+from temporizador import RESOLUCAO
+
+# Canal simulado em memória com relógio virtual (simulação de eventos
+# discretos), para rodar cenários do protocolo sem sockets, sem roteador e sem
+# esperar o relógio de parede.
+#
+# A RedeSimulada faz o papel do roteador entre as pontas (PontaSimulada, um
+# Transporte síncrono de Janela.py passado como 'canal' ao Envio e à
+# Recepcao): cada datagrama passa pelo mesmo MotorPerturbacao do roteador
+# (perfis por direção, enlace gargalo opcional), com um gerador aleatório de
+# semente fixa, e a entrega vira um evento no relógio virtual. Os timeouts do
+# Envio usam uma roda virtual com a mesma resolução da RodaTemporizadora e o
+# ACK adiado da Recepcao também é um evento. Tudo roda em uma única thread,
+# então a mesma semente reproduz o mesmo cenário, evento por evento.
+#
+# Uso: python simulacao.py [--cenarios 200] [--operacoes PERDA,REORDENAÇÃO] [--taxa 0.05] ...
+
+TAXA_PADRAO = 0.05 # Probabilidade por pacote nos modos com taxa (o ATRASO usa o preset de 1 s)
+TAMANHO_PADRAO = 4096 # Bytes transferidos por cenário
+CENARIOS_PADRAO = 100 # Cenários (sementes) por modo
+LIMITE_VIRTUAL = 600.0 # Segundos virtuais antes de dar o cenário como travado
+
+log = registro.obter('Simulacao')
+
+
+class RelogioVirtual:
+    """Fila de eventos ordenada pelo instante; o tempo só anda quando um evento é executado."""
+
+    def __init__(self, inicio: float = 0.0):
+        self._agora = inicio
+        self._eventos = [] # Heap de (instante, desempate, função, argumentos)
+        self._contador = itertools.count()
+        self.executados = 0
+
+    def agora(self) -> float:
+        return self._agora
+
+    def agendar(self, atraso: float, funcao, *args):
+        """Executa funcao(*args) daqui a 'atraso' segundos virtuais (nunca no passado)."""
+        self.agendar_em(self._agora + max(0.0, atraso), funcao, *args)
+
+    def agendar_em(self, instante: float, funcao, *args):
+        heapq.heappush(self._eventos, (max(instante, self._agora), next(self._contador), funcao, args))
+
+    def pendentes(self) -> int:
+        return len(self._eventos)
+
+    def passo(self) -> bool:
+        """Executa o próximo evento; False se a fila está vazia."""
+        if not self._eventos:
+            return False
+        instante, _, funcao, args = heapq.heappop(self._eventos)
+        self._agora = instante
+        self.executados += 1
+        funcao(*args)
+        return True
+
+    def executar_ate(self, pronto=None, timeout: float = None) -> bool:
+        """Executa eventos até pronto() ser verdadeiro, passar 'timeout' segundos virtuais ou acabar a fila.
+
+        Retorna pronto() no fim (True se não houver condição e a fila esvaziou).
+        """
+        limite = None if timeout is None else self._agora + timeout
+        eventos = self._eventos
+        while not (pronto is not None and pronto()):
+            if not eventos or (limite is not None and eventos[0][0] > limite):
+                if limite is not None:
+                    self._agora = max(self._agora, limite)
+                return pronto is None or pronto()
+            self.passo()
+        return True
+
+
+class RodaVirtual:
+    """Mesma interface da RodaTemporizadora, com os prazos no relógio virtual.
+
+    Os prazos são arredondados para o mesmo tick e os que vencem juntos são
+    entregues em lote, como na roda real.
+    """
+
+    def __init__(self, relogio: RelogioVirtual, ao_expirar, resolucao: float = RESOLUCAO):
+        self.relogio = relogio
+        self.ao_expirar = ao_expirar
+        self.resolucao = resolucao
+        self._tick_da_chave = {}
+        self._por_tick = {} # {tick: {chave: None}} (dict: ordem de inserção determinística)
+        self.rodando = True
+
+    def armar(self, chave, atraso: float):
+        """(Re)agenda 'chave' para expirar daqui a 'atraso' segundos virtuais."""
+        self._remover(chave)
+        # +1: nunca expira antes do prazo pedido
+        tick = int((self.relogio.agora() + atraso) / self.resolucao) + 1
+        chaves = self._por_tick.get(tick)
+        if chaves is None:
+            chaves = self._por_tick[tick] = {}
+            self.relogio.agendar_em(tick * self.resolucao, self._vencer, tick)
+        chaves[chave] = None
+        self._tick_da_chave[chave] = tick
+
+    def cancelar(self, chave):
+        self._remover(chave)
+
+    def _remover(self, chave):
+        tick = self._tick_da_chave.pop(chave, None)
+        if tick is not None:
+            del self._por_tick[tick][chave]
+
+    def __len__(self):
+        return len(self._tick_da_chave)
+
+    def __contains__(self, chave):
+        return chave in self._tick_da_chave
+
+    def _vencer(self, tick: int):
+        chaves = self._por_tick.pop(tick, None)
+        if not chaves or not self.rodando:
+            return
+        for chave in chaves:
+            del self._tick_da_chave[chave]
+        self.ao_expirar(list(chaves))
+
+    def parar(self):
+        self.rodando = False
+        self._tick_da_chave.clear()
+        self._por_tick.clear()
+
+
+class MotorSimulado(MotorPerturbacao):
+    """O motor de perturbações do roteador sem socket nem thread: cada envio vira um evento."""
+
+    def __init__(self, relogio: RelogioVirtual, semente=None, metricas=None):
+        self.relogio = relogio
+        super().__init__(None, semente, metricas)
+
+    def _iniciar_transmissao(self):
+        pass # Os envios são eventos do relógio virtual
+
+    def _agora(self) -> float:
+        return self.relogio.agora()
+
+    def agendar(self, dados, dest, atraso: float, marca: int = 0):
+        # Mesmo sem atraso a entrega é um evento: quem enviou pode estar segurando o seu lock
+        self.relogio.agendar(atraso, self._enviar, bytes(dados), dest)
+
+    def _enviar(self, dados, dest, marca: int = 0):
+        ponta, origem = dest
+        self.contadores['encaminhados'] += 1
+        self.metricas.enviados += 1
+        self.metricas.bytes_entregues += len(dados)
+        ponta.entregar(dados, origem)
+
+    def pendentes(self) -> int:
+        return self.relogio.pendentes()
+
+    def parar(self):
+        self.rodando = False
+
+
+class PontaSimulada(Transporte):
+    """Extremidade da rede simulada: o 'canal' de um Envio ou de uma Recepcao."""
+
+    sincrono = True
+
+    def __init__(self, rede, endereco):
+        self.rede = rede
+        self._endereco = endereco
+        self.agora = rede.relogio.agora
+        self.fluxo = None
+
+    def criar_roda(self, ao_expirar, nome: str):
+        return RodaVirtual(self.rede.relogio, ao_expirar)
+
+    def endereco(self):
+        return self._endereco
+
+    def registrar(self, fluxo):
+        if self.fluxo is not None:
+            raise ValueError(f"A ponta {self._endereco} já tem um fluxo")
+        self.fluxo = fluxo
+
+    def remover(self, fluxo):
+        if self.fluxo is fluxo:
+            self.fluxo = None
+
+    def enviar(self, partes: list, dest):
+        self.rede.encaminhar(b''.join(partes), self._endereco, dest)
+
+    def entregar(self, dados, origem):
+        if self.fluxo is not None:
+            self.fluxo._tratar_datagramas((dados,), origem)
+
+    def agendar(self, atraso: float, funcao, *args):
+        self.rede.relogio.agendar(atraso, funcao, *args)
+
+    def executar_ate(self, pronto, timeout: float = None) -> bool:
+        return self.rede.relogio.executar_ate(pronto, timeout)
+
+
+class RedeSimulada:
+    """Faz o papel do roteador entre as pontas, com perfis e enlaces por direção (como o Servidor)."""
+
+    def __init__(self, perfil=None, semente=0, enlace=None):
+        self.relogio = RelogioVirtual()
+        self.semente = semente
+        self.metricas = Metricas("rede-simulada", relogio=self.relogio.agora)
+        self.motor = MotorSimulado(self.relogio, semente, self.metricas)
+        self.pontas = {} # {endereço: PontaSimulada}
+        # Perfis por direção: {endereço de origem: PerfilPerturbacao}
+        self.perfis = {}
+        self.perfil_padrao = perfil if perfil is not None else PerfilPerturbacao()
+        # Enlaces gargalo por direção: {endereço de origem: Enlace}
+        self.enlaces = {}
+        self.enlace_modelo = enlace
+
+    def ponta(self) -> PontaSimulada:
+        endereco = ('sim', len(self.pontas) + 1)
+        ponta = self.pontas[endereco] = PontaSimulada(self, endereco)
+        return ponta
+
+    def definir_perfil(self, perfil, origem=None):
+        """Perfil de uma direção (origem) ou o padrão (origem=None)."""
+        if origem is None:
+            self.perfil_padrao = perfil if perfil is not None else PerfilPerturbacao()
+        elif perfil is None:
+            self.perfis.pop(origem, None)
+        else:
+            self.perfis[origem] = perfil
+
+    def definir_operacao(self, op: Operations, valor: float = None):
+        """Perfil padrão equivalente a um modo do roteador (ver roteador_pc2.perfil_operacao)."""
+        self.definir_perfil(perfil_operacao(op, valor))
+
+    def definir_enlace(self, enlace, origem=None):
+        """Enlace de uma direção (origem) ou o modelo copiado para todas (origem=None)."""
+        if origem is not None:
+            if enlace is None:
+                self.enlaces.pop(origem, None)
+            else:
+                self.enlaces[origem] = enlace
+            return
+        self.enlace_modelo = enlace
+        self.enlaces.clear()
+
+    def _enlace_para(self, origem):
+        enlace = self.enlaces.get(origem)
+        if enlace is None and self.enlace_modelo is not None:
+            enlace = self.enlaces[origem] = self.enlace_modelo.copiar()
+            enlace.rng.seed(f"{self.semente}/{origem[1]}") # RED também reproduzível
+        return enlace
+
+    def encaminhar(self, dados: bytes, origem, dest):
+        self.metricas.recebidos += 1
+        ponta = self.pontas.get(dest)
+        if ponta is None:
+            self.metricas.descartados += 1
+            return # Destino desconhecido, como um pacote sem rota no roteador
+        perfil = self.perfis.get(origem, self.perfil_padrao)
+        self.motor.processar(dados, (ponta, origem), perfil, self._enlace_para(origem))
+
+    def executar_ate(self, pronto=None, timeout: float = None) -> bool:
+        return self.relogio.executar_ate(pronto, timeout)
+
+
+def simular(perfil=None, tamanho=TAMANHO_PADRAO, mss=TAM_PAYLOAD_BYTES, controle=None, semente=0,
+            janela_recepcao=JANELA_RECEPCAO, enlace=None, limite=LIMITE_VIRTUAL, **opcoes_envio) -> dict:
+    """Transfere 'tamanho' bytes aleatórios de um Envio a uma Recepcao pela rede simulada.
+
+    'opcoes_envio' vão para o Envio (ex.: limiar_retransmissao). Retorna se o
+    destinatário recebeu tudo, o tempo virtual, os eventos executados e os
+    contadores do remetente, do destinatário e da rede.
+    """
+    rede = RedeSimulada(perfil, semente, enlace)
+    ponta_envio, ponta_recepcao = rede.ponta(), rede.ponta()
+    recebido = bytearray()
+    def entregar(trecho):
+        recebido.extend(trecho)
+    r = Recepcao(*ponta_recepcao.endereco(), janela=janela_recepcao, mss=mss, entregar=entregar, canal=ponta_recepcao)
+    e = Envio(*ponta_recepcao.endereco(), controle=controle if controle is not None else Reno(), mss=mss,
+              janela_receptor=r.capacidade, canal=ponta_envio, **opcoes_envio)
+    dados = random.Random(semente).randbytes(tamanho)
+    try:
+        confirmacao = e.enfileirar_mensagens([dados])[0]
+        concluiu = confirmacao.esperar(limite)
+        tempo = rede.relogio.agora()
+        metricas_envio = e.metricas.snapshot(serie_janela=False)
+    finally:
+        e.fechar()
+        r.fechar()
+    enviados = metricas_envio['enviados']
+    return {
+        'ok': concluiu and recebido == dados,
+        'tempo_virtual': tempo,
+        'eventos': rede.relogio.executados,
+        'vazao_bps': tamanho * 8 / tempo if concluiu and tempo > 0 else 0.0,
+        'enviados': enviados,
+        'retransmitidos': metricas_envio['retransmitidos'],
+        'retransmissao': metricas_envio['retransmitidos'] / enviados if enviados else 0.0,
+        'timeouts': metricas_envio['timeouts'],
+        'retransmissoes_rapidas': metricas_envio['retransmissoes_rapidas'],
+        'paridades': metricas_envio['paridades'],
+        'recuperados_fec': r.metricas.recuperados_fec,
+        'acks_recepcao': r.metricas.acks,
+        'perturbacoes': dict(rede.motor.contadores),
+    }
+
+
+def _lista(texto: str) -> list:
+    return [item.strip() for item in texto.split(',') if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cenários do RDT em rede simulada com relógio virtual")
+    parser.add_argument('--operacoes', default=','.join(op.name for op in Operations),
+                        help="Modos do roteador separados por vírgula")
+    parser.add_argument('--cenarios', type=int, default=CENARIOS_PADRAO, help="Sementes por modo")
+    parser.add_argument('--semente', type=int, default=0, help="Primeira semente")
+    parser.add_argument('--taxa', type=float, default=TAXA_PADRAO,
+                        help="Probabilidade por pacote (PERDA, CORRUPÇÃO, DUPLICAÇÃO, REORDENAÇÃO)")
+    parser.add_argument('--atraso', type=float, default=None, help="Segundos no ATRASO (padrão: preset do roteador)")
+    parser.add_argument('--tamanho', type=int, default=TAMANHO_PADRAO, help="Bytes por cenário")
+    parser.add_argument('--mss', type=int, default=TAM_PAYLOAD_BYTES)
+    parser.add_argument('--janela', default='reno', help="Janela fixa em segmentos, ou 'reno'")
+    parser.add_argument('--limiar', type=int, default=None, help="Limiar do fast retransmit (0 desliga)")
+    parser.add_argument('--rto-minimo', type=float, default=None, help="Piso do RTO em segundos (padrão: rtt.py)")
+    parser.add_argument('--fec', default='sem', help="Paridade XOR: 'sem', 'adaptativa' ou K segmentos por paridade")
+    parser.add_argument('--log', default='AVISO', help="Nível do registro durante a simulação")
+    args = parser.parse_args(argv)
+
+    registro.definir_nivel(args.log)
+    opcoes = {} if args.limiar is None else {'limiar_retransmissao': args.limiar}
+    if args.rto_minimo is not None:
+        opcoes['rto_minimo'] = args.rto_minimo
+    falhas = 0
+    print(f"{'modo':<12} {'ok':>9} {'tempo virt. s':>14} {'retx':>7} {'timeouts':>9} {'FEC rec.':>9} {'eventos':>9} "
+          f"{'cenários/s':>11}")
+    for op in (Operations[nome.upper()] for nome in _lista(args.operacoes)):
+        valor = args.atraso if op == Operations.ATRASO else args.taxa
+        ok, tempo_virtual, retransmissao, timeouts, recuperados, eventos = 0, 0.0, 0.0, 0, 0, 0
+        inicio = time.perf_counter()
+        for semente in range(args.semente, args.semente + args.cenarios):
+            controle = Reno() if args.janela == 'reno' else JanelaFixa(int(args.janela))
+            resultado = simular(perfil_operacao(op, valor), args.tamanho, args.mss, controle, semente,
+                                fec=politica_de(args.fec), **opcoes)
+            if resultado['ok']:
+                ok += 1
+            else:
+                print(f"  {op.name} semente {semente}: não concluiu", file=sys.stderr)
+            tempo_virtual += resultado['tempo_virtual']
+            retransmissao += resultado['retransmissao']
+            timeouts += resultado['timeouts']
+            recuperados += resultado['recuperados_fec']
+            eventos += resultado['eventos']
+        decorrido = time.perf_counter() - inicio
+        falhas += args.cenarios - ok
+        n = max(1, args.cenarios)
+        print(f"{op.name:<12} {ok:>4}/{args.cenarios:<4} {tempo_virtual / n:>14.3f} {retransmissao / n:>7.2%} "
+              f"{timeouts / n:>9.1f} {recuperados / n:>9.1f} {eventos // n:>9} {args.cenarios / decorrido:>11.1f}", flush=True)
+    return 1 if falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
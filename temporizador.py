@@ -0,0 +1,112 @@
+import threading, time
+
+import registro
+
+# Roda de temporização (hashed timer wheel) para os timeouts de retransmissão.
+# Uma única thread atende todos os prazos: armar e cancelar são O(1)
+# (um dicionário por posição da roda) e os prazos vencidos no mesmo tick
+# são entregues juntos, em lote, para a função de callback.
+
+RESOLUCAO = 0.01 # Duração de um tick em segundos
+POSICOES = 512   # Número de posições da roda (uma volta = POSICOES * RESOLUCAO)
+
+log = registro.obter('RodaTemporizadora')
+
+
+class RodaTemporizadora:
+    def __init__(self, ao_expirar, resolucao=RESOLUCAO, posicoes=POSICOES, nome="RodaTemporizadora"):
+        """'ao_expirar' recebe a lista de chaves cujo prazo venceu."""
+        self.ao_expirar = ao_expirar
+        self.resolucao = resolucao
+        self.posicoes = posicoes
+        # Cada posição guarda {chave: tick_de_expiracao}; chaves com tick de
+        # voltas futuras ficam na mesma posição até a roda chegar nelas.
+        self._roda = [{} for _ in range(posicoes)]
+        self._posicao_da_chave = {}
+        self._cond = threading.Condition(threading.Lock())
+        self._inicio = time.monotonic()
+        self._tick_atual = 0
+        self.rodando = True
+        self._thread = threading.Thread(target=self._executar, name=nome, daemon=True)
+        self._thread.start()
+
+    def _tick_de(self, instante: float) -> int:
+        return int((instante - self._inicio) / self.resolucao)
+
+    def armar(self, chave, atraso: float):
+        """(Re)agenda 'chave' para expirar daqui a 'atraso' segundos."""
+        with self._cond:
+            self._remover(chave)
+            # +1: nunca expira antes do prazo pedido
+            tick = max(self._tick_de(time.monotonic() + atraso) + 1, self._tick_atual + 1)
+            posicao = tick % self.posicoes
+            self._roda[posicao][chave] = tick
+            self._posicao_da_chave[chave] = posicao
+            if len(self._posicao_da_chave) == 1:
+                self._cond.notify() # A thread pode estar dormindo sem prazos
+
+    def cancelar(self, chave):
+        """Remove o prazo de 'chave' (não faz nada se não estiver armada)."""
+        with self._cond:
+            self._remover(chave)
+
+    def _remover(self, chave):
+        posicao = self._posicao_da_chave.pop(chave, None)
+        if posicao is not None:
+            del self._roda[posicao][chave]
+
+    def __len__(self):
+        return len(self._posicao_da_chave)
+
+    def __contains__(self, chave):
+        return chave in self._posicao_da_chave
+
+    def _coletar_vencidos(self, tick_limite: int) -> list:
+        """Avança a roda até 'tick_limite' e retira as chaves vencidas."""
+        vencidos = []
+        # Nunca percorre mais de uma volta: depois disso as posições se repetem
+        inicio = max(self._tick_atual + 1, tick_limite - self.posicoes + 1)
+        for tick in range(inicio, tick_limite + 1):
+            posicao = self._roda[tick % self.posicoes]
+            if not posicao:
+                continue
+            for chave, tick_chave in list(posicao.items()):
+                if tick_chave <= tick_limite:
+                    del posicao[chave]
+                    del self._posicao_da_chave[chave]
+                    vencidos.append(chave)
+        self._tick_atual = tick_limite
+        return vencidos
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                while self.rodando and not self._posicao_da_chave:
+                    self._cond.wait()
+                    # Dormindo, a roda não avançou: realinha o tick atual
+                    self._tick_atual = max(self._tick_atual, self._tick_de(time.monotonic()) - 1)
+                if not self.rodando:
+                    return
+                proximo = self._inicio + (self._tick_atual + 1) * self.resolucao
+                espera = proximo - time.monotonic()
+                if espera > 0:
+                    self._cond.wait(espera)
+                    if not self.rodando:
+                        return
+                vencidos = self._coletar_vencidos(self._tick_de(time.monotonic()))
+            # Callback fora do lock da roda: ele pode armar/cancelar outros prazos
+            if vencidos:
+                try:
+                    self.ao_expirar(vencidos)
+                except Exception as e:
+                    log.erro("[%s] Erro ao tratar prazos vencidos: %s", self._thread.name, e)
+
+    def parar(self):
+        """Encerra a thread da roda e descarta os prazos pendentes."""
+        with self._cond:
+            self.rodando = False
+            self._roda = [{} for _ in range(self.posicoes)]
+            self._posicao_da_chave.clear()
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)